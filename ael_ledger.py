@@ -0,0 +1,88 @@
+"""
+SQLite ledger of AEL rows (output/AEL-Ledger.sqlite), the system of record for
+AEL-Verrechnung.xlsx.
+
+Every write runs in a BEGIN IMMEDIATE transaction, so several users appending
+on a shared output/ folder are serialized by SQLite's file lock (waiting up to
+'timeout' seconds). The rollback journal is used instead of WAL, because WAL
+needs shared memory and does not work on network shares.
+"""
+import json
+import socket
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+LEDGER_FORMAT = 1
+DEFAULT_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    host TEXT NOT NULL,
+    leistung_dritte INTEGER NOT NULL,
+    cells TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class AelLedger:
+    """Append-only list of AEL rows; each row is stored as the list of its cell values."""
+
+    def __init__(self, db_path, timeout=DEFAULT_TIMEOUT):
+        self.db_path = db_path
+        self.timeout = timeout
+
+    @contextmanager
+    def transaction(self):
+        """
+        Yields a connection inside a write transaction (BEGIN IMMEDIATE): other
+        writers wait until it is committed. Rolls back on an exception.
+        """
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for statement in _SCHEMA.split(';'):
+                    if statement.strip():
+                        conn.execute(statement)
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def append(self, conn, cells, leistung_dritte):
+        """Adds one row; returns its id."""
+        cur = conn.execute("INSERT INTO rows (created_at, host, leistung_dritte, cells) VALUES (?, ?, ?, ?)",
+                           (datetime.now().isoformat(timespec='seconds'), socket.gethostname(),
+                            int(bool(leistung_dritte)), json.dumps(list(cells), ensure_ascii=False)))
+        return cur.lastrowid
+
+    def rows(self, conn, after_id=0):
+        """Rows with an id above after_id, as (id, cells, leistung_dritte), oldest first."""
+        cur = conn.execute("SELECT id, cells, leistung_dritte FROM rows WHERE id > ? ORDER BY id", (after_id,))
+        return [(row_id, json.loads(cells), bool(dritte)) for row_id, cells, dritte in cur]
+
+    def get_meta(self, conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, conn, key, value):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def exported_id(self, conn):
+        """Id of the last row that is in the Excel file."""
+        return int(self.get_meta(conn, 'xlsx_exported_id', 0))
+
+    def set_exported_id(self, conn, row_id):
+        self.set_meta(conn, 'xlsx_exported_id', row_id)
@@ -0,0 +1,287 @@
+"""
+Incremental writes to the AEL ledger (AEL-Verrechnung.xlsx).
+
+Appending a row with openpyxl means loading the whole workbook, measuring every
+cell for the column widths and saving everything again. Here a row is spliced
+into the worksheet XML instead, and the column widths are kept as per-column
+maxima in a sidecar file next to the workbook (AEL-Verrechnung.meta.json).
+
+The sidecar also records size and mtime of the workbook after our last write.
+If they do not match (no sidecar yet, or the file was edited in Excel), the
+caller falls back to the full openpyxl write, which creates a fresh sidecar.
+compact() restyles all rows and recomputes the widths from scratch.
+"""
+import os
+import re
+import json
+import zipfile
+import posixpath
+from html import escape
+from lxml import etree
+
+SIDECAR_FORMAT = 1
+MIN_COLUMN_WIDTH = 10
+
+DATA_FONT_NAME = "Db Neo Office"
+DATA_FONT_SIZE = "11"
+DRITTE_FILL_RGB = "FFFFC000"
+BORDER_RGB = "FF000000"
+
+S_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_S = "{%s}" % S_NS
+_R_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+_PR = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_LAST_ROW = re.compile(rb'<row [^>]*\br="(\d+)"')
+_DIMENSION = re.compile(rb'<dimension ref="[^"]*"\s*/>')
+_COLS = re.compile(rb'<cols>.*?</cols>', re.S)
+
+
+def sidecar_path(excel_path):
+    return os.path.splitext(excel_path)[0] + ".meta.json"
+
+
+def cell_length(value):
+    """Length of the longest line of a cell value, as used for the column width."""
+    return max(len(line) for line in str(value).split('\n'))
+
+
+def column_width(max_length):
+    return max(MIN_COLUMN_WIDTH, max_length + 2)
+
+
+def column_letter(index):
+    """1 -> 'A', 27 -> 'AA'"""
+    letters = ""
+    while index:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(65 + rest) + letters
+    return letters
+
+
+def save_sidecar(excel_path, max_lengths):
+    """Records the column maxima and the current state of the workbook."""
+    st = os.stat(excel_path)
+    data = {'format': SIDECAR_FORMAT, 'size': st.st_size, 'mtime': st.st_mtime_ns, 'max_lengths': max_lengths}
+    tmp_path = sidecar_path(excel_path) + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, sidecar_path(excel_path))
+    except OSError as e:
+        print(f"Could not save AEL sidecar: {e}")
+
+
+def _load_sidecar(excel_path):
+    """Returns the column maxima if the sidecar matches the workbook, else None."""
+    try:
+        with open(sidecar_path(excel_path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        st = os.stat(excel_path)
+    except (OSError, ValueError):
+        return None
+    if data.get('format') != SIDECAR_FORMAT or data.get('size') != st.st_size or data.get('mtime') != st.st_mtime_ns:
+        return None
+    return data['max_lengths']
+
+
+def _first_sheet_part(zin):
+    workbook = etree.fromstring(zin.read("xl/workbook.xml"))
+    rid = workbook.find(f"{_S}sheets/{_S}sheet").get(_R_ID)
+    rels = etree.fromstring(zin.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(_PR + "Relationship"):
+        if rel.get('Id') == rid:
+            target = rel.get('Target')
+            return target[1:] if target.startswith('/') else posixpath.normpath(posixpath.join("xl", target))
+    raise KeyError(rid)
+
+
+def _find_or_append(parent, tag, matches, make):
+    """Index of the first child of parent matching, appending make() if there is none."""
+    children = parent.findall(_S + tag)
+    for i, child in enumerate(children):
+        if matches(child):
+            return i, False
+    parent.append(make())
+    parent.set('count', str(len(children) + 1))
+    return len(children), True
+
+
+def _val(el, path):
+    found = el.find(path)
+    return found.get('val') if found is not None else None
+
+
+def _data_styles(styles_xml):
+    """
+    Returns (styles_xml, data_style, dritte_style): the cellXfs indices for a data
+    row and a 'Leistung für Dritte' row, adding the formats if the workbook lacks them.
+    styles_xml is None if nothing had to be added.
+    """
+    root = etree.fromstring(styles_xml)
+    changed = False
+
+    def font_matches(font):
+        return (_val(font, _S + 'name') == DATA_FONT_NAME and _val(font, _S + 'sz') == DATA_FONT_SIZE
+                and font.find(_S + 'b') is None)
+
+    def make_font():
+        font = etree.Element(_S + 'font')
+        etree.SubElement(font, _S + 'sz', val=DATA_FONT_SIZE)
+        etree.SubElement(font, _S + 'name', val=DATA_FONT_NAME)
+        return font
+
+    font_id, added = _find_or_append(root.find(_S + 'fonts'), 'font', font_matches, make_font)
+    changed |= added
+
+    def border_matches(border):
+        return all(border.find(_S + side) is not None and border.find(_S + side).get('style') == 'thin'
+                   for side in ('left', 'right', 'top', 'bottom'))
+
+    def make_border():
+        border = etree.Element(_S + 'border')
+        for side in ('left', 'right', 'top', 'bottom'):
+            etree.SubElement(etree.SubElement(border, _S + side, style='thin'), _S + 'color', rgb=BORDER_RGB)
+        etree.SubElement(border, _S + 'diagonal')
+        return border
+
+    border_id, added = _find_or_append(root.find(_S + 'borders'), 'border', border_matches, make_border)
+    changed |= added
+
+    def fill_matches(fill):
+        pattern = fill.find(_S + 'patternFill')
+        return (pattern is not None and pattern.get('patternType') == 'solid'
+                and pattern.find(_S + 'fgColor') is not None
+                and pattern.find(_S + 'fgColor').get('rgb') == DRITTE_FILL_RGB)
+
+    def make_fill():
+        fill = etree.Element(_S + 'fill')
+        pattern = etree.SubElement(fill, _S + 'patternFill', patternType='solid')
+        etree.SubElement(pattern, _S + 'fgColor', rgb=DRITTE_FILL_RGB)
+        etree.SubElement(pattern, _S + 'bgColor', rgb=DRITTE_FILL_RGB)
+        return fill
+
+    fill_id, added = _find_or_append(root.find(_S + 'fills'), 'fill', fill_matches, make_fill)
+    changed |= added
+
+    cell_xfs = root.find(_S + 'cellXfs')
+    style_ids = []
+    for fill in (0, fill_id):
+        attrs = {'numFmtId': "0", 'fontId': str(font_id), 'fillId': str(fill), 'borderId': str(border_id)}
+
+        def xf_matches(xf, attrs=attrs):
+            return all(xf.get(k, "0") == v for k, v in attrs.items()) and xf.find(_S + 'alignment') is None
+
+        def make_xf(attrs=attrs):
+            xf = etree.Element(_S + 'xf', attrs, xfId="0", applyFont="1", applyBorder="1")
+            if attrs['fillId'] != "0":
+                xf.set('applyFill', "1")
+            return xf
+
+        style_id, added = _find_or_append(cell_xfs, 'xf', xf_matches, make_xf)
+        changed |= added
+        style_ids.append(style_id)
+
+    new_xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True) if changed else None
+    return new_xml, style_ids[0], style_ids[1]
+
+
+def _row_xml(row_number, row_data, style_id):
+    cells = []
+    for col, value in enumerate(row_data, 1):
+        ref = f"{column_letter(col)}{row_number}"
+        if value is None or value == "":
+            cells.append(f'<c r="{ref}" s="{style_id}"/>')
+        else:
+            cells.append(f'<c r="{ref}" s="{style_id}" t="inlineStr"><is><t xml:space="preserve">'
+                         f'{escape(str(value), quote=False)}</t></is></c>')
+    return f'<row r="{row_number}" spans="1:{len(row_data)}">{"".join(cells)}</row>'.encode('utf-8')
+
+
+def _cols_xml(max_lengths):
+    cols = "".join(f'<col min="{i}" max="{i}" width="{column_width(length)}" customWidth="1"/>'
+                   for i, length in enumerate(max_lengths, 1))
+    return f"<cols>{cols}</cols>".encode('utf-8')
+
+
+def append_row(excel_path, row_data, leistung_dritte=False):
+    """
+    Appends row_data to the first worksheet without loading the workbook.
+    Returns False if the workbook or its sidecar is missing or out of date; the
+    caller then has to do a full write. Raises PermissionError if the file is locked.
+    """
+    if not os.path.exists(excel_path):
+        return False
+    max_lengths = _load_sidecar(excel_path)
+    if max_lengths is None or len(max_lengths) != len(row_data):
+        return False
+
+    tmp_path = excel_path + ".tmp"
+    try:
+        with zipfile.ZipFile(excel_path) as zin:
+            sheet_part = _first_sheet_part(zin)
+            sheet = zin.read(sheet_part)
+            styles_xml, data_style, dritte_style = _data_styles(zin.read("xl/styles.xml"))
+
+            rows = list(_LAST_ROW.finditer(sheet, max(0, sheet.rfind(b'<row ') - 1)))
+            row_number = int(rows[-1].group(1)) + 1 if rows else 1
+            row = _row_xml(row_number, row_data, dritte_style if leistung_dritte else data_style)
+
+            end = sheet.rfind(b'</sheetData>')
+            if end >= 0:
+                sheet = sheet[:end] + row + sheet[end:]
+            elif b'<sheetData/>' in sheet:
+                sheet = sheet.replace(b'<sheetData/>', b'<sheetData>' + row + b'</sheetData>', 1)
+            else:
+                return False
+            sheet = _DIMENSION.sub(f'<dimension ref="A1:{column_letter(len(row_data))}{row_number}"/>'.encode(),
+                                   sheet, count=1)
+
+            new_lengths = [max(old, cell_length(value)) for old, value in zip(max_lengths, row_data)]
+            if new_lengths != max_lengths:
+                if _COLS.search(sheet):
+                    sheet = _COLS.sub(lambda m: _cols_xml(new_lengths), sheet, count=1)
+                else:
+                    start = sheet.find(b'<sheetData')
+                    sheet = sheet[:start] + _cols_xml(new_lengths) + sheet[start:]
+
+            with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+                for info in zin.infolist():
+                    if info.filename == sheet_part:
+                        data = sheet
+                    elif info.filename == "xl/styles.xml" and styles_xml is not None:
+                        data = styles_xml
+                    else:
+                        data = zin.read(info.filename)
+                    zout.writestr(info, data, compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp_path, excel_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    save_sidecar(excel_path, new_lengths)
+    return True
+
+
+def compact(excel_path, restyle):
+    """
+    Full pass over the workbook: restyle(sheet) re-applies all formats, the column
+    widths are recomputed from every cell and the sidecar is rewritten.
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(excel_path)
+    sheet = wb.active
+    restyle(sheet)
+    max_lengths = autosize(sheet)
+    wb.save(excel_path)
+    save_sidecar(excel_path, max_lengths)
+
+
+def autosize(sheet):
+    """Sets every column width from its longest cell line; returns the per-column maxima."""
+    max_lengths = []
+    for col in sheet.iter_cols():
+        max_length = max((cell_length(cell.value) for cell in col if cell.value is not None), default=0)
+        sheet.column_dimensions[col[0].column_letter].width = column_width(max_length)
+        max_lengths.append(max_length)
+    return max_lengths
@@ -0,0 +1,238 @@
+"""
+Merge benchmark: runs merge_documents over realistic selections and reports wall
+time, peak RSS and output size as JSON.
+
+    python benchmarks/merge.py [--scenario NAME ...] [--backend docxcompose --backend ooxml]
+                               [--repeat 3] [--warm-cache] [--stress-count 1000]
+                               [--synthetic-dir DIR] [--output FILE] [--compare OLD.json]
+
+Scenarios (default: all of them):
+  mandatory      cover page 0.0.1 and the mandatory modules
+  preset:<name>  mandatory modules plus one preset from configs/presets.ini
+  presets        mandatory modules plus all presets together
+  all            every module of the library
+  stress         a synthetic library of --stress-count modules (see synthetic.py),
+                 generated once into --synthetic-dir and reused afterwards
+
+Every measurement runs in a fresh interpreter, so peak RSS belongs to that merge
+alone. Without --warm-cache the merge runs without module cache, skeleton or style
+registry (the cold first build); with it, those are filled by an unmeasured first
+merge in a temporary cache folder (its memory counts towards the peak RSS).
+"""
+import os
+import sys
+import json
+import glob
+import argparse
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+BENCH_FORMAT = 1
+DEFAULT_COVER = "0.0.1"
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(spec):
+    """One merge in this process, as described by spec; returns the result dict."""
+    from time import perf_counter
+    import engine
+
+    module_cache = skeleton_cache = style_registry = None
+    if spec['warm_cache']:
+        from module_cache import ModuleCache
+        from skeleton import SkeletonCache
+        from style_registry import StyleRegistry
+        module_cache = ModuleCache(spec['cache_dir'])
+        skeleton_cache = SkeletonCache(spec['cache_dir'], module_cache)
+        style_registry = StyleRegistry(spec['cache_dir'], module_cache)
+
+    def merge(save_path):
+        return engine.merge_documents(spec['files'], save_path, module_cache=module_cache,
+                                      skeleton_cache=skeleton_cache, backend=spec['backend'],
+                                      style_registry=style_registry, workers=spec['workers'])
+
+    if spec['warm_cache']:
+        merge(spec['output'] + ".warmup.docx")
+        os.remove(spec['output'] + ".warmup.docx")
+
+    t = perf_counter()
+    stats = merge(spec['output'])
+    wall = perf_counter() - t
+    return {'wall_s': round(wall, 3), 'peak_rss_mb': peak_rss_mb(),
+            'output_bytes': os.path.getsize(spec['output']),
+            'media_bytes_saved': stats.get('media_bytes_saved', 0)}
+
+
+def library_scenarios(base_path, wanted):
+    """(name, file paths) for the scenarios on the real module library."""
+    from engine import BetraEngine, compile_presets, load_presets
+
+    engine = BetraEngine(base_path)
+    cover_pages, module_files = engine.scan_modules()
+    cover = engine.find_cover_page(cover_pages, DEFAULT_COVER) or (cover_pages[0]['path'] if cover_pages else "")
+    if not cover:
+        return []
+
+    scenarios = [("mandatory", [cover] + engine.select_modules(module_files))]
+    presets = {}
+    if os.path.exists(engine.presets_file_path):
+        _, presets = load_presets(engine.presets_file_path)
+    index = compile_presets(module_files, presets)
+    names = [preset['Name'] for preset in presets.values()]
+    for name in names:
+        scenarios.append((f"preset:{name}", [cover] + engine.select_modules(module_files, mask=index.mask(name))))
+    if presets:
+        scenarios.append(("presets", [cover] + engine.select_modules(module_files, mask=index.combine(union=names))))
+    scenarios.append(("all", [cover] + module_files))
+    return [(name, files) for name, files in scenarios if _wanted(name, wanted)]
+
+
+def stress_scenario(args):
+    from synthetic import generate_library, COVER_NAME, generator_options
+    from engine import natural_sort_key
+
+    out_dir = args.synthetic_dir or os.path.join(tempfile.gettempdir(), f"betra-synthetic-{args.stress_count}")
+    modules = [p for p in glob.glob(os.path.join(out_dir, "*.docx")) if os.path.basename(p) != COVER_NAME]
+    if len(modules) != args.stress_count:
+        print(f"Erzeuge {args.stress_count} synthetische Module in '{out_dir}'...", file=sys.stderr)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        modules = generate_library(out_dir, args.stress_count, **generator_options(args))
+    modules.sort(key=natural_sort_key)
+    return (f"stress-{args.stress_count}", [os.path.join(out_dir, COVER_NAME)] + modules)
+
+
+def _wanted(name, wanted):
+    return not wanted or name in wanted or (name.startswith("preset:") and "preset:*" in wanted)
+
+
+def run_child(spec):
+    """Runs measure(spec) in a fresh interpreter."""
+    with tempfile.NamedTemporaryFile('w', suffix=".json", delete=False, encoding='utf-8') as f:
+        json.dump(spec, f)
+        spec_path = f.name
+    try:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", spec_path],
+                              capture_output=True, text=True)
+    finally:
+        os.remove(spec_path)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "child failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline_path):
+    """Prints the wall time and RSS ratio against an earlier result file."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['scenario'], r['backend']): r for r in json.load(f)['results']}
+    for r in results:
+        old = baseline.get((r['scenario'], r['backend']))
+        if not old or not old['wall_s']:
+            continue
+        line = (f"{r['scenario']:<28} {r['backend']:<12} wall {old['wall_s']:.3f}s -> {r['wall_s']:.3f}s "
+                f"({r['wall_s'] / old['wall_s']:.2f}x)")
+        if r.get('peak_rss_mb') and old.get('peak_rss_mb'):
+            line += f", RSS {old['peak_rss_mb']} -> {r['peak_rss_mb']} MB"
+        print(line, file=sys.stderr)
+
+
+def run(argv=None):
+    from engine import MERGE_BACKENDS, DEFAULT_MERGE_WORKERS
+    from synthetic import add_generator_arguments
+
+    parser = argparse.ArgumentParser(description="Merge benchmark (JSON output).")
+    parser.add_argument("--base-path", default=REPO_DIR, help="Folder with modules/ and configs/")
+    parser.add_argument("--scenario", action="append", default=[],
+                        help="mandatory, preset:<name>, preset:*, presets, all, stress (default: all scenarios)")
+    parser.add_argument("--backend", action="append", choices=MERGE_BACKENDS, default=[])
+    parser.add_argument("--repeat", type=int, default=3, help="Measurements per scenario and backend")
+    parser.add_argument("--warm-cache", action="store_true", help="Measure with filled module/skeleton/style caches")
+    parser.add_argument("--workers", type=int, default=DEFAULT_MERGE_WORKERS,
+                        help="Loader threads of merge_documents (1 = sequential)")
+    parser.add_argument("--stress-count", type=int, default=1000, help="Modules in the synthetic stress library")
+    parser.add_argument("--synthetic-dir", help="Folder of the synthetic library (generated if missing)")
+    add_generator_arguments(parser)
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--compare", metavar="OLD.json", help="Print the change against an earlier result")
+    parser.add_argument("--child", metavar="SPEC", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        with open(args.child, 'r', encoding='utf-8') as f:
+            print(json.dumps(measure(json.load(f))))
+        return 0
+
+    backends = args.backend or MERGE_BACKENDS
+    scenarios = library_scenarios(args.base_path, args.scenario)
+    if _wanted("stress", args.scenario):
+        scenarios.append(stress_scenario(args))
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="betra-bench-")
+    try:
+        for name, files in scenarios:
+            for backend in backends:
+                samples = []
+                for i in range(args.repeat):
+                    spec = {'files': files, 'backend': backend, 'warm_cache': args.warm_cache,
+                            'workers': args.workers,
+                            'cache_dir': os.path.join(work_dir, f"cache-{backend}"),
+                            'output': os.path.join(work_dir, f"out-{i}.docx")}
+                    samples.append(run_child(spec))
+                result = {
+                    'scenario': name,
+                    'backend': backend,
+                    'modules': len(files) - 1,
+                    'wall_s': statistics.median(s['wall_s'] for s in samples),
+                    'wall_s_samples': [s['wall_s'] for s in samples],
+                    'peak_rss_mb': max((s['peak_rss_mb'] for s in samples if s['peak_rss_mb'] is not None),
+                                       default=None),
+                    'output_bytes': samples[-1]['output_bytes'],
+                    'media_bytes_saved': samples[-1]['media_bytes_saved'],
+                }
+                results.append(result)
+                print(f"{name:<28} {backend:<12} {result['wall_s']:>8.3f}s  "
+                      f"{result['peak_rss_mb'] or '?':>7} MB  {result['output_bytes'] / 1024:>9.0f} KB",
+                      file=sys.stderr)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        'format': BENCH_FORMAT,
+        'benchmark': "merge",
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'warm_cache': args.warm_cache,
+        'workers': args.workers,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    print(text)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,115 @@
+"""
+Startup benchmark: times the steps of a cold GUI start, each run in a fresh interpreter.
+
+    python benchmarks/startup.py [--runs 5] [--base-path DIR] [--cold-manifest] [--output FILE]
+
+Reports the median and all samples (in milliseconds) of
+  import        - importing main.py and everything it pulls in
+  config        - config.ini and presets.ini
+  network_data  - parsing BetraNetzziffern.txt
+  load_files    - scanning modules/ (manifest refresh), plus filling the module
+                  list when a display is available
+as JSON, so results can be compared between versions.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ["import", "config", "network_data", "load_files"]
+
+
+def measure(base_path):
+    """One startup, in this process; returns {stage: milliseconds} plus 'gui'."""
+    from time import perf_counter
+    sys.path.insert(0, REPO_DIR)
+
+    t = perf_counter()
+    import main
+    timings = {"import": perf_counter() - t}
+
+    engine = main.BetraEngine(base_path)
+    t = perf_counter()
+    if os.path.exists(engine.config_file_path):
+        main.load_settings(engine.config_file_path)
+    if os.path.exists(engine.presets_file_path):
+        main.load_presets(engine.presets_file_path)
+    timings["config"] = perf_counter() - t
+
+    t = perf_counter()
+    if os.path.exists(engine.network_data_file_path):
+        main.parse_network_data(engine.network_data_file_path)
+    timings["network_data"] = perf_counter() - t
+
+    try:
+        root = main.tk.Tk()
+        root.withdraw()
+    except main.tk.TclError:
+        root = None
+    t = perf_counter()
+    _, module_files = engine.scan_modules()
+    if root is not None:
+        module_list = main.ModuleList(root, main.COLUMN_LAYOUT, main.NUM_MAIN_COLUMNS, main.MANDATORY_FILES)
+        module_list.set_modules(module_files)
+        root.update_idletasks()
+    timings["load_files"] = perf_counter() - t
+    if root is not None:
+        root.destroy()
+
+    result = {stage: round(seconds * 1000, 2) for stage, seconds in timings.items()}
+    result["gui"] = root is not None
+    result["modules"] = len(module_files)
+    return result
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--base-path", default=REPO_DIR, help="Folder with modules/ and configs/")
+    parser.add_argument("--cold-manifest", action="store_true",
+                        help="Delete the module manifest before every run")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(measure(args.base_path)))
+        return 0
+
+    samples = []
+    for _ in range(args.runs):
+        if args.cold_manifest:
+            sys.path.insert(0, REPO_DIR)
+            from module_manifest import MANIFEST_NAME
+            try:
+                os.remove(os.path.join(args.base_path, "configs", MANIFEST_NAME))
+            except OSError:
+                pass
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--base-path", args.base_path],
+                             check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+
+    result = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "cold_manifest": args.cold_manifest,
+        "gui": samples[0]["gui"],
+        "modules": samples[0]["modules"],
+        "median_ms": {stage: statistics.median(s[stage] for s in samples) for stage in STAGES},
+        "samples_ms": {stage: [s[stage] for s in samples] for stage in STAGES},
+    }
+    result["median_ms"]["total"] = round(sum(result["median_ms"][stage] for stage in STAGES), 2)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
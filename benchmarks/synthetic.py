@@ -0,0 +1,124 @@
+"""
+Generator for synthetic module libraries, for the merge benchmark.
+
+    python benchmarks/synthetic.py OUT_DIR [--count 1000] [--paragraphs 40] [--tables 2]
+                                   [--images 1] [--styles 3] [--numbered 8] [--shared-images]
+
+Writes a cover page '0.0.1 - Deckblatt.docx' and COUNT modules named like the real
+library ('5.<n>.<m> - Synthetisches Modul <i>.docx'). Every module gets its own
+paragraph styles, numbered paragraphs (List Number, so each module brings a
+numbering definition), tables and PNG images. Generation is deterministic for a
+given seed, so two runs with the same arguments produce comparable libraries.
+"""
+import io
+import os
+import sys
+import zlib
+import random
+import struct
+import argparse
+
+COVER_NAME = "0.0.1 - Deckblatt.docx"
+WORDS = ("Baustelle Gleis Sperrung Oberleitung Weiche Signal Bahnübergang Fahrdienstleiter "
+         "Arbeitszeit Sicherungsposten Langsamfahrstelle Bauzug Streckengleis Zugfahrt "
+         "Betriebsstelle Abschnitt Anordnung Meldung Zustimmung Fernmeldeanlage").split()
+
+
+def png_bytes(width, height, rng):
+    """A small RGB PNG with random pixels (random, so it is not deduplicated by accident)."""
+    raw = b"".join(b"\x00" + bytes(rng.getrandbits(8) for _ in range(width * 3)) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b""))
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_module(path, index, paragraphs=40, tables=2, images=1, styles=3, numbered=8,
+                shared_image=None, seed=0):
+    """Writes one synthetic module."""
+    from docx import Document
+    from docx.enum.style import WD_STYLE_TYPE
+    from docx.shared import Cm, Pt
+
+    rng = random.Random(seed * 1000003 + index)
+    doc = Document()
+    own_styles = []
+    for i in range(styles):
+        style = doc.styles.add_style(f"Syn{index} Absatz {i}", WD_STYLE_TYPE.PARAGRAPH)
+        style.base_style = doc.styles["Normal"]
+        style.font.size = Pt(9 + i)
+        own_styles.append(style)
+
+    doc.add_heading(f"Synthetisches Modul {index}", level=2)
+    for i in range(paragraphs):
+        style = own_styles[i % len(own_styles)] if own_styles else None
+        doc.add_paragraph(_sentence(rng, rng.randint(6, 30)), style=style)
+        if numbered and i == paragraphs // 2:
+            for _ in range(numbered):
+                doc.add_paragraph(_sentence(rng, 8), style="List Number")
+    for _ in range(tables):
+        table = doc.add_table(rows=4, cols=3)
+        table.style = "Table Grid"
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = _sentence(rng, 3)
+    for _ in range(images):
+        blob = shared_image or png_bytes(64, 48, rng)
+        doc.add_picture(io.BytesIO(blob), width=Cm(4))
+    doc.save(path)
+
+
+def generate_library(out_dir, count, paragraphs=40, tables=2, images=1, styles=3, numbered=8,
+                     shared_images=False, seed=0):
+    """Writes the cover page and 'count' modules; returns the module paths in library order."""
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    shared_image = png_bytes(64, 48, rng) if shared_images else None
+    make_module(os.path.join(out_dir, COVER_NAME), 0, paragraphs=10, tables=0, images=images,
+                styles=1, numbered=0, shared_image=shared_image, seed=seed)
+    paths = []
+    for i in range(1, count + 1):
+        chapter = f"5.{(i - 1) // 100 + 1}.{(i - 1) % 100 + 1}"
+        path = os.path.join(out_dir, f"{chapter} - Synthetisches Modul {i}.docx")
+        make_module(path, i, paragraphs=paragraphs, tables=tables, images=images, styles=styles,
+                    numbered=numbered, shared_image=shared_image, seed=seed)
+        paths.append(path)
+    return paths
+
+
+def add_generator_arguments(parser):
+    parser.add_argument("--paragraphs", type=int, default=40, help="Paragraphs per module")
+    parser.add_argument("--tables", type=int, default=2, help="Tables per module")
+    parser.add_argument("--images", type=int, default=1, help="Images per module")
+    parser.add_argument("--styles", type=int, default=3, help="Own paragraph styles per module")
+    parser.add_argument("--numbered", type=int, default=8, help="Numbered paragraphs per module")
+    parser.add_argument("--shared-images", action="store_true",
+                        help="All modules use the same image (tests media deduplication)")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def generator_options(args):
+    return {'paragraphs': args.paragraphs, 'tables': args.tables, 'images': args.images,
+            'styles': args.styles, 'numbered': args.numbered, 'shared_images': args.shared_images,
+            'seed': args.seed}
+
+
+def run(argv=None):
+    parser = argparse.ArgumentParser(description="Generates a synthetic module library.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--count", type=int, default=1000, help="Number of modules")
+    add_generator_arguments(parser)
+    args = parser.parse_args(argv)
+    paths = generate_library(args.out_dir, args.count, **generator_options(args))
+    print(f"{len(paths)} Module und Deckblatt in '{args.out_dir}' erzeugt.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,129 @@
+"""
+Sidecar manifest of a build: which module versions went into an output.
+
+Every build writes output/<name>/<name>.build.json next to the document, with
+the cover page and the modules in merge order, each by file name and content
+hash, and the backend used. Modules that could not be appended stay in the list,
+marked 'failed', so a rebuild puts them back once they are fixed. Comparing
+these hashes against the current module library tells which issued documents
+contain an outdated (or since renamed) module, and the manifest has everything
+needed to build them again.
+"""
+import os
+import json
+from datetime import datetime
+
+from module_manifest import split_module_name
+
+BUILD_FORMAT = 2
+BUILD_SUFFIX = ".build.json"
+
+
+def build_manifest_path(save_path):
+    """output/<name>/<name>.docx -> output/<name>/<name>.build.json"""
+    return os.path.splitext(save_path)[0] + BUILD_SUFFIX
+
+
+def write_build_manifest(save_path, files, backend, failed=()):
+    """
+    Writes the sidecar of save_path. files is [(file path, sha256)] in merge
+    order, the cover page first; failed are the file names that are missing
+    from the output (see merge_trace.py). They keep their place in 'files'.
+    """
+    failed = set(failed)
+    entries = []
+    for path, sha256 in files:
+        entry = {'file': os.path.basename(path), 'sha256': sha256}
+        if entry['file'] in failed:
+            entry['failed'] = True
+        entries.append(entry)
+    data = {
+        'format': BUILD_FORMAT,
+        'output': os.path.basename(save_path),
+        'built': datetime.now().isoformat(timespec='seconds'),
+        'backend': backend,
+        'files': entries,
+        'failed': sorted(failed),
+    }
+    path = build_manifest_path(save_path)
+    try:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Could not write build manifest: {e}")
+
+
+def load_build_manifest(path):
+    """The sidecar as a dict; raises OSError/ValueError if it is missing or not readable."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') == 1:
+        _upgrade_format_1(data)
+    elif data.get('format') != BUILD_FORMAT:
+        raise ValueError(f"Unbekanntes Format in '{path}'")
+    return data
+
+
+def _chapter_key(name):
+    return [int(p) if p.isdigit() else 0 for p in split_module_name(name)[0].split('.')]
+
+
+def _upgrade_format_1(data):
+    """Format 1 listed failed modules only by name: they go back into 'files' at their chapter's place."""
+    files = data['files']
+    for name in data.get('failed', []):
+        if any(entry['file'] == name for entry in files):
+            continue
+        position = 1
+        while position < len(files) and _chapter_key(files[position]['file']) <= _chapter_key(name):
+            position += 1
+        files.insert(position, {'file': name, 'sha256': None, 'failed': True})
+    data['format'] = BUILD_FORMAT
+
+
+def find_build_manifests(output_dir):
+    """Paths of all sidecars in output/<name>/, sorted."""
+    found = []
+    try:
+        folders = sorted(os.scandir(output_dir), key=lambda e: e.name)
+    except OSError:
+        return found
+    for folder in folders:
+        if not folder.is_dir():
+            continue
+        path = os.path.join(folder.path, folder.name + BUILD_SUFFIX)
+        if os.path.exists(path):
+            found.append(path)
+    return found
+
+
+def outdated_files(manifest, current):
+    """
+    Compares a sidecar against the library. current is {file name: sha256} of the
+    modules as they are now. Returns [(old file name, new file name or None, reason)]
+    for every file of the build that changed ('changed'), was renamed (same chapter
+    number, other title: 'renamed'), no longer exists ('missing') or is missing
+    from the output because it could not be appended ('failed'). An empty list
+    means the output is up to date.
+    """
+    by_chapter = {}
+    for name in current:
+        by_chapter.setdefault(split_module_name(name)[0], []).append(name)
+
+    changes = []
+    for entry in manifest['files']:
+        name = entry['file']
+        if name in current:
+            if entry.get('failed'):
+                changes.append((name, name, 'failed'))
+            elif current[name] != entry['sha256']:
+                changes.append((name, name, 'changed'))
+            continue
+        candidates = by_chapter.get(split_module_name(name)[0], [])
+        if len(candidates) == 1:
+            changes.append((name, candidates[0], 'renamed'))
+        else:
+            changes.append((name, None, 'missing'))
+    return changes
@@ -0,0 +1,120 @@
+"""
+Content-addressed store of finished builds, so an identical build is a file copy.
+
+A build is keyed by the content hashes of the cover page and of the modules (in
+order, with their file names) and by the merge options that change the result
+(backend, docxcompose version). The serial number and the output name are not
+part of the key: nothing inside the composed document depends on them (the cover
+fields are Word form fields that are filled in after the build), so a repeated
+build only has to write the stored document under the new name.
+"""
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+from skeleton import composer_version
+
+STORE_FORMAT = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class BuildStore:
+    """
+    Finished builds in cache/builds/, as <key>.docx plus <key>.json with the merge
+    statistics. Builds with failed modules are never stored, so a build that hit a
+    locked file is composed again. The least recently used builds are dropped when
+    the store grows beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir, module_cache, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.join(cache_dir, "builds")
+        self.module_cache = module_cache
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key_for(self, file_paths, backend):
+        """Build key of the cover page file_paths[0] and the modules file_paths[1:]."""
+        h = hashlib.sha256()
+        h.update(f"{STORE_FORMAT}:{backend}:{composer_version()}".encode())
+        for path in file_paths:
+            h.update(b"\0" + os.path.basename(path).encode('utf-8') + b"\0")
+            # A missing module is skipped by the merge, so it is part of the key as such
+            h.update(self.module_cache.content_hash(path).encode() if os.path.exists(path) else b"missing")
+        return h.hexdigest()
+
+    def restore(self, key, save_path):
+        """
+        Writes the stored build to save_path (via a temporary file); returns its
+        statistics, or None if the store does not have it.
+        """
+        base = os.path.join(self.cache_dir, key)
+        try:
+            with open(base + ".json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') != STORE_FORMAT:
+                raise ValueError("old store format")
+            tmp_path = save_path + ".part"
+            try:
+                shutil.copyfile(base + ".docx", tmp_path)
+                os.replace(tmp_path, save_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            os.utime(base + ".docx")
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return {'media_bytes_saved': meta.get('media_bytes_saved', 0)}
+
+    def store(self, key, save_path, stats):
+        """Keeps a copy of the finished build save_path under key."""
+        if stats.get('failed'):
+            return
+        base = os.path.join(self.cache_dir, key)
+        tmp_path = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            shutil.copyfile(save_path, tmp_path)
+            os.replace(tmp_path, base + ".docx")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': STORE_FORMAT, 'media_bytes_saved': stats.get('media_bytes_saved', 0)}, f)
+            os.replace(tmp_path, base + ".json")
+        except OSError as e:
+            print(f"Could not store build: {e}")
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._evict()
+
+    def clear(self):
+        """Removes all stored builds."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _evict(self):
+        with self._lock:
+            try:
+                builds = []
+                for entry in os.scandir(self.cache_dir):
+                    if entry.name.endswith(".docx"):
+                        st = entry.stat()
+                        builds.append((st.st_mtime, st.st_size, entry.path))
+            except OSError:
+                return
+            total = sum(size for _, size, _ in builds)
+            builds.sort()
+            # The newest build always stays, however large it is
+            while total > self.max_bytes and len(builds) > 1:
+                _, size, path = builds.pop(0)
+                total -= size
+                for ext in (".docx", ".json"):
+                    try:
+                        os.remove(os.path.splitext(path)[0] + ext)
+                    except OSError:
+                        pass
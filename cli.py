@@ -0,0 +1,440 @@
+"""Command-line entry point of the BetraTool (no Tk required).
+
+Example:
+    python main.py build --cover 0.0.0 --preset Baugleis --module 5.1.20 --type Betra --serial 0042
+"""
+import argparse
+import os
+import sys
+import sqlite3
+from datetime import datetime
+
+from engine import (BetraEngine, DEFAULT_JOBS, DOC_TYPES, MERGE_BACKENDS, MIRROR_SETTINGS, build_base_name,
+                    compile_presets, load_settings, load_presets)
+from merge_trace import format_summary, load_events
+
+
+def _open_engine(args):
+    """The engine for --base-path, reading modules/ through the local mirror if LocalMirror (or --mirror) says so."""
+    engine = BetraEngine(args.base_path)
+    setting = args.mirror
+    if setting is None:
+        try:
+            setting = load_settings(engine.config_file_path)['local_mirror']
+        except (FileNotFoundError, ValueError):
+            setting = "auto"
+    engine.apply_mirror_setting(setting)
+    return engine
+
+
+def _preset_mask(engine, module_files, union, difference):
+    """Bitset over module_files: the modules of the 'union' presets minus those of the 'difference' presets."""
+    _, presets = load_presets(engine.presets_file_path)
+    index = compile_presets(module_files, presets)
+    for name in list(union) + list(difference):
+        name = index.resolve(name)
+        if name in index.errors:
+            raise ValueError(index.errors[name])
+    return index.combine(union=union, difference=difference)
+
+
+def cmd_build(args):
+    """Builds one Betra/BA and optionally writes the AEL row; returns 2 if modules are missing from it."""
+    engine = BetraEngine(args.base_path)
+
+    settings = {}
+    try:
+        settings = load_settings(engine.config_file_path)
+    except (FileNotFoundError, ValueError) as e:
+        if not (args.region and args.user):
+            print(f"Fehler: {e} Bitte das Programm einmal mit Oberfläche starten "
+                  "oder --region und --user angeben.", file=sys.stderr)
+            return 1
+    regional_code_full = args.region or settings['regional_code_full']
+    user_name = args.user or settings['user_name']
+    year = settings.get('year', "26")
+    engine.merge_backend = args.backend or settings.get('merge_backend', engine.merge_backend)
+    engine.merge_workers = args.workers if args.workers is not None else settings.get('merge_workers',
+                                                                                      engine.merge_workers)
+    engine.memoize_builds = not args.no_memo and settings.get('memoize_builds', True)
+    engine.apply_mirror_setting(args.mirror or settings.get('local_mirror', "auto"))
+
+    cover_pages, module_files = engine.scan_modules()
+    cover_path = engine.find_cover_page(cover_pages, args.cover)
+    if not cover_path:
+        known = ", ".join(c['name'] for c in cover_pages)
+        print(f"Fehler: Deckblatt '{args.cover}' nicht gefunden. Vorhanden: {known}", file=sys.stderr)
+        return 1
+
+    if args.without_preset and not args.preset:
+        # It only takes modules out of the --preset selection, never out of --module/--prefix
+        print("Fehler: --without-preset wirkt nur zusammen mit --preset.", file=sys.stderr)
+        return 1
+    mask = 0
+    if args.preset:
+        try:
+            mask = _preset_mask(engine, module_files, args.preset, args.without_preset)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Fehler: {e}", file=sys.stderr)
+            return 1
+
+    selected = engine.select_modules(module_files, chapters=args.module, prefixes=args.prefix, mask=mask)
+    selected_names = {os.path.basename(p) for p in selected}
+    for chapter in args.module:
+        if not any(name.startswith(f"{chapter} - ") or os.path.splitext(name)[0] == chapter for name in selected_names):
+            print(f"Warnung: Modul '{chapter}' nicht gefunden.", file=sys.stderr)
+
+    if not args.skip_check:
+        checks = engine.check_modules([cover_path] + selected, jobs=args.jobs)
+        broken = [(path, checks[path]['errors']) for path in [cover_path] + selected if checks[path]['errors']]
+        for path, errors in broken:
+            print(f"Fehler: Modul '{os.path.basename(path)}' ist fehlerhaft: {'; '.join(errors)}", file=sys.stderr)
+        if broken:
+            print("Nichts erstellt (--skip-check, um trotzdem zusammenzufügen).", file=sys.stderr)
+            return 1
+
+    base_name = build_base_name(args.type, regional_code_full, args.serial, year)
+    new_folder_path, save_path = engine.output_paths(base_name)
+    os.makedirs(new_folder_path, exist_ok=True)
+
+    if os.path.exists(save_path) and not args.force:
+        print(f"Fehler: '{save_path}' existiert bereits (--force zum Überschreiben).", file=sys.stderr)
+        return 1
+
+    stats = engine.merge_documents([cover_path] + selected, save_path)
+    print(f"{save_path} ({len(selected)} Module{', aus dem Build-Speicher' if stats.get('memoized') else ''})")
+    if stats['media_bytes_saved']:
+        print(f"Doppelte Bilder nur einmal gespeichert: {stats['media_bytes_saved'] / 1024:.0f} KB eingespart")
+    for failure in stats['failed']:
+        print(f"Warnung: Modul '{failure['file']}' fehlt ({failure['stage']}): {failure['error']}", file=sys.stderr)
+    if args.trace_summary:
+        print(stats['trace'].summary())
+
+    if args.ael:
+        try:
+            excel_updated = engine.append_ael_row(
+                project_num=args.ael,
+                kurztext=args.kurztext,
+                leistung_dritte=args.dritte,
+                user_name=user_name,
+                today_date=datetime.now().strftime("%d.%m.%Y"),
+                betra_name=base_name,
+                sonstiges=args.sonstiges,
+                trace=stats['trace']
+            )
+        except sqlite3.Error as e:
+            print(f"Fehler: AEL-Ledger nicht beschreibbar ({e}), AEL-Zeile nicht geschrieben.", file=sys.stderr)
+            return 1
+        if excel_updated:
+            print(f"AEL-Zeile in '{engine.ael_file_path}' geschrieben.")
+        else:
+            print(f"AEL-Zeile im Ledger gespeichert; '{engine.ael_file_path}' ist eventuell geöffnet "
+                  "und wird beim nächsten Speichern (oder mit ael-export) aktualisiert.", file=sys.stderr)
+
+    if stats['failed']:
+        print(f"Fehler: {len(stats['failed'])} Modul(e) fehlen in '{save_path}'.", file=sys.stderr)
+        return 2
+    return 0
+
+
+def cmd_registry(args):
+    """Compiles the style/numbering tables of the module library (used by the ooxml backend)."""
+    engine = _open_engine(args)
+    conflicts = engine.rebuild_style_registry()
+    print(f"Formatvorlagen-Tabellen in '{engine.style_registry.cache_dir}' erfasst "
+          "(nur für das Merge-Verfahren ooxml).")
+    for name, files in sorted(conflicts.items()):
+        print(f"Abweichende Formatvorlage '{name}': {', '.join(files)}")
+    return 0
+
+
+def cmd_modules(args):
+    """Lists the module library from the manifest (refreshing it first)."""
+    engine = _open_engine(args)
+    cover_pages, module_files = engine.scan_modules()
+    for path in [c['path'] for c in cover_pages] + module_files:
+        info = engine.module_info(path)
+        if info.get('error'):
+            print(f"{info['chapter']:<10} {info['title']}  [nicht lesbar: {info['error']}]")
+            continue
+        pages = info['pages'] if info.get('pages') else "?"
+        print(f"{info['chapter']:<10} {info['title']}  ({pages} S., {info['paragraphs']} Absätze, "
+              f"{info['tables']} Tabellen, {len(info['media'])} Bilder)")
+    return 0
+
+
+def cmd_check(args):
+    """Pre-flight check of all modules and cover pages: zip, XML, references, trial append."""
+    engine = _open_engine(args)
+    cover_pages, module_files = engine.scan_modules()
+    paths = [c['path'] for c in cover_pages] + module_files
+    results = engine.check_modules(paths, jobs=args.jobs)
+    broken = 0
+    for path in paths:
+        result = results[path]
+        if result['errors']:
+            broken += 1
+        if result['errors'] or (result['warnings'] and args.warnings):
+            print(os.path.basename(path))
+            for error in result['errors']:
+                print(f"  Fehler: {error}")
+            if args.warnings:
+                for warning in result['warnings']:
+                    print(f"  Hinweis: {warning}")
+    print(f"{len(paths)} Dateien geprüft, {broken} fehlerhaft.")
+    return 1 if broken else 0
+
+
+def cmd_search(args):
+    """Full-text search over titles and contents of the modules."""
+    engine = _open_engine(args)
+    engine.scan_modules()
+    paths = engine.search_modules(" ".join(args.query))
+    for path in paths[:args.top]:
+        print(os.path.splitext(os.path.basename(path))[0])
+    if len(paths) > args.top:
+        print(f"... und {len(paths) - args.top} weitere")
+    return 0 if paths else 1
+
+
+def cmd_trace_summary(args):
+    """Sums up one or more build traces: time per stage and the slowest modules."""
+    events, failures = [], []
+    for path in args.traces:
+        try:
+            file_events, file_failures = load_events(path)
+        except (OSError, ValueError) as e:
+            print(f"Fehler: '{path}' nicht lesbar: {e}", file=sys.stderr)
+            return 1
+        events.extend(file_events)
+        failures.extend(file_failures)
+    print(format_summary(events, failures, count=args.top))
+    return 0
+
+
+REASONS = {'changed': "geändert", 'renamed': "umbenannt", 'missing': "entfernt", 'failed': "fehlt im Ergebnis"}
+
+
+def cmd_rebuild(args):
+    """Lists the outputs that contain outdated modules and builds them again."""
+    engine = _open_engine(args)
+    outdated = engine.outdated_outputs()
+    if not outdated:
+        print("Alle Ausgaben mit Build-Manifest sind aktuell.")
+        return 0
+    for _, manifest, changes in outdated:
+        print(manifest['output'])
+        for old, new, reason in changes:
+            print(f"  {old} ({REASONS[reason]}{' -> ' + new if reason == 'renamed' else ''})")
+    if args.dry_run:
+        return 0
+
+    errors = 0
+    for sidecar_path, result, error in engine.rebuild_outputs([path for path, _, _ in outdated], jobs=args.jobs):
+        if error is not None:
+            errors += 1
+            print(f"Fehler: '{sidecar_path}' nicht neu erstellt: {error}", file=sys.stderr)
+            continue
+        print(f"Neu erstellt: {result['output']}")
+        if result['backup']:
+            print(f"  Vorherige Fassung: {result['backup']}")
+        for name in result['dropped']:
+            print(f"  Warnung: Modul '{name}' gibt es nicht mehr, ausgelassen.", file=sys.stderr)
+        for failure in result['failed']:
+            print(f"  Warnung: Modul '{failure['file']}' fehlt ({failure['stage']}): {failure['error']}",
+                  file=sys.stderr)
+    return 1 if errors else 0
+
+
+STEPS = {'copy': "kopiert", 'rename': "umbenannt", 'delete': "gelöscht"}
+
+
+def _print_steps(steps, dry_run):
+    """Prints the steps of a backup or restore per tree; returns their number."""
+    count = 0
+    for tree, tree_steps in steps.items():
+        for action, path, detail in tree_steps:
+            line = f"  {tree}/{path}: {STEPS[action]}"
+            if action == 'rename':
+                line += f" (bisher {detail})"
+            print(line)
+        count += len(tree_steps)
+    if not count:
+        print("Keine Unterschiede.")
+        return count
+    counts = {}
+    for tree_steps in steps.values():
+        for action, _, _ in tree_steps:
+            counts[action] = counts.get(action, 0) + 1
+    summary = ", ".join(f"{counts[action]} {text}" for action, text in STEPS.items() if action in counts)
+    print(f"{summary}{' (--dry-run, nichts geändert)' if dry_run else ''}.")
+    return count
+
+
+def cmd_backup(args):
+    """Updates backup/modules and backup/configs (only changed files) and records a snapshot."""
+    engine = BetraEngine(args.base_path)
+    steps, snapshot_id = engine.backup_library(dry_run=args.dry_run)
+    _print_steps(steps, args.dry_run)
+    if snapshot_id:
+        print(f"Snapshot {snapshot_id} angelegt.")
+    return 0
+
+
+def cmd_restore(args):
+    """Restores modules/ and configs/ from backup/ or from a snapshot."""
+    engine = BetraEngine(args.base_path)
+    try:
+        steps = engine.restore_library(args.snapshot, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 1
+    if _print_steps(steps, args.dry_run) and not args.dry_run:
+        print("Der vorherige Stand ist als Snapshot gespeichert (siehe 'snapshots').")
+    return 0
+
+
+def cmd_snapshots(args):
+    """Lists the snapshots of the library, oldest first."""
+    engine = BetraEngine(args.base_path)
+    snapshots = engine.library_backup.snapshots()
+    if not snapshots:
+        print("Noch keine Snapshots (siehe 'backup').")
+    for snapshot in snapshots:
+        note = f"  {snapshot['note']}" if snapshot['note'] else ""
+        print(f"{snapshot['id']:<18} {snapshot['created'].replace('T', ' ')}  {snapshot['files']} Dateien{note}")
+    return 0
+
+
+def cmd_ael_export(args):
+    """Regenerates the AEL Excel file from the ledger."""
+    engine = BetraEngine(args.base_path)
+    try:
+        count = engine.export_ael()
+    except PermissionError:
+        print(f"Fehler: '{engine.ael_file_path}' ist eventuell geöffnet.", file=sys.stderr)
+        return 1
+    print(f"'{engine.ael_file_path}' aus dem Ledger erzeugt ({count} Zeilen).")
+    return 0
+
+
+def cmd_ael_compact(args):
+    """Restyles the AEL file and recomputes its column widths."""
+    engine = BetraEngine(args.base_path)
+    if not os.path.exists(engine.ael_file_path):
+        print(f"Fehler: '{engine.ael_file_path}' nicht gefunden.", file=sys.stderr)
+        return 1
+    try:
+        engine.compact_ael()
+    except PermissionError:
+        print(f"Fehler: '{engine.ael_file_path}' ist eventuell geöffnet.", file=sys.stderr)
+        return 1
+    print(f"'{engine.ael_file_path}' neu formatiert.")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="BetraTool", description="Betra/BA ohne Oberfläche erstellen.")
+    parser.add_argument("--base-path", default=None,
+                        help="Ordner mit modules/, configs/ und output/ (Standard: Programmordner)")
+    parser.add_argument("--mirror", choices=MIRROR_SETTINGS, default=None,
+                        help="Module über eine lokale Kopie lesen (Standard: LocalMirror in config.ini, "
+                             "sonst auto = bei Netzlaufwerken)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Deckblatt und Module zusammenfügen "
+                                               "(Rückgabewert 2, wenn Module im Ergebnis fehlen)")
+    build.add_argument("--cover", required=True, help="Deckblatt (Name oder Nummer, z.B. 0.0.1)")
+    build.add_argument("--module", action="append", default=[], metavar="NR",
+                       help="Optionales Modul (Nummer oder Name, z.B. 5.1.20), mehrfach möglich")
+    build.add_argument("--prefix", action="append", default=[],
+                       help="Alle Module mit diesem Präfix (z.B. 2.3.), mehrfach möglich")
+    build.add_argument("--preset", action="append", default=[],
+                       help="Preset-Name aus presets.ini (oder 'Alle'), mehrfach möglich")
+    build.add_argument("--without-preset", action="append", default=[], metavar="PRESET",
+                       help="Module dieses Presets aus den --preset-Modulen herausnehmen, mehrfach möglich")
+    build.add_argument("--type", choices=DOC_TYPES, default="Betra", help="Art (Standard: Betra)")
+    build.add_argument("--serial", required=True, help="Laufende Nummer")
+    build.add_argument("--force", action="store_true", help="Bestehende Datei überschreiben")
+    build.add_argument("--backend", choices=MERGE_BACKENDS,
+                       help="Merge-Verfahren (überschreibt MergeBackend in config.ini)")
+    build.add_argument("--workers", type=int,
+                       help="Threads, die Module vorab laden (1 = nacheinander; überschreibt MergeWorkers)")
+    build.add_argument("--no-memo", action="store_true",
+                       help="Immer neu zusammenfügen, auch wenn ein gleicher Build gespeichert ist")
+    build.add_argument("--skip-check", action="store_true",
+                       help="Module vorher nicht prüfen (fehlerhafte Module fehlen dann im Ergebnis)")
+    build.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                       help=f"Prozesse für die Prüfung noch nicht geprüfter Module (Standard: {DEFAULT_JOBS})")
+    build.add_argument("--region", help="Regionalcode (überschreibt config.ini)")
+    build.add_argument("--user", help="Bearbeiter für AEL (überschreibt config.ini)")
+    build.add_argument("--ael", metavar="PROJEKTNR", help="AEL-Zeile mit dieser Projektnummer schreiben")
+    build.add_argument("--kurztext", default="", help="AEL: Kurztext")
+    build.add_argument("--sonstiges", default="", help="AEL: Sonstiges")
+    build.add_argument("--dritte", action="store_true", help="AEL: Leistung für Dritte")
+    build.add_argument("--trace-summary", action="store_true", help="Zeit je Schritt und langsamste Module ausgeben")
+    build.set_defaults(func=cmd_build)
+
+    registry = subparsers.add_parser("registry", help="Formatvorlagen und Nummerierungen der Module vorab erfassen "
+                                                      "(Merge-Verfahren ooxml)")
+    registry.set_defaults(func=cmd_registry)
+
+    modules = subparsers.add_parser("modules", help="Module mit Kapitel, Titel und Umfang auflisten")
+    modules.set_defaults(func=cmd_modules)
+
+    check = subparsers.add_parser("check", help="Alle Module vorab prüfen (Zip, XML, Formatvorlagen, Probe-Einfügen)")
+    check.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                       help=f"Module, die gleichzeitig geprüft werden (Standard: {DEFAULT_JOBS})")
+    check.add_argument("--warnings", action="store_true", help="Auch Hinweise ausgeben")
+    check.set_defaults(func=cmd_check)
+
+    search = subparsers.add_parser("search", help="Module nach Titel und Inhalt durchsuchen")
+    search.add_argument("query", nargs="+", help="Suchbegriffe (Wortanfänge oder Wortteile, z.B. Zugfunk, sperrung)")
+    search.add_argument("--top", type=int, default=20, help="Anzahl der Treffer (Standard: 20)")
+    search.set_defaults(func=cmd_search)
+
+    trace_summary = subparsers.add_parser("trace-summary",
+                                          help="Trace-Dateien (<Name>.trace.json) auswerten: langsamste Module")
+    trace_summary.add_argument("traces", nargs="+", metavar="TRACE")
+    trace_summary.add_argument("--top", type=int, default=10, help="Anzahl der langsamsten Module (Standard: 10)")
+    trace_summary.set_defaults(func=cmd_trace_summary)
+
+    rebuild = subparsers.add_parser("rebuild",
+                                    help="Ausgaben mit geänderten Modulen finden und neu erstellen")
+    rebuild.add_argument("--dry-run", action="store_true", help="Nur auflisten, nichts neu erstellen")
+    rebuild.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                         help=f"Ausgaben, die gleichzeitig erstellt werden (Standard: {DEFAULT_JOBS})")
+    rebuild.set_defaults(func=cmd_rebuild)
+
+    backup = subparsers.add_parser("backup", help="backup/modules und backup/configs abgleichen und Snapshot anlegen")
+    backup.add_argument("--dry-run", action="store_true", help="Nur auflisten, nichts kopieren")
+    backup.set_defaults(func=cmd_backup)
+
+    restore = subparsers.add_parser("restore", help="modules/ und configs/ aus backup/ oder einem Snapshot wiederherstellen")
+    restore.add_argument("--snapshot", metavar="ID", help="Snapshot (oder Anfang seiner ID) statt backup/")
+    restore.add_argument("--dry-run", action="store_true", help="Nur auflisten, nichts ändern")
+    restore.set_defaults(func=cmd_restore)
+
+    snapshots = subparsers.add_parser("snapshots", help="Snapshots der Modulbibliothek auflisten")
+    snapshots.set_defaults(func=cmd_snapshots)
+
+    ael_export = subparsers.add_parser("ael-export", help="AEL-Datei komplett aus dem AEL-Ledger neu erzeugen")
+    ael_export.set_defaults(func=cmd_ael_export)
+
+    ael_compact = subparsers.add_parser("ael-compact", help="AEL-Datei komplett neu formatieren (Spaltenbreiten, Rahmen)")
+    ael_compact.set_defaults(func=cmd_ael_compact)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"Fehler: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
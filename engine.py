@@ -0,0 +1,1136 @@
+"""Tk-free core of the BetraTool: module discovery, file naming, merging and AEL export."""
+import os
+import sys
+import re
+import shutil
+import importlib
+import configparser
+from module_cache import ModuleCache, PARSED_SIZE_FACTOR, file_sha256
+from skeleton import SkeletonCache
+from build_store import BuildStore
+from build_manifest import find_build_manifests, load_build_manifest, outdated_files, write_build_manifest
+from ooxml_merge import OoxmlComposer, OoxmlPackage, UnsupportedModule, dedupe_media
+from style_registry import StyleRegistry
+from module_manifest import ModuleManifest, MANIFEST_NAME
+from module_check import ModuleChecker
+from module_search import SearchIndex
+from module_mirror import ModuleMirror, default_local_dir, is_network_path
+from library_backup import LibraryBackup
+import ael_writer
+from ael_ledger import AelLedger
+from merge_trace import MergeTrace, trace_path
+from preset_index import PresetIndex
+
+# --- CONFIGURATION ---
+MANDATORY_FILES = [
+    "1.0.0 - Lage der Baustelle, Lageplanskizze.docx",
+    "2.1.0 - Arbeitszeit.docx",
+    "2.2.0 - Dauer der Gleissperrungen, gesperrte Gleise, Weichen.docx",
+    "3.0.0 - Geschwindigkeitseinschränkungen und andere Besonderheiten für Zugfahrten.docx",
+    "4.0.0 - Zuständige Berechtigte.docx",
+    "4.1.0 - Fahrdienstleiter Weichenwärter Zugleiter BözM.docx",
+    "4.2.0 - Technischer Berechtigter - UV-Berechtigter.docx",
+    "5.0.0 - Betriebliche Regelungen.docx",
+    "5.1.0 - Regelungen für die Sicherung des Bahnbetriebes.docx",
+    "5.1.1 - Grundsatz.docx",
+    "5.1.2 - Fernmündliche Aufträge und Meldungen.docx",
+    "5.1.3 - Beginn der Arbeiten.docx",
+    "5.2.0 - Regelungen für die Durchführung des Bahnbetriebes.docx",
+    "5.2.15 - Außergewöhnliche Sendungen, Fahrzeuge, Züge.docx",
+    "5.3.0 - Regelungen für das gesperrte Gleis - Baugleis - unterbrochene Arbeitszeit - Ortsstellbereiche.docx",
+    "5.3.1 - Infrastrukturparameter.docx",
+    "5.4.0 - Regelungen für den Einsatz von Schienenfahrzeugen, Maschinen und Geräten und deren besonderen Einsatzbedingungen.docx",
+    "5.4.1 - Grundsätze.docx",
+    "6.0.0 - Sicherung der Beschäftigten.docx",
+    "6.1.0 - Arbeiten im Gleisbereich.docx",
+    "6.2.0 - Arbeiten an oder in der Nähe von aktiven Teilen der Oberleitungsanlage.docx",
+    "7.0.0 - Verantwortliche.docx",
+    "8.0.0 - Angaben zur Bautechnologie-Bauablauf-Baustellenlogistik.docx",
+    "9.0.0 - Sonstige Angaben.docx",
+    "9.1.0 - Anlagen - Zugestimmt - Verteiler.docx"
+]
+
+NUM_PRESETS = 5
+ALL_PREFIXES = ["0.", "1.", "2.", "3.", "4.", "5.", "6.", "7.", "8.", "9."]
+DOC_TYPES = ["Betra", "BA"]
+AEL_FILE_NAME = "AEL-Verrechnung.xlsx"
+AEL_LEDGER_NAME = "AEL-Ledger.sqlite"
+MERGE_BACKENDS = ["docxcompose", "ooxml"]
+# Modules parsed ahead of the (sequential) append step
+DEFAULT_MERGE_WORKERS = min(4, os.cpu_count() or 1)
+# Worker processes of rebuild_outputs and check_modules
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+# Parsed modules the background prefetch may hold; beyond it, files are only normalized
+PREFETCH_BUDGET_BYTES = 256 * 1024 * 1024
+# LocalMirror in config.ini: read modules/ through a local copy (auto: if it is on a network drive)
+MIRROR_SETTINGS = ["auto", "yes", "no"]
+# Imported on first use (or by preload_libraries), not at startup
+HEAVY_MODULES = ["openpyxl", "openpyxl.styles", "docx", "docxcompose.composer"]
+
+AEL_HEADERS = [
+    "Auftragsart", "Eckstarttermin", "Eckendtermin", "AAR-ProjektNr", "Kurztext",
+    "Verantw.ArbPl.", "Auftrag", "AAR-Auftr.-Nr.", "(Buchungsdatum)\nDatum", "Name",
+    "Arbeitsplatz (A0BBK, A0BETRA oder A0SIPLA)", "(LArt)\nFAA\n(immer 1065)",
+    "Werk\n(immer 16ES)", "Einheit\n(immer MIN)", "(Ist-Arbeit)\nMenge",
+    "(Rückmeldetext)\nTätigkeitsbezeichnung/Betra-Nr./SiPla-Nr.", "Bemerkung / Frage"
+]
+
+# ---------------------
+
+def get_base_path():
+    """Folder holding modules/, configs/ and output/ (next to the .exe when frozen)."""
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def natural_sort_key(s):
+    """Sorts strings 'naturally' (e.g., 1, 2, 10) instead of alphabetically (1, 10, 2)."""
+    filename = os.path.basename(s)
+    return [int(c) if c.isdigit() else c.lower() for c in re.split('([0-9]+)', filename)]
+
+
+def chapter_of(filename):
+    """Returns the chapter number of a module file, e.g. '5.1.11' for '5.1.11 - ....docx'."""
+    return os.path.basename(filename).split(" - ", 1)[0].strip()
+
+
+def parse_prefixes(modules_str):
+    """Splits a comma separated preset string into module prefixes."""
+    return [p.strip() for p in modules_str.split(',') if p.strip()]
+
+
+def build_base_name(doc_type, regional_code_full, serial_num, year):
+    """File/folder name of a Betra, e.g. 'Betra F12 0042-26'."""
+    return f"{doc_type} {regional_code_full} {serial_num}-{year}"
+
+
+def load_settings(config_file_path):
+    """
+    Reads the SETTINGS section of config.ini.
+    Raises FileNotFoundError/ValueError if the file is missing or incomplete.
+    """
+    if not os.path.exists(config_file_path):
+        raise FileNotFoundError("Config file not found.")
+
+    config = configparser.ConfigParser()
+    config.read(config_file_path)
+
+    if 'SETTINGS' not in config or \
+       'RegionalCodeFull' not in config['SETTINGS'] or \
+       'NetworkName' not in config['SETTINGS'] or \
+       'Year' not in config['SETTINGS'] or \
+       'UserName' not in config['SETTINGS']:
+        raise ValueError("Config file is incomplete.")
+
+    settings = {
+        'regional_code_full': config['SETTINGS']['RegionalCodeFull'],
+        'network_name': config['SETTINGS']['NetworkName'],
+        'year': config['SETTINGS']['Year'],
+        'user_name': config['SETTINGS']['UserName'],
+        'merge_backend': config['SETTINGS'].get('MergeBackend', MERGE_BACKENDS[0]),
+        'trace_summary': config['SETTINGS'].getboolean('TraceSummary', fallback=False),
+        'merge_workers': config['SETTINGS'].getint('MergeWorkers', fallback=DEFAULT_MERGE_WORKERS),
+        'memoize_builds': config['SETTINGS'].getboolean('MemoizeBuilds', fallback=True),
+        'local_mirror': config['SETTINGS'].get('LocalMirror', "auto").lower(),
+    }
+    if settings['local_mirror'] not in MIRROR_SETTINGS:
+        print(f"Unbekannte Einstellung LocalMirror '{settings['local_mirror']}', verwende 'auto'.")
+        settings['local_mirror'] = "auto"
+    if settings['merge_backend'] not in MERGE_BACKENDS:
+        print(f"Unbekanntes MergeBackend '{settings['merge_backend']}', verwende '{MERGE_BACKENDS[0]}'.")
+        settings['merge_backend'] = MERGE_BACKENDS[0]
+
+    if settings['year'] != "26":
+        print("Alte Jahr-Einstellung gefunden. Erzwinge '26' für Modul-Kompatibilität.")
+        settings['year'] = "26"
+        config['SETTINGS']['Year'] = "26"
+        with open(config_file_path, 'w') as configfile:
+            config.write(configfile)
+
+    if not settings['regional_code_full'] or not settings['network_name'] or not settings['user_name']:
+        raise ValueError("Config values are empty.")
+
+    return settings
+
+
+def parse_network_data(network_data_file_path):
+    """Reads BetraNetzziffern.txt into {RB name: {network code: network name}}."""
+    network_data = {}
+    with open(network_data_file_path, 'r', encoding='utf-8') as f:
+        current_rb = None
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if "," not in line:
+                current_rb = line
+                if current_rb not in network_data:
+                    network_data[current_rb] = {}
+            else:
+                if current_rb is None:
+                    continue
+                parts = line.split(",", 1)
+                if len(parts) == 2:
+                    code = parts[0].strip()
+                    name = parts[1].strip()
+                    network_data[current_rb][code] = name
+    return network_data
+
+
+def load_presets(presets_file_path):
+    """
+    Reads presets.ini and returns (preset_config, presets), where presets is
+    {section: {'Name': ..., 'Modules': ...}} for every PRESET_<n> section, in the
+    order of n. Old files using the 'Bausteine' key are migrated in place.
+    Raises FileNotFoundError/ValueError if the file is missing or has no presets.
+    """
+    if not os.path.exists(presets_file_path):
+        raise FileNotFoundError("Presets file not found.")
+
+    preset_config = configparser.ConfigParser()
+    try:
+        preset_config.read(presets_file_path)
+    except UnicodeDecodeError:
+        # Written by the Windows GUI in the ANSI codepage
+        preset_config = configparser.ConfigParser()
+        preset_config.read(presets_file_path, encoding='cp1252')
+
+    sections = sorted((s for s in preset_config.sections() if re.fullmatch(r'PRESET_\d+', s)),
+                      key=lambda s: int(s[len('PRESET_'):]))
+    if not sections:
+        raise ValueError("No preset sections.")
+
+    presets = {}
+    for section in sections:
+        name = preset_config[section]['Name']
+        if 'Bausteine' in preset_config[section]:
+            modules = preset_config[section]['Bausteine']
+            preset_config[section]['Modules'] = modules
+            del preset_config[section]['Bausteine']
+            with open(presets_file_path, 'w') as f:
+                preset_config.write(f)
+        else:
+            modules = preset_config[section]['Modules']
+
+        presets[section] = {'Name': name, 'Modules': modules}
+
+    return preset_config, presets
+
+
+def compile_presets(module_files, presets):
+    """
+    PresetIndex (see preset_index.py) of presets over module_files, in their order.
+    'Alle' (every chapter) is always defined, so presets can refer to it as '@Alle'.
+    """
+    presets = dict(presets)
+    if not any(p['Name'].casefold() == "alle" for p in presets.values()):
+        presets['ALLE'] = {'Name': "Alle", 'Modules': ", ".join(ALL_PREFIXES)}
+    return PresetIndex([os.path.basename(p) for p in module_files], presets)
+
+
+def build_ael_row(project_num, kurztext, user_name, today_date, betra_name, sonstiges):
+    """Returns one AEL row in the column order of AEL_HEADERS."""
+    new_row_data = [""] * len(AEL_HEADERS)
+
+    new_row_data[4] = kurztext                      # E: Kurztext
+    new_row_data[7] = project_num                   # H: AAR-Auftr.-Nr.
+    new_row_data[8] = today_date                    # I: Datum
+    new_row_data[9] = user_name                     # J: Name
+    new_row_data[10] = "A0BETRA"                    # K: Arbeitsplatz
+    new_row_data[11] = "1065"                       # L: FAA
+    new_row_data[12] = "16ES"                       # M: Werk
+    new_row_data[13] = "MIN"                        # N: Einheit
+    new_row_data[15] = betra_name                   # P: Tätigkeitsbezeichnung
+    new_row_data[16] = sonstiges                    # Q: Bemerkung / Frage
+    return new_row_data
+
+
+def update_ael_excel(excel_path, project_num, kurztext, leistung_dritte, user_name, today_date, betra_name, sonstiges):
+    """
+    Creates or updates the AEL Excel file with one new row.
+    Raises PermissionError if the file is opened in Excel.
+    """
+    new_row_data = build_ael_row(project_num, kurztext, user_name, today_date, betra_name, sonstiges)
+    append_ael_cells(excel_path, new_row_data, leistung_dritte)
+
+
+def append_ael_cells(excel_path, new_row_data, leistung_dritte):
+    """update_ael_excel for a ready-made row (list of cell values in AEL_HEADERS order)."""
+    import openpyxl
+    from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+
+    headers = AEL_HEADERS
+
+    fill_yellow_header = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
+    fill_red_header = PatternFill(start_color="F8CBAD", end_color="F8CBAD", fill_type="solid")
+    fill_yellow_row = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+
+    header_font = Font(name='DB Neo Office Head', size=11, bold=True)
+    data_font = Font(name='Db Neo Office', size=11, bold=False)
+
+    # Column indices (0-based) for red header color: I, J, K, O, P
+    red_header_indices = [8, 9, 10, 14, 15]
+
+    thin_border_side = Side(border_style="thin", color="000000")
+    full_border = Border(left=thin_border_side, right=thin_border_side, top=thin_border_side, bottom=thin_border_side)
+
+    # Header alignment
+    header_alignment = Alignment(wrap_text=True, horizontal='center', vertical='center')
+
+    if not os.path.exists(excel_path):
+        wb = openpyxl.Workbook()
+        sheet = wb.active
+        sheet.title = "AEL-Aufträge"
+        sheet.append(headers)
+
+        # Apply header styles (color, font, border, alignment)
+        for col_idx, cell in enumerate(sheet[1], 1): # 1-based index
+            if (col_idx - 1) in red_header_indices:
+                cell.fill = fill_red_header
+            else:
+                cell.fill = fill_yellow_header
+            cell.border = full_border
+            cell.font = header_font
+            cell.alignment = header_alignment
+
+        sheet.append(new_row_data)
+        # Apply data styles (font, border)
+        new_row_index = sheet.max_row
+        for cell in sheet[new_row_index]:
+            cell.border = full_border
+            cell.font = data_font
+
+    else:
+        wb = openpyxl.load_workbook(excel_path)
+        sheet = wb.active
+        sheet.append(new_row_data)
+
+        # Apply data styles (font, border)
+        new_row_index = sheet.max_row
+        for cell in sheet[new_row_index]:
+            cell.border = full_border
+            cell.font = data_font
+
+    # Apply row color if needed (overwrites border fill, so border must be applied first)
+    if leistung_dritte:
+        new_row_index = sheet.max_row
+        for cell in sheet[new_row_index]:
+            cell.fill = fill_yellow_row
+            cell.border = full_border # Ensure border is re-applied
+            cell.font = data_font     # Ensure font is re-applied
+
+    # Auto-adjust column width
+    max_lengths = []
+    for col in sheet.columns:
+        max_length = 0
+        column_letter = col[0].column_letter
+        for cell in col:
+            try:
+                cell_value = str(cell.value)
+                lines = cell_value.split('\n')
+                cell_max_line = max(len(line) for line in lines)
+
+                if cell_max_line > max_length:
+                    max_length = cell_max_line
+            except:
+                pass
+        adjusted_width = max(10, max_length + 2)
+        sheet.column_dimensions[column_letter].width = adjusted_width
+        max_lengths.append(max_length)
+
+    wb.save(excel_path)
+    ael_writer.save_sidecar(excel_path, max_lengths)
+
+
+def sync_ael_excel(ledger, excel_path):
+    """
+    Writes the ledger rows that are not in the Excel file yet. The ledger's write
+    lock is held meanwhile, so only one user at a time touches the workbook.
+    Returns False if the workbook is locked (the rows follow with the next sync).
+    """
+    with ledger.transaction() as conn:
+        _import_legacy_ael(ledger, conn, excel_path)
+        try:
+            for row_id, cells, leistung_dritte in ledger.rows(conn, after_id=ledger.exported_id(conn)):
+                if not ael_writer.append_row(excel_path, cells, leistung_dritte):
+                    append_ael_cells(excel_path, cells, leistung_dritte)
+                ledger.set_exported_id(conn, row_id)
+        except PermissionError:
+            return False
+    return True
+
+
+def export_ael_excel(ledger, excel_path):
+    """Regenerates the whole Excel file from the ledger (headers, formats, column widths)."""
+    import openpyxl
+    from openpyxl.styles import PatternFill
+
+    fill_yellow_row = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+    with ledger.transaction() as conn:
+        _import_legacy_ael(ledger, conn, excel_path)
+        rows = ledger.rows(conn)
+
+        wb = openpyxl.Workbook()
+        sheet = wb.active
+        sheet.title = "AEL-Aufträge"
+        sheet.append(AEL_HEADERS)
+        for _, cells, leistung_dritte in rows:
+            sheet.append(cells)
+            if leistung_dritte:
+                for cell in sheet[sheet.max_row]:
+                    cell.fill = fill_yellow_row
+        restyle_ael_sheet(sheet)
+        max_lengths = ael_writer.autosize(sheet)
+
+        tmp_path = excel_path + ".tmp"
+        try:
+            wb.save(tmp_path)
+            os.replace(tmp_path, excel_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        ael_writer.save_sidecar(excel_path, max_lengths)
+        if rows:
+            ledger.set_exported_id(conn, rows[-1][0])
+    return len(rows)
+
+
+def _import_legacy_ael(ledger, conn, excel_path):
+    """Once per ledger: takes over the rows of an existing Excel file, which was the record before."""
+    if ledger.get_meta(conn, 'initialized'):
+        return
+    if os.path.exists(excel_path):
+        import openpyxl
+        wb = openpyxl.load_workbook(excel_path, read_only=True)
+        sheet = wb.active
+        row_id = 0
+        for row in sheet.iter_rows(min_row=2):
+            values = ["" if cell.value is None else cell.value for cell in row][:len(AEL_HEADERS)]
+            if not any(str(v).strip() for v in values):
+                continue
+            values += [""] * (len(AEL_HEADERS) - len(values))
+            dritte = any(getattr(cell, 'fill', None) is not None and cell.fill.fill_type == "solid"
+                         and str(cell.fill.fgColor.rgb).endswith("FFC000") for cell in row)
+            row_id = ledger.append(conn, [v if isinstance(v, (int, float)) else str(v) for v in values], dritte)
+        wb.close()
+        ledger.set_exported_id(conn, row_id)
+    ledger.set_meta(conn, 'initialized', 1)
+
+
+def restyle_ael_sheet(sheet):
+    """Re-applies header and row formats to every row of the AEL sheet (rows with the yellow fill keep it)."""
+    from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+
+    fill_yellow_header = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
+    fill_red_header = PatternFill(start_color="F8CBAD", end_color="F8CBAD", fill_type="solid")
+    fill_yellow_row = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
+    header_font = Font(name='DB Neo Office Head', size=11, bold=True)
+    data_font = Font(name='Db Neo Office', size=11, bold=False)
+    red_header_indices = [8, 9, 10, 14, 15]
+    thin_border_side = Side(border_style="thin", color="000000")
+    full_border = Border(left=thin_border_side, right=thin_border_side, top=thin_border_side, bottom=thin_border_side)
+    header_alignment = Alignment(wrap_text=True, horizontal='center', vertical='center')
+
+    for row in sheet.iter_rows():
+        if row[0].row == 1:
+            for col_idx, cell in enumerate(row):
+                cell.fill = fill_red_header if col_idx in red_header_indices else fill_yellow_header
+                cell.border = full_border
+                cell.font = header_font
+                cell.alignment = header_alignment
+            continue
+        dritte = any(cell.fill.fill_type == "solid" and str(cell.fill.fgColor.rgb).endswith("FFC000") for cell in row)
+        for cell in row:
+            cell.border = full_border
+            cell.font = data_font
+            if dritte:
+                cell.fill = fill_yellow_row
+
+
+def compact_ael_excel(excel_path):
+    """Restyles the whole AEL file and recomputes all column widths."""
+    ael_writer.compact(excel_path, restyle_ael_sheet)
+
+
+def preload_libraries():
+    """
+    Imports the Word and Excel libraries, which the merge and AEL code import on
+    first use. The GUI calls this on a background thread once its window is up,
+    so the first merge does not pay for the imports.
+    """
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+class MergeCancelled(Exception):
+    """Raised by merge_documents when the cancel event was set."""
+
+
+def _pipelined(file_paths, load, workers, lookahead=None):
+    """
+    Yields (file_path, result, error) in the order of file_paths, while load(file_path)
+    runs on a pool of 'workers' threads for up to 'lookahead' files ahead (default:
+    twice the workers). error is the exception load raised, result is then None.
+    With workers <= 1 everything runs in the caller's thread. Closing the generator
+    drops the files that were not started yet.
+    """
+    if workers <= 1:
+        for file_path in file_paths:
+            try:
+                yield file_path, load(file_path), None
+            except Exception as e:
+                yield file_path, None, e
+        return
+
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    lookahead = max(lookahead or 2 * workers, 1)
+    pending = deque()
+    paths = iter(file_paths)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="merge-load")
+    try:
+        for file_path in paths:
+            pending.append((file_path, executor.submit(load, file_path)))
+            if len(pending) >= lookahead:
+                break
+        while pending:
+            file_path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(load, next_path)))
+            try:
+                yield file_path, future.result(), None
+            except Exception as e:
+                yield file_path, None, e
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def merge_documents(file_paths, save_path, module_cache=None, skeleton_cache=None,
+                    progress=None, cancel_event=None, backend="docxcompose", style_registry=None, trace=None,
+                    workers=DEFAULT_MERGE_WORKERS):
+    """
+    Merges a list of .docx files into a single document.
+    The first file (file_paths[0]) is the base document.
+    backend "ooxml" merges the zip parts directly (see ooxml_merge.py) and falls back
+    to docxcompose if a module uses something that backend does not support. It takes
+    the modules' style/numbering tables from style_registry, if given.
+    With a ModuleCache, the appended modules are taken from (and kept in) the cache.
+    With a SkeletonCache, the cover page and the mandatory modules come pre-composed
+    and only the optional modules are inserted at their place in the order.
+
+    progress(done, total, filename) is called after every file. If cancel_event is
+    set, MergeCancelled is raised. The result is written to a temporary file first
+    and only renamed to save_path when complete, so save_path is never half-written.
+
+    Modules are loaded and parsed on up to 'workers' threads a few files ahead of
+    the append step, which stays on the calling thread and in order.
+
+    Identical images are stored only once. Every stage is timed into trace (a
+    MergeTrace, see merge_trace.py). Modules that cannot be appended are skipped
+    and listed in the result. Returns a dict with 'media_bytes_saved' (the image
+    bytes that were not written again), 'failed' (trace.failures) and 'trace'.
+    """
+    if trace is None:
+        trace = MergeTrace(os.path.basename(save_path))
+    if not file_paths:
+        return {'media_bytes_saved': 0, 'failed': trace.failures, 'trace': trace}
+
+    if not os.path.exists(file_paths[0]):
+        raise FileNotFoundError(f"Die Basis-Datei (Deckblatt) konnte nicht gefunden werden: {file_paths[0]}")
+
+    if backend == "ooxml":
+        try:
+            return _merge_ooxml(file_paths, save_path, module_cache=module_cache, style_registry=style_registry,
+                                progress=progress, cancel_event=cancel_event, trace=trace, workers=workers)
+        except UnsupportedModule as e:
+            print(f"OOXML merge not possible ({e}), using docxcompose.")
+            # The docxcompose pass records every module again
+            trace.restart(f"ooxml -> docxcompose: {e}")
+
+    from docx import Document
+    from docxcompose.composer import Composer
+
+    boundaries = {}
+    master_doc = None
+    if skeleton_cache is not None:
+        fixed_paths = [p for p in file_paths[1:]
+                       if os.path.basename(p) in MANDATORY_FILES and os.path.exists(p)]
+        try:
+            with trace.span("open", file_paths[0], skeleton=True):
+                skeleton = skeleton_cache.get(file_paths[0], fixed_paths)
+                master_doc, composer = skeleton.open()
+            boundaries = skeleton.boundaries
+        except Exception as e:
+            print(f"Skeleton not usable, composing from scratch: {e}")
+            master_doc = None
+            boundaries = {}
+
+    if master_doc is None:
+        with trace.span("open", file_paths[0]):
+            master_doc = Document(file_paths[0])
+            composer = Composer(master_doc)
+
+    total = len(file_paths)
+    if progress is not None:
+        progress(1, total, os.path.basename(file_paths[0]))
+
+    # Optional modules go behind the last skeleton module before them (or behind the cover)
+    anchor_index = boundaries.get(os.path.basename(file_paths[0]))
+    inserted = 0
+    media_bytes_saved = 0
+
+    def load(file_path):
+        if os.path.basename(file_path) in boundaries or not os.path.exists(file_path):
+            return None
+        with trace.span("parse", file_path):
+            if module_cache is not None:
+                return module_cache.get(file_path)
+            return Document(file_path)
+
+    # Modules are parsed ahead on worker threads; only the appends run here, in order
+    modules = _pipelined(file_paths[1:], load, workers)
+    several_sections = None
+    try:
+        for done, (file_path, doc_to_append, error) in enumerate(modules, 2):
+            if cancel_event is not None and cancel_event.is_set():
+                raise MergeCancelled()
+            if progress is not None:
+                progress(done, total, os.path.basename(file_path))
+            if os.path.basename(file_path) in boundaries:
+                anchor_index = boundaries[os.path.basename(file_path)]
+                continue
+            if error is not None:
+                print(f"Error appending {file_path}: {error}")
+                trace.failure("parse", file_path, error)
+                continue
+            if doc_to_append is None:
+                print(f"Warning: Skipping file (not found): {file_path}")
+                continue
+            if boundaries and len(doc_to_append.sections) > 1:
+                # docxcompose only fixes section types when appending at the end
+                several_sections = file_path
+                break
+            try:
+                with trace.span("append", file_path):
+                    media_bytes_saved += _shared_image_bytes(master_doc, doc_to_append)
+                    if boundaries:
+                        body_length = len(master_doc.element.body)
+                        composer.insert(anchor_index + inserted, doc_to_append)
+                        inserted += len(master_doc.element.body) - body_length
+                    else:
+                        composer.append(doc_to_append)
+            except Exception as inner_exception:
+                print(f"Error appending {file_path}: {inner_exception}")
+                trace.failure("append", file_path, inner_exception)
+    finally:
+        modules.close()
+
+    if several_sections is not None:
+        # Start over only once this attempt's pipeline and documents are released
+        master_doc = composer = doc_to_append = None
+        print(f"{several_sections} has several sections, composing without skeleton.")
+        trace.restart(f"skeleton -> docxcompose: {os.path.basename(several_sections)} has several sections")
+        return merge_documents(file_paths, save_path, module_cache=module_cache,
+                               progress=progress, cancel_event=cancel_event, trace=trace, workers=workers)
+
+    if cancel_event is not None and cancel_event.is_set():
+        raise MergeCancelled()
+
+    tmp_path = save_path + ".part"
+    try:
+        with trace.span("save"):
+            composer.save(tmp_path)
+        with trace.span("dedupe"):
+            media_bytes_saved += dedupe_media(tmp_path)
+        os.replace(tmp_path, save_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if module_cache is not None:
+        module_cache.save_index()
+    return {'media_bytes_saved': media_bytes_saved, 'failed': trace.failures, 'trace': trace}
+
+
+def _shared_image_bytes(master_doc, doc):
+    """Bytes of the images of doc that docxcompose will not copy, as the package already has them."""
+    from docx.opc.constants import RELATIONSHIP_TYPE as RT
+    known = {part.sha1 for part in master_doc.part.package.image_parts}
+    image_parts = {rel.target_part for rel in doc.part.rels.values()
+                   if rel.reltype == RT.IMAGE and not rel.is_external}
+    return sum(len(part.blob) for part in image_parts if part.sha1 in known)
+
+
+class _LoadError(Exception):
+    """A module could not be loaded; stage names the step that failed."""
+
+    def __init__(self, stage, error):
+        super().__init__(str(error))
+        self.stage = stage
+
+
+def _merge_ooxml(file_paths, save_path, module_cache=None, style_registry=None, progress=None, cancel_event=None,
+                 trace=None, workers=DEFAULT_MERGE_WORKERS):
+    """merge_documents with the OoxmlComposer; raises UnsupportedModule to request the fallback."""
+    if trace is None:
+        trace = MergeTrace(os.path.basename(save_path))
+    with trace.span("open", file_paths[0]):
+        composer = OoxmlComposer(file_paths[0])
+
+    total = len(file_paths)
+    if progress is not None:
+        progress(1, total, os.path.basename(file_paths[0]))
+
+    def load(file_path):
+        """Reads the module into memory and looks up its style table (on a loader thread)."""
+        if not os.path.exists(file_path):
+            return None
+        stage = "open"
+        try:
+            with trace.span("open", file_path):
+                module_path = module_cache.normalized_path(file_path) if module_cache is not None else file_path
+                with open(module_path, 'rb') as f:
+                    module = OoxmlPackage(file_path, f.read())
+            table = None
+            if style_registry is not None:
+                stage = "styles"
+                with trace.span("styles", file_path):
+                    table = style_registry.table(file_path)
+        except Exception as e:
+            raise _LoadError(stage, e)
+        return module, table
+
+    modules = _pipelined(file_paths[1:], load, workers)
+    try:
+        for done, (file_path, loaded, error) in enumerate(modules, 2):
+            if cancel_event is not None and cancel_event.is_set():
+                raise MergeCancelled()
+            if progress is not None:
+                progress(done, total, os.path.basename(file_path))
+            if error is not None:
+                print(f"Error appending {file_path}: {error}")
+                trace.failure(getattr(error, 'stage', "open"), file_path, error)
+                continue
+            if loaded is None:
+                print(f"Warning: Skipping file (not found): {file_path}")
+                continue
+            module, table = loaded
+            try:
+                with trace.span("append", file_path):
+                    composer.append(module, table)
+            except UnsupportedModule:
+                raise
+            except Exception as inner_exception:
+                print(f"Error appending {file_path}: {inner_exception}")
+                trace.failure("append", file_path, inner_exception)
+        if cancel_event is not None and cancel_event.is_set():
+            raise MergeCancelled()
+    except BaseException:
+        composer.close()
+        raise
+    finally:
+        modules.close()
+
+    tmp_path = save_path + ".part"
+    try:
+        with trace.span("save"):
+            composer.save(tmp_path)
+        with trace.span("dedupe"):
+            media_bytes_saved = composer.media_bytes_saved + dedupe_media(tmp_path)
+        os.replace(tmp_path, save_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if module_cache is not None:
+        module_cache.save_index()
+    return {'media_bytes_saved': media_bytes_saved, 'failed': trace.failures, 'trace': trace}
+
+
+class BetraEngine:
+    """Everything needed to build a Betra from the modules/configs/output folders, without any UI."""
+
+    def __init__(self, base_path=None):
+        self.base_path = base_path or get_base_path()
+        self.modules_dir = os.path.join(self.base_path, "modules")
+        self.output_dir = os.path.join(self.base_path, "output")
+        self.configs_dir = os.path.join(self.base_path, "configs")
+        self.backup_dir = os.path.join(self.base_path, "backup")
+        self.config_file_path = os.path.join(self.configs_dir, "config.ini")
+        self.presets_file_path = os.path.join(self.configs_dir, "presets.ini")
+        self.network_data_file_path = os.path.join(self.configs_dir, "BetraNetzziffern.txt")
+        self.ael_file_path = os.path.join(self.output_dir, AEL_FILE_NAME)
+        self.ael_ledger = AelLedger(os.path.join(self.output_dir, AEL_LEDGER_NAME))
+        self.merge_backend = MERGE_BACKENDS[0]
+        self.merge_workers = DEFAULT_MERGE_WORKERS
+        self.memoize_builds = True
+        # The library folder; modules_dir is where modules are read from (the local mirror, if used)
+        self.library_dir = self.modules_dir
+        self.mirror = None
+        self.local_dir = None
+        self._open_caches(os.path.join(self.base_path, "cache"), os.path.join(self.configs_dir, MANIFEST_NAME))
+
+    def _open_caches(self, cache_dir, manifest_path):
+        self.cache_dir = cache_dir
+        self.module_cache = ModuleCache(self.cache_dir)
+        self.skeleton_cache = SkeletonCache(self.cache_dir, self.module_cache)
+        self.style_registry = StyleRegistry(self.cache_dir, self.module_cache)
+        self.build_store = BuildStore(self.cache_dir, self.module_cache)
+        self.module_checker = ModuleChecker(self.cache_dir)
+        self.search_index = SearchIndex(self.cache_dir)
+        self.library_backup = LibraryBackup(self.backup_dir, self.cache_dir)
+        self.manifest = ModuleManifest(manifest_path, self.modules_dir, natural_sort_key)
+
+    def use_mirror(self, local_dir=None):
+        """
+        Reads the modules from a local mirror of modules/ from now on (see
+        module_mirror.py), kept in local_dir (default: per user, outside the share)
+        together with the manifest and caches. scan_modules syncs the mirror first.
+        """
+        local_dir = local_dir or default_local_dir(self.base_path)
+        self.local_dir = local_dir
+        self.mirror = ModuleMirror(self.library_dir, os.path.join(local_dir, "modules"))
+        self.modules_dir = self.mirror.mirror_dir
+        self._open_caches(os.path.join(local_dir, "cache"), os.path.join(local_dir, MANIFEST_NAME))
+
+    def apply_mirror_setting(self, setting):
+        """LocalMirror of config.ini: 'yes', 'no' or 'auto' (mirror if modules/ is on a network drive)."""
+        if self.mirror is None and (setting == "yes" or (setting == "auto" and is_network_path(self.library_dir))):
+            self.use_mirror()
+
+    def scan_modules(self, sync_mirror=True):
+        """
+        Refreshes the module manifest and the search index and returns (cover_pages,
+        module_files). cover_pages is a list of {'name', 'path'} dicts, module_files
+        a list of paths, both in natural sort order. Only new or touched files are opened.
+        With the local mirror, the share is listed once and changed files are copied first
+        (unless sync_mirror is False).
+        """
+        if self.mirror is not None and sync_mirror:
+            copied, removed = self.mirror.sync()
+            if copied or removed:
+                print(f"Local mirror: {len(copied)} file(s) copied, {len(removed)} removed")
+        described = self.manifest.refresh()
+        if described:
+            print(f"Module manifest: {described} file(s) updated")
+        indexed = self.search_index.update(self.manifest)
+        if indexed:
+            print(f"Search index: {indexed} module(s) indexed")
+
+        cover_page_files = []
+        module_files = []
+
+        for file_path in self.manifest.paths():
+            filename = os.path.basename(file_path)
+            if filename.startswith("0."):
+                cover_page_files.append(file_path)
+            else:
+                module_files.append(file_path)
+
+        cover_pages = []
+        for file_path in cover_page_files:
+            display_name = os.path.splitext(os.path.basename(file_path))[0]
+            cover_pages.append({'name': display_name, 'path': file_path})
+
+        return cover_pages, module_files
+
+    def module_info(self, path):
+        """Manifest entry of a module (chapter, title, pages, paragraphs, styles, ...), or None."""
+        return self.manifest.get(path)
+
+    def check_modules(self, paths, jobs=DEFAULT_JOBS, progress=None):
+        """
+        Pre-flight check of module files (see module_check.py); returns {path: result}
+        with result = {'errors': [...], 'warnings': [...]}. Modules with errors cannot
+        be merged. Only contents that were not checked before are opened.
+        """
+        files = []
+        for path in paths:
+            info = self.manifest.get(path)
+            sha256 = info.get('sha256') if info and os.path.dirname(path) == self.modules_dir else None
+            if sha256 is None:
+                try:
+                    sha256 = file_sha256(path)
+                except OSError:
+                    pass
+            files.append((path, sha256))
+        return self.module_checker.check(files, jobs=jobs, progress=progress)
+
+    def search_modules(self, query):
+        """Paths of the modules and cover pages matching the search query, best first (see module_search.py)."""
+        return [os.path.join(self.modules_dir, name) for name in self.search_index.search(query)]
+
+    def find_cover_page(self, cover_pages, name):
+        """Finds a cover page by display name, file name or chapter number ('0.0.1')."""
+        for cover in cover_pages:
+            filename = os.path.basename(cover['path'])
+            if name in (cover['name'], filename, chapter_of(filename)):
+                return cover['path']
+        return ""
+
+    def select_modules(self, module_files, chapters=(), prefixes=(), mask=0):
+        """
+        Returns the module paths to merge: all mandatory modules plus the modules
+        whose chapter is in 'chapters', whose file name starts with one of 'prefixes'
+        or whose bit is set in mask (a PresetIndex bitset over module_files).
+        Order follows module_files (natural sort order).
+        """
+        chapters = set(chapters)
+        selected = []
+        for index, file_path in enumerate(module_files):
+            if mask >> index & 1:
+                selected.append(file_path)
+                continue
+            filename = os.path.basename(file_path)
+            info = self.manifest.get(filename)
+            chapter = info['chapter'] if info else chapter_of(filename)
+            if filename in MANDATORY_FILES or \
+               chapter in chapters or \
+               os.path.splitext(filename)[0] in chapters or \
+               any(filename.startswith(prefix) for prefix in prefixes):
+                selected.append(file_path)
+        return selected
+
+    def output_paths(self, base_name):
+        """Returns (folder, save_path) for a Betra in output/<base_name>/<base_name>.docx."""
+        new_folder_path = os.path.join(self.output_dir, base_name)
+        save_path = os.path.join(new_folder_path, f"{base_name}.docx")
+        return new_folder_path, save_path
+
+    def merge_documents(self, file_paths, save_path, progress=None, cancel_event=None):
+        """
+        Merges the cover page (file_paths[0]) and modules into save_path, with
+        self.merge_backend. Returns the statistics of merge_documents; the trace
+        is saved next to the output (<name>.trace.json, see merge_trace.py).
+        With self.memoize_builds, a build of the same cover page and modules is
+        copied from the build store ('memoized' is True then, see build_store.py).
+        """
+        trace = MergeTrace(os.path.basename(save_path))
+        key = stats = None
+        if self.memoize_builds and file_paths and os.path.exists(file_paths[0]):
+            with trace.span("memo"):
+                try:
+                    key = self.build_store.key_for(file_paths, self.merge_backend)
+                    stats = self.build_store.restore(key, save_path)
+                except OSError as e:
+                    print(f"Build store not usable: {e}")
+                self.module_cache.save_index()
+            if stats is not None:
+                if progress is not None:
+                    progress(len(file_paths), len(file_paths), os.path.basename(save_path))
+                stats.update({'failed': trace.failures, 'trace': trace, 'memoized': True})
+                self._record_build(save_path, file_paths, stats)
+                trace.save(trace_path(save_path))
+                return stats
+
+        stats = merge_documents(file_paths, save_path, module_cache=self.module_cache,
+                                skeleton_cache=self.skeleton_cache,
+                                progress=progress, cancel_event=cancel_event, backend=self.merge_backend,
+                                style_registry=self.style_registry, trace=trace, workers=self.merge_workers)
+        if key is not None:
+            with trace.span("memo"):
+                self.build_store.store(key, save_path, stats)
+        stats['memoized'] = False
+        self._record_build(save_path, file_paths, stats)
+        trace.save(trace_path(save_path))
+        return stats
+
+    def _record_build(self, save_path, file_paths, stats):
+        """Writes the build manifest (<name>.build.json) with the module versions of save_path."""
+        files = []
+        for path in file_paths:
+            try:
+                files.append((path, self.module_cache.content_hash(path)))
+            except OSError:
+                continue
+        self.module_cache.save_index()
+        write_build_manifest(save_path, files, self.merge_backend, [f['file'] for f in stats['failed']])
+
+    def outdated_outputs(self):
+        """
+        Finds the outputs in output/<name>/ that were built from modules which have
+        changed, been renamed or been removed since. Returns [(sidecar path, build
+        manifest, changes)] with changes as returned by build_manifest.outdated_files.
+        Outputs without a build manifest (built before it existed) are not found.
+        """
+        self.scan_modules()
+        current = {name: entry['sha256'] for name, entry in self.manifest.entries.items() if entry.get('sha256')}
+        outdated = []
+        for sidecar_path in find_build_manifests(self.output_dir):
+            try:
+                manifest = load_build_manifest(sidecar_path)
+            except (OSError, ValueError) as e:
+                print(f"Could not read build manifest '{sidecar_path}': {e}")
+                continue
+            changes = outdated_files(manifest, current)
+            if changes:
+                outdated.append((sidecar_path, manifest, changes))
+        return outdated
+
+    def rebuild_output(self, sidecar_path):
+        """
+        Builds an output again from its build manifest, with the current version of
+        each module; renamed modules are taken under their new name, removed ones are
+        left out, and the ones that failed to append last time are tried again. The
+        previous document is kept as <name>.bak-<build time>.docx, as it may contain
+        cover fields filled in since. Returns a dict with 'output', 'backup',
+        'dropped' (file names left out) and 'failed' (as in merge_documents).
+        """
+        manifest = load_build_manifest(sidecar_path)
+        current = {name: entry['sha256'] for name, entry in self.manifest.entries.items() if entry.get('sha256')}
+        replaced = {old: new for old, new, _ in outdated_files(manifest, current)}
+        file_paths = []
+        dropped = []
+        for entry in manifest['files']:
+            name = replaced.get(entry['file'], entry['file'])
+            if name is None:
+                dropped.append(entry['file'])
+            else:
+                file_paths.append(os.path.join(self.modules_dir, name))
+        if not file_paths or manifest['files'][0]['file'] in dropped:
+            raise FileNotFoundError(f"Das Deckblatt '{manifest['files'][0]['file']}' gibt es nicht mehr.")
+
+        save_path = os.path.join(os.path.dirname(sidecar_path), manifest['output'])
+        backup_path = None
+        if os.path.exists(save_path):
+            stamp = "".join(c for c in manifest['built'] if c.isdigit())
+            backup_path = f"{os.path.splitext(save_path)[0]}.bak-{stamp}.docx"
+            if not os.path.exists(backup_path):
+                shutil.copy2(save_path, backup_path)
+
+        merge_backend = self.merge_backend
+        self.merge_backend = manifest.get('backend', merge_backend)
+        try:
+            stats = self.merge_documents(file_paths, save_path)
+        finally:
+            self.merge_backend = merge_backend
+        return {'output': save_path, 'backup': backup_path, 'dropped': dropped, 'failed': stats['failed']}
+
+    def rebuild_outputs(self, sidecar_paths, jobs=DEFAULT_JOBS):
+        """
+        Rebuilds several outputs (see rebuild_output), up to 'jobs' at once in
+        separate processes. Yields (sidecar path, result, error) as they finish.
+        """
+        # Hash and normalize every module once here, not in every process
+        for sidecar_path in sidecar_paths:
+            try:
+                manifest = load_build_manifest(sidecar_path)
+            except (OSError, ValueError):
+                continue
+            for entry in manifest['files']:
+                path = os.path.join(self.modules_dir, entry['file'])
+                if os.path.exists(path):
+                    self.module_cache.entry(path)
+        self.module_cache.save_index()
+
+        if jobs <= 1 or len(sidecar_paths) <= 1:
+            for sidecar_path in sidecar_paths:
+                try:
+                    yield sidecar_path, self.rebuild_output(sidecar_path), None
+                except Exception as e:
+                    yield sidecar_path, None, e
+            return
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(_rebuild_in_process, self.base_path, sidecar_path, self.local_dir): sidecar_path
+                       for sidecar_path in sidecar_paths}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+    def rebuild_style_registry(self):
+        """Compiles the style/numbering tables of all modules; returns the conflicting style names."""
+        cover_pages, module_files = self.scan_modules()
+        conflicts = self.style_registry.rebuild([c['path'] for c in cover_pages] + module_files)
+        self.module_cache.save_index()
+        return conflicts
+
+    def prefetch(self, key):
+        """
+        Warms the caches the next merge reads (see prefetch.py). key is ('module', path)
+        or ('cover', cover path, mandatory module paths in merge order): with docxcompose
+        the skeleton is composed, with the ooxml backend the mandatory modules are warmed.
+        """
+        if key[0] == 'cover':
+            fixed_paths = [path for path in key[2] if os.path.exists(path)]
+            if self.merge_backend == "ooxml":
+                for path in fixed_paths:
+                    self._prefetch_file(path)
+            else:
+                self.skeleton_cache.get(key[1], fixed_paths)
+        else:
+            self._prefetch_file(key[1])
+        self.module_cache.save_index()
+
+    def _prefetch_file(self, path):
+        """Normalizes (and hashes) a module; parses it too while within PREFETCH_BUDGET_BYTES."""
+        if self.merge_backend == "ooxml":
+            self.module_cache.normalized_path(path)
+            self.style_registry.table(path)
+            return
+        entry = self.module_cache.entry(path)
+        if self.module_cache.parsed_bytes + entry['unpacked'] * PARSED_SIZE_FACTOR <= PREFETCH_BUDGET_BYTES:
+            self.module_cache.get(path)
+
+    def _library_dirs(self):
+        """The live folders of backup_library/restore_library, by their name below backup/."""
+        return {'modules': self.library_dir, 'configs': self.configs_dir}
+
+    def backup_library(self, dry_run=False):
+        """
+        Updates backup/modules and backup/configs from the library (only changed files)
+        and records a snapshot; returns ({tree: steps}, snapshot id). See library_backup.py.
+        """
+        return self.library_backup.backup(self._library_dirs(), dry_run=dry_run)
+
+    def restore_library(self, snapshot_id=None, dry_run=False):
+        """Restores modules/ and configs/ from backup/ or from a snapshot; returns {tree: steps}."""
+        return self.library_backup.restore(self._library_dirs(), snapshot_id, dry_run=dry_run)
+
+    def append_ael_row(self, project_num, kurztext, leistung_dritte, user_name, today_date, betra_name, sonstiges,
+                       trace=None):
+        """
+        Records one AEL row in the ledger and brings output/AEL-Verrechnung.xlsx up to
+        date. Returns False if the Excel file is locked; the row is safe in the ledger
+        and goes into the Excel file with the next append or export.
+        Raises sqlite3.Error if the ledger itself cannot be written.
+        With the MergeTrace of the build, the two steps are added to its trace file.
+        """
+        if trace is None:
+            trace = MergeTrace(betra_name)
+        os.makedirs(self.output_dir, exist_ok=True)
+        row = build_ael_row(project_num, kurztext, user_name, today_date, betra_name, sonstiges)
+        try:
+            with trace.span("ledger"):
+                with self.ael_ledger.transaction() as conn:
+                    _import_legacy_ael(self.ael_ledger, conn, self.ael_file_path)
+                    self.ael_ledger.append(conn, row, leistung_dritte)
+            with trace.span("excel"):
+                return sync_ael_excel(self.ael_ledger, self.ael_file_path)
+        finally:
+            if trace.path:
+                trace.save()
+
+    def export_ael(self):
+        """Regenerates output/AEL-Verrechnung.xlsx from the ledger; returns the number of rows."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        return export_ael_excel(self.ael_ledger, self.ael_file_path)
+
+    def compact_ael(self):
+        """Full restyle of output/AEL-Verrechnung.xlsx (the normal appends skip this)."""
+        compact_ael_excel(self.ael_file_path)
+
+
+def _rebuild_in_process(base_path, sidecar_path, local_dir=None):
+    """rebuild_output in a worker process of BetraEngine.rebuild_outputs (local_dir: the mirror in use)."""
+    engine = BetraEngine(base_path)
+    if local_dir:
+        engine.use_mirror(local_dir)
+    engine.merge_workers = 1
+    return engine.rebuild_output(sidecar_path)
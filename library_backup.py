@@ -0,0 +1,291 @@
+"""
+Incremental backup and restore of the library (modules/ and configs/) against backup/.
+
+backup/modules and backup/configs hold the current backup as plain files. Both
+directions compare the two trees by content hash (cached by mtime and size in
+cache/backup-hashes.json) and only touch what differs: a file whose content is
+already on the other side under another name is renamed there instead of being
+copied again, files that are gone are deleted.
+
+Every backup also records a snapshot (backup/snapshots/<id>.json: file name ->
+sha256 per tree) and stores each content once in backup/objects/, so any earlier
+state can be restored. A restore first records the current state as a snapshot
+of its own, so it can be undone the same way. Per-user and generated files
+(config.ini, the module manifest) are left out.
+"""
+import os
+import json
+import shutil
+from datetime import datetime
+
+from module_cache import file_sha256
+from module_manifest import MANIFEST_NAME
+
+BACKUP_FORMAT = 1
+DEFAULT_KEEP_SNAPSHOTS = 20
+EXCLUDED_NAMES = {"config.ini", MANIFEST_NAME}
+
+
+def _is_library_file(name):
+    return name not in EXCLUDED_NAMES and not name.startswith("~$") and not name.endswith(".tmp")
+
+
+def plan_sync(source, target):
+    """
+    Steps that turn the tree 'target' into 'source' (both {relative path: sha256}):
+    ('rename', path, old path), ('copy', path, sha256) and ('delete', path, None),
+    in the order they have to run. Renames reuse target files whose path is not
+    in source; a file that stays in place is never moved away.
+    """
+    spare = {}
+    for path, sha256 in sorted(target.items()):
+        if path not in source:
+            spare.setdefault(sha256, []).append(path)
+
+    renames, copies = [], []
+    for path, sha256 in sorted(source.items()):
+        if target.get(path) == sha256:
+            continue
+        if spare.get(sha256):
+            renames.append(('rename', path, spare[sha256].pop(0)))
+        else:
+            copies.append(('copy', path, sha256))
+    renamed = {old for _, _, old in renames}
+    deletes = [('delete', path, None) for path in sorted(target) if path not in source and path not in renamed]
+    return renames + copies + deletes
+
+
+def apply_sync(steps, target_dir, source_file):
+    """Runs plan_sync steps in target_dir; source_file(path, sha256) is the file to copy for a 'copy' step."""
+    for action, path, detail in steps:
+        dst_path = os.path.join(target_dir, *path.split("/"))
+        if action == 'rename':
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            os.replace(os.path.join(target_dir, *detail.split("/")), dst_path)
+        elif action == 'copy':
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+            try:
+                shutil.copy2(source_file(path, detail), tmp_path)
+                os.replace(tmp_path, dst_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        else:
+            os.remove(dst_path)
+
+
+class LibraryBackup:
+    """Backups, snapshots and restores of the library trees; see the module docstring."""
+
+    def __init__(self, backup_dir, cache_dir, keep=DEFAULT_KEEP_SNAPSHOTS):
+        self.backup_dir = backup_dir
+        self.snapshots_dir = os.path.join(backup_dir, "snapshots")
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.keep = keep
+        self.hashes_path = os.path.join(cache_dir, "backup-hashes.json")
+        self._hashes = self._load_hashes()  # absolute path -> [mtime_ns, size, sha256]
+        self._hashes_dirty = False
+
+    def _load_hashes(self):
+        try:
+            with open(self.hashes_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == BACKUP_FORMAT:
+                return data.get('files', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_hashes(self):
+        if not self._hashes_dirty:
+            return
+        tmp_path = f"{self.hashes_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.hashes_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': BACKUP_FORMAT, 'files': self._hashes}, f)
+            os.replace(tmp_path, self.hashes_path)
+            self._hashes_dirty = False
+        except OSError as e:
+            print(f"Could not save backup hashes: {e}")
+
+    def tree_hashes(self, directory):
+        """{relative path: sha256} of the library files below directory (empty if it does not exist)."""
+        tree = {}
+        for root, _, names in os.walk(directory):
+            for name in names:
+                if not _is_library_file(name):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                st = os.stat(path)
+                known = self._hashes.get(path)
+                if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+                    sha256 = known[2]
+                else:
+                    sha256 = file_sha256(path)
+                    self._hashes[path] = [st.st_mtime_ns, st.st_size, sha256]
+                    self._hashes_dirty = True
+                tree[os.path.relpath(path, directory).replace(os.sep, "/")] = sha256
+        return tree
+
+    def tree_dir(self, tree):
+        """backup/<tree>: the plain copy of the live folder of that name."""
+        return os.path.join(self.backup_dir, tree)
+
+    def _object_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], sha256[2:])
+
+    def _sync(self, source, target_dir, source_file, dry_run):
+        steps = plan_sync(source, self.tree_hashes(target_dir))
+        if not dry_run:
+            apply_sync(steps, target_dir, source_file)
+        return steps
+
+    def backup(self, live_dirs, note="", dry_run=False):
+        """
+        Brings backup/<tree> in line with the live folders ({tree: folder}) and records
+        a snapshot. Returns ({tree: steps}, snapshot id or None if nothing changed).
+        """
+        trees = {tree: self.tree_hashes(directory) for tree, directory in live_dirs.items()}
+        steps = {}
+        for tree, directory in live_dirs.items():
+            steps[tree] = self._sync(trees[tree], self.tree_dir(tree),
+                                     lambda path, _, d=directory: os.path.join(d, *path.split("/")), dry_run)
+        snapshot_id = None
+        if not dry_run:
+            snapshot_id = self.record_snapshot(live_dirs, trees, note)
+        self._save_hashes()
+        return steps, snapshot_id
+
+    def restore(self, live_dirs, snapshot_id=None, dry_run=False):
+        """
+        Brings the live folders back to backup/<tree> or, with snapshot_id, to that
+        snapshot. The current state is recorded as a snapshot first. Returns {tree: steps}.
+        Raises ValueError if the backup or the snapshot is missing or incomplete.
+        """
+        if snapshot_id is None:
+            sources = {tree: self.tree_hashes(self.tree_dir(tree)) for tree in live_dirs}
+            empty = [self.tree_dir(tree) for tree, files in sources.items() if not files]
+            if empty:
+                # A missing backup would otherwise delete the whole library
+                raise ValueError(f"Keine Sicherung in '{empty[0]}' gefunden")
+
+            def source_file_for(tree):
+                return lambda path, _: os.path.join(self.tree_dir(tree), *path.split("/"))
+        else:
+            snapshot = self.load_snapshot(snapshot_id)
+            sources = {tree: snapshot['trees'].get(tree, {}) for tree in live_dirs}
+            missing = [sha256 for tree in sources.values() for sha256 in tree.values()
+                       if not os.path.exists(self._object_path(sha256))]
+            if missing:
+                raise ValueError(f"Snapshot '{snapshot_id}' ist unvollständig ({len(missing)} Dateien fehlen)")
+
+            def source_file_for(tree):
+                return lambda _, sha256: self._object_path(sha256)
+
+        if not dry_run:
+            # The snapshot being restored must survive the pruning of this one
+            self.record_snapshot(live_dirs, None, "vor Wiederherstellung",
+                                 protect=snapshot['id'] if snapshot_id is not None else None)
+        steps = {tree: self._sync(sources[tree], directory, source_file_for(tree), dry_run)
+                 for tree, directory in live_dirs.items()}
+        self._save_hashes()
+        return steps
+
+    def record_snapshot(self, live_dirs, trees=None, note="", protect=None):
+        """
+        Stores the state of the live folders as a snapshot; returns its id (None if
+        equal to the latest one). The snapshot 'protect' is kept even if it is old.
+        """
+        if trees is None:
+            trees = {tree: self.tree_hashes(directory) for tree, directory in live_dirs.items()}
+        snapshots = self.snapshots()
+        if snapshots and self.load_snapshot(snapshots[-1]['id'])['trees'] == trees:
+            return None
+
+        for tree, files in trees.items():
+            for path, sha256 in files.items():
+                object_path = self._object_path(sha256)
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    tmp_path = f"{object_path}.{os.getpid()}.tmp"
+                    shutil.copy2(os.path.join(live_dirs[tree], *path.split("/")), tmp_path)
+                    os.replace(tmp_path, object_path)
+
+        created = datetime.now()
+        snapshot_id = created.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(os.path.join(self.snapshots_dir, snapshot_id + ".json")):
+            suffix += 1
+            snapshot_id = f"{created.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        path = os.path.join(self.snapshots_dir, snapshot_id + ".json")
+        with open(path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump({'format': BACKUP_FORMAT, 'created': created.isoformat(timespec='seconds'), 'note': note,
+                       'trees': trees}, f, ensure_ascii=False, indent=1)
+        os.replace(path + ".tmp", path)
+        self._prune(protect)
+        return snapshot_id
+
+    def snapshots(self):
+        """[{'id', 'created', 'note', 'files'}] of all snapshots, oldest first."""
+        found = []
+        try:
+            names = sorted(name for name in os.listdir(self.snapshots_dir) if name.endswith(".json"))
+        except OSError:
+            return found
+        for name in names:
+            snapshot_id = name[:-len(".json")]
+            try:
+                snapshot = self.load_snapshot(snapshot_id)
+            except (OSError, ValueError):
+                continue
+            found.append({'id': snapshot_id, 'created': snapshot['created'], 'note': snapshot.get('note', ""),
+                          'files': sum(len(files) for files in snapshot['trees'].values())})
+        found.sort(key=lambda s: (s['created'], s['id']))
+        return found
+
+    def load_snapshot(self, snapshot_id):
+        """The snapshot with that id (or the only one starting with it); raises ValueError if there is none."""
+        path = os.path.join(self.snapshots_dir, snapshot_id + ".json")
+        if not os.path.exists(path):
+            try:
+                candidates = [name for name in os.listdir(self.snapshots_dir)
+                              if name.startswith(snapshot_id) and name.endswith(".json")]
+            except OSError:
+                candidates = []
+            if len(candidates) > 1:
+                raise ValueError(f"Snapshot '{snapshot_id}' ist nicht eindeutig ({len(candidates)} Treffer)")
+            if not candidates:
+                raise ValueError(f"Snapshot '{snapshot_id}' nicht gefunden")
+            path = os.path.join(self.snapshots_dir, candidates[0])
+        with open(path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        if snapshot.get('format') != BACKUP_FORMAT:
+            raise ValueError(f"Unbekanntes Format in '{path}'")
+        snapshot['id'] = os.path.basename(path)[:-len(".json")]
+        return snapshot
+
+    def _prune(self, protect=None):
+        """
+        Keeps the newest self.keep snapshots (and 'protect') and drops the objects no
+        snapshot refers to any more.
+        """
+        snapshots = self.snapshots()
+        if len(snapshots) <= self.keep:
+            return
+        kept = snapshots[-self.keep:]
+        for snapshot in snapshots[:-self.keep]:
+            if snapshot['id'] == protect:
+                kept.append(snapshot)
+                continue
+            os.remove(os.path.join(self.snapshots_dir, snapshot['id'] + ".json"))
+        used = set()
+        for snapshot in kept:
+            for files in self.load_snapshot(snapshot['id'])['trees'].values():
+                used.update(files.values())
+        for root, _, names in os.walk(self.objects_dir):
+            for name in names:
+                if os.path.basename(root) + name not in used:
+                    os.remove(os.path.join(root, name))
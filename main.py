@@ -1,47 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
-import glob
 import sys
-import re
+import queue
+import threading
+import sqlite3
 import configparser
 from datetime import datetime
-import openpyxl
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
-from docx import Document
-from docxcompose.composer import Composer
+from worker import BackgroundWorker
+from module_list import ModuleList
+from module_watcher import ModuleWatcher
+from prefetch import Prefetcher
+from module_mirror import DEFAULT_SYNC_INTERVAL
+from preset_index import indices
+from engine import (BetraEngine, MANDATORY_FILES, MERGE_BACKENDS, DEFAULT_MERGE_WORKERS, NUM_PRESETS,
+                    build_base_name, compile_presets, load_settings, load_presets, parse_network_data,
+                    preload_libraries)
 
 # --- CONFIGURATION ---
-MANDATORY_FILES = [
-    "1.0.0 - Lage der Baustelle, Lageplanskizze.docx",
-    "2.1.0 - Arbeitszeit.docx",
-    "2.2.0 - Dauer der Gleissperrungen, gesperrte Gleise, Weichen.docx",
-    "3.0.0 - Geschwindigkeitseinschränkungen und andere Besonderheiten für Zugfahrten.docx",
-    "4.0.0 - Zuständige Berechtigte.docx",
-    "4.1.0 - Fahrdienstleiter Weichenwärter Zugleiter BözM.docx",
-    "4.2.0 - Technischer Berechtigter - UV-Berechtigter.docx",
-    "5.0.0 - Betriebliche Regelungen.docx",
-    "5.1.0 - Regelungen für die Sicherung des Bahnbetriebes.docx",
-    "5.1.1 - Grundsatz.docx",
-    "5.1.2 - Fernmündliche Aufträge und Meldungen.docx",
-    "5.1.3 - Beginn der Arbeiten.docx",
-    "5.2.0 - Regelungen für die Durchführung des Bahnbetriebes.docx",
-    "5.2.15 - Außergewöhnliche Sendungen, Fahrzeuge, Züge.docx",
-    "5.3.0 - Regelungen für das gesperrte Gleis - Baugleis - unterbrochene Arbeitszeit - Ortsstellbereiche.docx",
-    "5.3.1 - Infrastrukturparameter.docx",
-    "5.4.0 - Regelungen für den Einsatz von Schienenfahrzeugen, Maschinen und Geräten und deren besonderen Einsatzbedingungen.docx",
-    "5.4.1 - Grundsätze.docx",
-    "6.0.0 - Sicherung der Beschäftigten.docx",
-    "6.1.0 - Arbeiten im Gleisbereich.docx",
-    "6.2.0 - Arbeiten an oder in der Nähe von aktiven Teilen der Oberleitungsanlage.docx",
-    "7.0.0 - Verantwortliche.docx",
-    "8.0.0 - Angaben zur Bautechnologie-Bauablauf-Baustellenlogistik.docx",
-    "9.0.0 - Sonstige Angaben.docx",
-    "9.1.0 - Anlagen - Zugestimmt - Verteiler.docx"
-]
-
-NUM_PRESETS = 5
-
 COLUMN_LAYOUT = {
     "0": 0,
     "1": 0,
@@ -61,15 +37,11 @@ COLUMN_LAYOUT = {
     "Unsorted": 5
 }
 NUM_MAIN_COLUMNS = 6
+PRESET_BUTTONS_PER_ROW = 8
 APP_VERSION = "1.4b"
 
 # ---------------------
 
-def natural_sort_key(s):
-    """Sorts strings 'naturally' (e.g., 1, 2, 10) instead of alphabetically (1, 10, 2)."""
-    filename = os.path.basename(s)
-    return [int(c) if c.isdigit() else c.lower() for c in re.split('([0-9]+)', filename)]
-
 
 class FileNameDialog(simpledialog.Dialog):
     """Custom dialog to ask for doc type, serial number, and AEL option."""
@@ -259,19 +231,16 @@ class WordMergerApp:
         self.root.title("<BetraTool> v" + APP_VERSION)
         self.root.geometry("1410x700")
 
-        if getattr(sys, 'frozen', False):
-            base_path = os.path.dirname(sys.executable)
-        else:
-            base_path = os.path.dirname(os.path.abspath(__file__))
+        self.engine = BetraEngine()
+        base_path = self.engine.base_path
 
         self.load_icon(base_path)
 
-        self.modules_dir = os.path.join(base_path, "modules")
-        self.output_dir = os.path.join(base_path, "output")
-        self.configs_dir = os.path.join(base_path, "configs")
-        self.config_file_path = os.path.join(self.configs_dir, "config.ini")
-        self.presets_file_path = os.path.join(self.configs_dir, "presets.ini")
-        self.network_data_file_path = os.path.join(self.configs_dir, "BetraNetzziffern.txt")
+        self.output_dir = self.engine.output_dir
+        self.configs_dir = self.engine.configs_dir
+        self.config_file_path = self.engine.config_file_path
+        self.presets_file_path = self.engine.presets_file_path
+        self.network_data_file_path = self.engine.network_data_file_path
         
         self.preset_config = configparser.ConfigParser()
         self.presets = {}
@@ -281,15 +250,42 @@ class WordMergerApp:
         self.network_data = {} 
         self.cover_pages = [] 
         self.selected_cover_page = tk.StringVar()
-        self.checkbox_items = []
+        self.checkbox_items = []  # rows of the module list (see ModuleList.items)
+        self.worker = BackgroundWorker()
+        self.pending_job = None
+        self.close_requested = False
+        self.module_checks = {}  # path -> pre-flight result (see module_check.py)
+        self.reported_broken = set()
+        self.check_queue = queue.Queue()
+        self.check_thread = None
+        self.check_pending = False
+        self.prefetcher = Prefetcher(self.engine.prefetch)
 
         self.load_or_create_network_data()
         self.load_or_create_config()
+        # Only now: the config may have switched the engine to the local mirror.
+        # library_dir is the folder the user maintains, modules_dir the one read.
+        self.modules_dir = self.engine.modules_dir
+        self.library_dir = self.engine.library_dir
         self.load_or_create_presets() 
         
         self.create_main_widgets()
         self.load_files()
 
+        # With the mirror, the watcher sees the local copy (inotify works there) and the
+        # share itself is only listed every DEFAULT_SYNC_INTERVAL seconds
+        self.module_watcher = ModuleWatcher(self.modules_dir)
+        self.module_watcher.start()
+        self.root.after(1000, self.poll_module_watcher)
+        self.mirror_stop = threading.Event()
+        if self.engine.mirror is not None:
+            threading.Thread(target=self.sync_mirror_loop, daemon=True).start()
+
+        # The merge and AEL libraries load while the user picks modules
+        self.root.after_idle(lambda: threading.Thread(target=preload_libraries, daemon=True).start())
+        # Then the cover page and the checked modules, while the user is still picking
+        self.root.after_idle(self.start_prefetch)
+
     def load_icon(self, base_path):
         """Try to load .ico, fallback to .png."""
         try:
@@ -315,8 +311,9 @@ class WordMergerApp:
         top_info_frame = ttk.Frame(main_frame)
         top_info_frame.pack(fill=tk.X, anchor="n", pady=(0, 5)) 
 
-        info_label = ttk.Label(top_info_frame, text=f"Module aus: '{self.modules_dir}'", font=("-default-", 9, "italic"))
-        info_label.pack(side=tk.LEFT, anchor="w")
+        self.modules_info_label = ttk.Label(top_info_frame, text=f"Module aus: '{self.library_dir}'",
+                                            font=("-default-", 9, "italic"))
+        self.modules_info_label.pack(side=tk.LEFT, anchor="w")
 
         year_short = self.settings.get('year', '??')
         year_display = f"20{year_short}" if year_short.isdigit() else "??"
@@ -335,32 +332,29 @@ class WordMergerApp:
         self.cover_page_combo = ttk.Combobox(cover_page_frame, textvariable=self.selected_cover_page, state="readonly", width=60)
         self.cover_page_combo.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5,0))
 
-        list_frame = ttk.Frame(main_frame, padding=(0, 10, 0, 0))
-        list_frame.pack(fill=tk.BOTH, expand=True)
+        search_frame = ttk.Frame(main_frame)
+        search_frame.pack(fill=tk.X, anchor="n")
 
-        x_scrollbar = ttk.Scrollbar(list_frame, orient="horizontal")
-        x_scrollbar.pack(side="bottom", fill="x")
-        y_scrollbar = ttk.Scrollbar(list_frame, orient="vertical")
-        y_scrollbar.pack(side="right", fill="y")
+        search_label = ttk.Label(search_frame, text="Suche in Modulen:")
+        search_label.pack(side=tk.LEFT, anchor="w")
 
-        self.canvas = tk.Canvas(list_frame)
-        self.canvas.pack(side=tk.LEFT, fill="both", expand=True)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
+        search_entry.pack(side=tk.LEFT, padx=(5, 5))
+        search_entry.bind("<Escape>", lambda e: self.search_var.set(""))
+        self.search_var.trace_add("write", lambda *args: self.apply_search())
 
-        self.canvas.configure(yscrollcommand=y_scrollbar.set, xscrollcommand=x_scrollbar.set)
-        x_scrollbar.configure(command=self.canvas.xview)
-        y_scrollbar.configure(command=self.canvas.yview)
+        self.search_info_label = ttk.Label(search_frame, text="", font=("-default-", 9, "italic"))
+        self.search_info_label.pack(side=tk.LEFT, anchor="w")
 
-        self.scrollable_frame = ttk.Frame(self.canvas)
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        list_frame = ttk.Frame(main_frame, padding=(0, 10, 0, 0))
+        list_frame.pack(fill=tk.BOTH, expand=True)
 
-        self.scrollable_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        
-        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
-        self.canvas.bind("<Button-4>", self._on_mousewheel)
-        self.canvas.bind("<Button-5>", self._on_mousewheel)
-        self.scrollable_frame.bind("<MouseWheel>", self._on_mousewheel)
-        self.scrollable_frame.bind("<Button-4>", self._on_mousewheel)
-        self.scrollable_frame.bind("<Button-5>", self._on_mousewheel)
+        self.module_list = ModuleList(list_frame, COLUMN_LAYOUT, NUM_MAIN_COLUMNS, MANDATORY_FILES,
+                                      describe=self.describe_module,
+                                      on_select=lambda path: self.prefetcher.request([('module', path)]))
+        self.module_list.pack(fill=tk.BOTH, expand=True)
+        self.checkbox_items = self.module_list.items
 
         category_frame = ttk.Frame(main_frame)
         category_frame.pack(fill=tk.X, pady=(10, 5))
@@ -392,6 +386,12 @@ class WordMergerApp:
         self.start_button.pack(side=tk.RIGHT)
         self.start_button["state"] = "disabled"
 
+        self.cancel_button = ttk.Button(button_frame, text="Abbrechen", command=self.cancel_job)
+        self.progress_bar = ttk.Progressbar(button_frame, orient="horizontal", length=200, mode="determinate")
+        self.progress_label = ttk.Label(button_frame, text="", width=45, anchor="e")
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def load_or_create_network_data(self):
         """Loads BetraNetzziffern.txt, or creates it if it doesn't exist."""
         os.makedirs(self.configs_dir, exist_ok=True)
@@ -422,24 +422,7 @@ class WordMergerApp:
                 return
 
         try:
-            with open(self.network_data_file_path, 'r', encoding='utf-8') as f:
-                current_rb = None
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    if "," not in line:
-                        current_rb = line
-                        if current_rb not in self.network_data:
-                            self.network_data[current_rb] = {}
-                    else:
-                        if current_rb is None:
-                            continue 
-                        parts = line.split(",", 1)
-                        if len(parts) == 2:
-                            code = parts[0].strip()
-                            name = parts[1].strip()
-                            self.network_data[current_rb][code] = name
+            self.network_data = parse_network_data(self.network_data_file_path)
         except Exception as e:
             messagebox.showerror("Kritischer Fehler", f"Konnte '{self.network_data_file_path}' nicht lesen: {e}")
             self.root.quit()
@@ -448,35 +431,16 @@ class WordMergerApp:
         """Loads config.ini or triggers first-time setup."""
         os.makedirs(self.configs_dir, exist_ok=True)
         try:
-            if not os.path.exists(self.config_file_path):
-                raise FileNotFoundError("Config file not found.")
-            
+            self.settings = load_settings(self.config_file_path)
             self.config.read(self.config_file_path)
-            
-            if 'SETTINGS' not in self.config or \
-               'RegionalCodeFull' not in self.config['SETTINGS'] or \
-               'NetworkName' not in self.config['SETTINGS'] or \
-               'Year' not in self.config['SETTINGS'] or \
-               'UserName' not in self.config['SETTINGS']:
-                raise ValueError("Config file is incomplete.")
-
-            self.settings['regional_code_full'] = self.config['SETTINGS']['RegionalCodeFull']
-            self.settings['network_name'] = self.config['SETTINGS']['NetworkName']
-            self.settings['year'] = self.config['SETTINGS']['Year']
-            self.settings['user_name'] = self.config['SETTINGS']['UserName']
-            
-            if self.settings['year'] != "26":
-                print("Alte Jahr-Einstellung gefunden. Erzwinge '26' für Modul-Kompatibilität.")
-                self.settings['year'] = "26"
-                self.config['SETTINGS']['Year'] = "26"
-                with open(self.config_file_path, 'w') as configfile:
-                    self.config.write(configfile)
-
-            if not self.settings['regional_code_full'] or not self.settings['network_name'] or not self.settings['user_name']:
-                raise ValueError("Config values are empty.")
+            self.engine.merge_backend = self.settings['merge_backend']
+            self.engine.merge_workers = self.settings['merge_workers']
+            self.engine.memoize_builds = self.settings['memoize_builds']
+            self.engine.apply_mirror_setting(self.settings['local_mirror'])
 
         except Exception as e:
             print(f"Configuration error: {e}. Starting first-time setup...")
+            self.engine.apply_mirror_setting("auto")
             self.settings = {'regional_code_full': '??', 'network_name': '???', 'year': '26', 'user_name': '???'} 
             self.root.after_idle(self.ask_for_initial_config)
 
@@ -484,30 +448,7 @@ class WordMergerApp:
         """Loads presets.ini, or creates defaults."""
         os.makedirs(self.configs_dir, exist_ok=True)
         try:
-            if not os.path.exists(self.presets_file_path):
-                raise FileNotFoundError("Presets file not found.")
-            
-            self.preset_config.read(self.presets_file_path)
-            
-            for i in range(1, NUM_PRESETS + 1):
-                section = f'PRESET_{i}'
-                if section not in self.preset_config:
-                    raise ValueError(f"Preset section {section} missing.")
-                
-                name = self.preset_config[section]['Name']
-                if 'Bausteine' in self.preset_config[section]:
-                    modules = self.preset_config[section]['Bausteine']
-                    self.preset_config[section]['Modules'] = modules
-                    del self.preset_config[section]['Bausteine']
-                    with open(self.presets_file_path, 'w') as f:
-                        self.preset_config.write(f)
-                else:
-                    modules = self.preset_config[section]['Modules']
-                    
-                self.presets[section] = {'Name': name, 'Modules': modules}
-
-            if len(self.presets) < NUM_PRESETS:
-                raise ValueError("Not all presets were found.")
+            self.preset_config, self.presets = load_presets(self.presets_file_path)
 
         except Exception as e:
             print(f"Preset config error: {e}. Creating default presets.")
@@ -553,30 +494,37 @@ class WordMergerApp:
             print(f"Could not save default presets: {e}")
 
     def create_preset_buttons(self):
-        """Clears and rebuilds the preset buttons from self.presets."""
+        """
+        Clears and rebuilds the preset buttons from self.presets (PRESET_BUTTONS_PER_ROW
+        per row). A click toggles the preset's modules, Shift+click only removes them.
+        """
         for widget in self.preset_btn_container.winfo_children():
             widget.destroy()
 
-        for i in range(1, NUM_PRESETS + 1):
-            section = f'PRESET_{i}'
-            name = self.presets[section]['Name']
-            modules_str = self.presets[section]['Modules']
-            
-            prefixes = [p.strip() for p in modules_str.split(',') if p.strip()]
-            
+        self.rebuild_preset_index()
+        names = [preset['Name'] for preset in self.presets.values()]
+        if not any(name.casefold() == "alle" for name in names):
+            names.append("Alle")
+        for column in range(min(len(names), PRESET_BUTTONS_PER_ROW)):
+            self.preset_btn_container.columnconfigure(column, weight=1, uniform="presets")
+
+        for position, name in enumerate(names):
             btn = ttk.Button(self.preset_btn_container,
                              text=name,
-                             command=lambda p=prefixes: self.toggle_category(p))
-            btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2, pady=2)
-
-        alle_prefixes = ["0.", "1.", "2.", "3.", "4.", "5.", "6.", "7.", "8.", "9."]
-        alle_btn = ttk.Button(self.preset_btn_container,
-                              text="Alle",
-                              command=lambda p=alle_prefixes: self.toggle_category(p))
-        alle_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2, pady=2)
-        
+                             command=lambda n=name: self.toggle_category(n))
+            btn.bind("<Shift-Button-1>", lambda e, n=name: self.remove_category(n) or "break")
+            if name in self.preset_index.errors:
+                btn.config(state="disabled")
+                print(f"Preset '{name}': {self.preset_index.errors[name]}")
+            row, column = divmod(position, PRESET_BUTTONS_PER_ROW)
+            btn.grid(row=row, column=column, sticky="ew", padx=2, pady=2)
+
+    def rebuild_preset_index(self):
+        """Compiles the presets against the current module list (see preset_index.py)."""
+        self.preset_index = compile_presets([item["path"] for item in self.checkbox_items], self.presets)
+
     def open_preset_editor(self):
-        """Opens a new Toplevel window to edit the presets."""
+        """Opens a new Toplevel window to edit, add and remove presets."""
         self.editor_window = tk.Toplevel(self.root)
         self.editor_window.title("Preset-Editor")
         self.editor_window.transient(self.root)
@@ -589,56 +537,92 @@ class WordMergerApp:
         self.preset_name_vars = []
         self.preset_modules_vars = []
 
-        notebook = ttk.Notebook(main_frame)
-        notebook.pack(pady=10, padx=10, fill="x", expand=True)
+        self.preset_notebook = ttk.Notebook(main_frame)
+        self.preset_notebook.pack(pady=10, padx=10, fill="x", expand=True)
 
-        for i in range(1, NUM_PRESETS + 1):
-            section = f'PRESET_{i}'
-            preset_data = self.presets[section]
-
-            tab_frame = ttk.Frame(notebook, padding="10")
-            notebook.add(tab_frame, text=f"Preset {i}")
+        for preset_data in self.presets.values():
+            self._add_preset_tab(preset_data['Name'], preset_data['Modules'])
 
-            name_var = tk.StringVar(value=preset_data['Name'])
-            self.preset_name_vars.append(name_var)
-            
-            ttk.Label(tab_frame, text="Button-Name:").pack(anchor="w")
-            ttk.Entry(tab_frame, textvariable=name_var, width=50).pack(fill="x", anchor="w", pady=(0, 10))
-
-            modules_var = tk.StringVar(value=preset_data['Modules'])
-            self.preset_modules_vars.append(modules_var)
-            
-            ttk.Label(tab_frame, text="Modul-Präfixe (durch Komma getrennt):").pack(anchor="w")
-            ttk.Entry(tab_frame, textvariable=modules_var, width=50).pack(fill="x", anchor="w")
+        ttk.Label(main_frame, justify=tk.LEFT,
+                  text="Präfixe durch Komma trennen. '@Name' übernimmt ein anderes Preset,\n"
+                       "ein vorangestelltes '-' nimmt Module wieder heraus (z.B. '@Baugleis, -5.3.18').").pack(anchor="w")
 
         editor_btn_frame = ttk.Frame(main_frame)
         editor_btn_frame.pack(fill="x", pady=(10, 0))
 
+        add_btn = ttk.Button(editor_btn_frame, text="Neues Preset",
+                             command=lambda: self._add_preset_tab(f"Preset {len(self.preset_name_vars) + 1}", "",
+                                                                  select=True))
+        add_btn.pack(side=tk.LEFT)
+
+        remove_btn = ttk.Button(editor_btn_frame, text="Preset entfernen", command=self._remove_preset_tab)
+        remove_btn.pack(side=tk.LEFT, padx=5)
+
         cancel_btn = ttk.Button(editor_btn_frame, text="Abbrechen", command=self.editor_window.destroy)
         cancel_btn.pack(side=tk.RIGHT, padx=5)
 
         save_btn = ttk.Button(editor_btn_frame, text="Speichern", command=self.save_presets)
         save_btn.pack(side=tk.RIGHT)
 
+    def _add_preset_tab(self, name, modules, select=False):
+        tab_frame = ttk.Frame(self.preset_notebook, padding="10")
+        self.preset_notebook.add(tab_frame, text=name or "?")
+
+        name_var = tk.StringVar(value=name)
+        self.preset_name_vars.append(name_var)
+        name_var.trace_add("write", lambda *_: self.preset_notebook.tab(tab_frame, text=name_var.get() or "?"))
+
+        ttk.Label(tab_frame, text="Button-Name:").pack(anchor="w")
+        ttk.Entry(tab_frame, textvariable=name_var, width=50).pack(fill="x", anchor="w", pady=(0, 10))
+
+        modules_var = tk.StringVar(value=modules)
+        self.preset_modules_vars.append(modules_var)
+
+        ttk.Label(tab_frame, text="Modul-Präfixe (durch Komma getrennt):").pack(anchor="w")
+        ttk.Entry(tab_frame, textvariable=modules_var, width=50).pack(fill="x", anchor="w")
+        if select:
+            self.preset_notebook.select(tab_frame)
+
+    def _remove_preset_tab(self):
+        if not self.preset_name_vars:
+            return
+        index = self.preset_notebook.index("current")
+        self.preset_notebook.forget(index)
+        del self.preset_name_vars[index]
+        del self.preset_modules_vars[index]
+
     def save_presets(self):
-        """Saves the edited presets to file and memory."""
-        try:
-            for i in range(1, NUM_PRESETS + 1):
-                section = f'PRESET_{i}'
-                name = self.preset_name_vars[i-1].get()
-                modules = self.preset_modules_vars[i-1].get()
-
-                if not name.strip():
-                    messagebox.showerror("Fehler", f"Der Name für Preset {i} darf nicht leer sein.", parent=self.editor_window)
-                    return
-                
-                self.preset_config[section]['Name'] = name
-                self.preset_config[section]['Modules'] = modules
-                self.presets[section] = {'Name': name, 'Modules': modules}
+        """Checks the edited presets, then saves them to file and memory (renumbered PRESET_1..n)."""
+        presets = {}
+        names = set()
+        for i, (name_var, modules_var) in enumerate(zip(self.preset_name_vars, self.preset_modules_vars), 1):
+            name = name_var.get().strip()
+            if not name:
+                messagebox.showerror("Fehler", f"Der Name für Preset {i} darf nicht leer sein.", parent=self.editor_window)
+                return
+            if name.casefold() in names:
+                messagebox.showerror("Fehler", f"Der Name '{name}' ist doppelt vergeben.", parent=self.editor_window)
+                return
+            names.add(name.casefold())
+            presets[f'PRESET_{i}'] = {'Name': name, 'Modules': modules_var.get()}
 
+        errors = compile_presets([item["path"] for item in self.checkbox_items], presets).errors
+        if errors:
+            messagebox.showerror("Fehler", "\n".join(errors.values()), parent=self.editor_window)
+            return
+
+        try:
+            preset_config = configparser.ConfigParser()
+            for section in self.preset_config.sections():
+                if not section.startswith('PRESET_'):
+                    preset_config[section] = self.preset_config[section]
+            for section, preset in presets.items():
+                preset_config[section] = preset
             with open(self.presets_file_path, 'w') as f:
-                self.preset_config.write(f)
+                preset_config.write(f)
 
+            self.preset_config = preset_config
+            self.presets = presets
             self.create_preset_buttons()
             self.editor_window.destroy()
             messagebox.showinfo("Gespeichert", "Presets erfolgreich aktualisiert.", parent=self.root)
@@ -668,12 +652,23 @@ class WordMergerApp:
         code_full, name, user_name = dialog.result
         year_short = "26" # Hardcoded to match modules
 
+        merge_backend = self.settings.get('merge_backend', self.engine.merge_backend)
         self.config['SETTINGS'] = {
             'RegionalCodeFull': code_full,
             'NetworkName': name,
             'Year': year_short,
             'UserName': user_name
         }
+        if merge_backend != MERGE_BACKENDS[0]:
+            self.config['SETTINGS']['MergeBackend'] = merge_backend
+        if self.settings.get('trace_summary'):
+            self.config['SETTINGS']['TraceSummary'] = "yes"
+        if self.settings.get('merge_workers', DEFAULT_MERGE_WORKERS) != DEFAULT_MERGE_WORKERS:
+            self.config['SETTINGS']['MergeWorkers'] = str(self.settings['merge_workers'])
+        if not self.settings.get('memoize_builds', True):
+            self.config['SETTINGS']['MemoizeBuilds'] = "no"
+        if self.settings.get('local_mirror', "auto") != "auto":
+            self.config['SETTINGS']['LocalMirror'] = self.settings['local_mirror']
         with open(self.config_file_path, 'w') as configfile:
             self.config.write(configfile)
 
@@ -689,205 +684,232 @@ class WordMergerApp:
             config_text = f"Aktuelle Konfiguration: {self.settings.get('regional_code_full', '??')} ({self.settings.get('network_name', '???')}), Jahr: {year_display}, Bearbeiter: {self.settings.get('user_name', '???')}"
             self.config_label.config(text=config_text)
 
-    def _on_mousewheel(self, event):
-        """Cross-platform mousewheel scrolling."""
-        if sys.platform == "linux":
-            if event.num == 4:
-                self.canvas.yview_scroll(-1, "units")
-            elif event.num == 5:
-                self.canvas.yview_scroll(1, "units")
-        else:
-            self.canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-
-    def _on_label_click(self, checkbox_widget, check_var):
-        """Toggles the associated checkbox when its label is clicked."""
-        if checkbox_widget.instate(['!disabled']):
-            check_var.set(not check_var.get())
-
-    def _get_layout_key(self, filename):
-        """Determines the layout group (and column) for a file."""
-        parts = filename.split('.')
-        if not parts:
-            return "Unsorted"
-
-        main_chapter = parts[0]
-
-        if main_chapter == "5":
-            if len(parts) > 1:
-                key = f"{parts[0]}.{parts[1]}"
-                if key in COLUMN_LAYOUT:
-                    return key
-
-        if main_chapter in COLUMN_LAYOUT:
-            return main_chapter
-
-        return "Unsorted"
-
     def load_files(self):
         """
         Loads all .docx files, separating them into cover pages (for combobox)
         and modules (for checkboxes).
         """
-        if not os.path.isdir(self.modules_dir):
-            messagebox.showerror("Fehler", f"Der Ordner '{self.modules_dir}' wurde nicht gefunden.")
+        # With the local mirror, an unreachable share is fine: the last copy is used
+        if self.engine.mirror is None and not os.path.isdir(self.library_dir):
+            messagebox.showerror("Fehler", f"Der Ordner '{self.library_dir}' wurde nicht gefunden.")
             self.root.quit()
             return
 
-        for item in self.checkbox_items:
-            item["checkbox"].master.destroy() 
-        self.checkbox_items.clear()
-        
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-            
         self.cover_pages.clear()
         self.cover_page_combo['values'] = []
         self.selected_cover_page.set("")
 
-        search_path = os.path.join(self.modules_dir, "*.docx")
-        all_file_paths = glob.glob(search_path)
-        
-        if not all_file_paths:
-            messagebox.showinfo("Keine Dateien", f"Keine .docx Dateien im Ordner '{self.modules_dir}' gefunden.")
+        cover_pages, module_files = self.engine.scan_modules()
+        self.update_modules_info()
+
+        if not cover_pages and not module_files:
+            messagebox.showinfo("Keine Dateien", f"Keine .docx Dateien im Ordner '{self.library_dir}' gefunden.")
             return
             
-        cover_page_files = []
-        module_files = []
-
-        for file_path in all_file_paths:
-            filename = os.path.basename(file_path)
-            if filename.startswith("0."):
-                cover_page_files.append(file_path)
-            else:
-                module_files.append(file_path)
-        
         # 1. Populate Cover Page ComboBox
-        cover_page_names = []
-        cover_page_files.sort(key=natural_sort_key)
-        
-        for file_path in cover_page_files:
-            filename = os.path.basename(file_path)
-            display_name = os.path.splitext(filename)[0]
-            self.cover_pages.append({'name': display_name, 'path': file_path})
-            cover_page_names.append(display_name)
+        self.cover_pages.extend(cover_pages)
+        cover_page_names = [cover['name'] for cover in cover_pages]
             
         self.cover_page_combo['values'] = cover_page_names
         if cover_page_names:
             self.selected_cover_page.set(cover_page_names[0])
         else:
             messagebox.showwarning("Deckblatt fehlt", 
-                                   f"Keine Deckblatt-Dateien (beginnend mit '0.') im Ordner '{self.modules_dir}' gefunden.\n Zusammenfügen ist nicht möglich.")
+                                   f"Keine Deckblatt-Dateien (beginnend mit '0.') im Ordner '{self.library_dir}' gefunden.\n Zusammenfügen ist nicht möglich.")
             self.start_button["state"] = "disabled"
 
         # 2. Populate Module Checkboxes
-        module_files.sort(key=natural_sort_key)
-
-        if not module_files and cover_page_files:
-            messagebox.showinfo("Keine Module", f"Keine Modul-Dateien (außer Deckblättern) im Ordner '{self.modules_dir}' gefunden.")
+        if not module_files and cover_pages:
+            messagebox.showinfo("Keine Module", f"Keine Modul-Dateien (außer Deckblättern) im Ordner '{self.library_dir}' gefunden.")
+        
+        self.module_list.set_modules(module_files)
+        self.rebuild_preset_index()
+        self.apply_search()
+        self.start_module_check()
         
-        wrap_length_pixels = 220
-        main_columns = []
-        for i in range(NUM_MAIN_COLUMNS):
-            main_col_frame = ttk.Frame(self.scrollable_frame)
-            main_col_frame.grid(row=0, column=i, sticky="nw", padx=5)
-            main_col_frame.bind("<MouseWheel>", self._on_mousewheel)
-            main_columns.append(main_col_frame)
+        if cover_pages:
+            self.start_button["state"] = "normal"
 
-        group_frames = {}
+    def describe_module(self, path):
+        """Hover text of a module from the manifest: name, pages, paragraphs and tables."""
+        info = self.engine.module_info(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        if not info or info.get('error'):
+            return name
+        details = []
+        if info.get('pages'):
+            details.append(f"{info['pages']} S.")
+        details.append(f"{info['paragraphs']} Absätze")
+        if info['tables']:
+            details.append(f"{info['tables']} Tabelle(n)")
+        if info['media']:
+            details.append(f"{len(info['media'])} Bild(er)")
+        text = f"{name}  ({', '.join(details)})"
+        check = self.module_checks.get(path)
+        if check and check['errors']:
+            text += f"  –  fehlerhaft, nicht auswählbar: {check['errors'][0]}"
+        elif check and check['warnings']:
+            text += f"  –  Hinweis: {check['warnings'][0]}"
+        return text
+
+    def update_modules_info(self):
+        """Shows where the modules are read from, with the state of the local mirror (see module_mirror.py)."""
+        text = f"Module aus: '{self.library_dir}'"
+        if self.engine.mirror is not None:
+            text += f" ({self.engine.mirror.status()})"
+        self.modules_info_label.config(text=text)
+
+    def start_prefetch(self):
+        """Starts the background prefetch (see prefetch.py) with the cover page and the checked modules."""
+        self.selected_cover_page.trace_add("write", lambda *args: self.prefetch_cover_page())
+        self.prefetcher.start()
+        self.prefetch_selection()
+
+    def prefetch_cover_page(self):
+        """Warms the selected cover page together with the mandatory modules."""
+        for cover in self.cover_pages:
+            if cover['name'] == self.selected_cover_page.get():
+                mandatory = tuple(item['path'] for item in self.module_list.items if item['is_mandatory'])
+                self.prefetcher.request([('cover', cover['path'], mandatory)])
+                break
 
-        for file_path in module_files:
-            filename = os.path.basename(file_path)
-            layout_key = self._get_layout_key(filename)
+    def prefetch_selection(self):
+        """Warms the cover page and all checked optional modules (again, after the files changed)."""
+        self.prefetcher.forget()
+        self.prefetcher.request([('module', item['path']) for item in self.module_list.items
+                                 if not item['is_mandatory'] and self.module_list.is_selected(item['index'])])
+        self.prefetch_cover_page()
+
+    def apply_search(self):
+        """Highlights the modules matching the search box (title, text and tables, see module_search.py)."""
+        query = self.search_var.get().strip()
+        paths = self.engine.search_modules(query) if query else []
+        count = self.module_list.set_highlighted(paths)
+        self.search_info_label.config(text=f"{count} Treffer" if query else "")
+
+    def start_module_check(self):
+        """Checks the cover pages and modules on a background thread (see module_check.py)."""
+        if self.check_thread is not None and self.check_thread.is_alive():
+            self.check_pending = True
+            return
+        self.check_pending = False
+        paths = [cover['path'] for cover in self.cover_pages] + [item['path'] for item in self.module_list.items]
 
-            if layout_key not in group_frames:
-                main_col_index = COLUMN_LAYOUT.get(layout_key, NUM_MAIN_COLUMNS - 1)
-                parent_frame = main_columns[main_col_index]
+        def run():
+            try:
+                self.check_queue.put(self.engine.check_modules(paths))
+            except Exception as e:
+                print(f"Module check failed: {e}")
+                self.check_queue.put({})
+
+        self.check_thread = threading.Thread(target=run, daemon=True)
+        self.check_thread.start()
+        self.root.after(500, self.poll_module_check)
 
-                group_frame = ttk.Frame(parent_frame, padding=5, borderwidth=1, relief="sunken")
-                group_frame.pack(side=tk.TOP, fill="x", anchor="n", pady=5)
+    def poll_module_check(self):
+        try:
+            results = self.check_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(500, self.poll_module_check)
+            return
+        self.apply_module_checks(results)
+        if self.check_pending:
+            self.start_module_check()
+
+    def apply_module_checks(self, results):
+        """Greys out (and unchecks) modules that cannot be merged; warns once about broken mandatory files."""
+        self.module_checks.update(results)
+        broken_required = []
+        for item in self.module_list.items:
+            check = self.module_checks.get(item['path'])
+            broken = bool(check and check['errors'])
+            if broken and not item['is_mandatory']:
+                self.module_list.set_selected(item['index'], False)
+            self.module_list.set_disabled(item['index'], broken)
+            if broken and item['is_mandatory']:
+                broken_required.append((item['filename'], check['errors'][0]))
+        for cover in self.cover_pages:
+            check = self.module_checks.get(cover['path'])
+            if check and check['errors']:
+                broken_required.append((os.path.basename(cover['path']), check['errors'][0]))
+
+        new = [(name, error) for name, error in broken_required if name not in self.reported_broken]
+        self.reported_broken = {name for name, _ in broken_required}
+        if new and not self.close_requested:
+            details = "\n".join(f"- {name}: {error}" for name, error in new)
+            messagebox.showwarning("Fehlerhafte Module",
+                                   f"Folgende Pflichtmodule bzw. Deckblätter sind fehlerhaft und würden "
+                                   f"im Ergebnis fehlen:\n{details}", parent=self.root)
+
+    def poll_module_watcher(self):
+        """Applies changes in modules/ reported by the watcher, without a full reload."""
+        changes = []
+        while True:
+            try:
+                changes.append(self.module_watcher.queue.get_nowait())
+            except queue.Empty:
+                break
+        if changes:
+            added = sorted({name for a, _, _ in changes for name in a})
+            removed = sorted({name for _, r, _ in changes for name in r})
+            changed = sorted({name for _, _, c in changes for name in c})
+            print(f"modules/ changed: +{len(added)} -{len(removed)} ~{len(changed)}")
+            self.refresh_files()
+        elif self.engine.mirror is not None:
+            self.update_modules_info()
+        self.root.after(1000, self.poll_module_watcher)
+
+    def sync_mirror_loop(self):
+        """Brings the local mirror up to date every DEFAULT_SYNC_INTERVAL seconds (background thread)."""
+        while not self.mirror_stop.wait(DEFAULT_SYNC_INTERVAL):
+            try:
+                self.engine.mirror.sync()
+            except OSError as e:
+                print(f"Mirror sync failed: {e}")
+
+    def refresh_files(self):
+        """Patches the cover page list and the module list to the current modules/ folder, keeping the selection."""
+        # Called for changes the watcher saw; with the mirror, those were just synced
+        cover_pages, module_files = self.engine.scan_modules(sync_mirror=False)
+        self.update_modules_info()
+
+        self.cover_pages[:] = cover_pages
+        cover_page_names = [cover['name'] for cover in cover_pages]
+        self.cover_page_combo['values'] = cover_page_names
+        if self.selected_cover_page.get() not in cover_page_names:
+            self.selected_cover_page.set(cover_page_names[0] if cover_page_names else "")
 
-                title_text = f"Punkt {layout_key}" if layout_key != "Unsorted" else "Unsortiert"
-                title_label = ttk.Label(group_frame, text=title_text, font=("-default-", 10, "bold"),
-                                        wraplength=wrap_length_pixels, justify=tk.LEFT)
-                title_label.pack(pady=(0, 5), anchor="w")
+        self.module_list.update_modules(module_files)
+        self.rebuild_preset_index()
+        self.apply_search()
+        self.start_module_check()
+        self.prefetch_selection()
 
-                group_frames[layout_key] = group_frame
-                
-                group_frame.bind("<MouseWheel>", self._on_mousewheel)
-                group_frame.bind("<Button-4>", self._on_mousewheel)
-                group_frame.bind("<Button-5>", self._on_mousewheel)
-                title_label.bind("<MouseWheel>", self._on_mousewheel)
-                title_label.bind("<Button-4>", self._on_mousewheel)
-                title_label.bind("<Button-5>", self._on_mousewheel)
-            else:
-                group_frame = group_frames[layout_key]
-
-            is_mandatory = filename in MANDATORY_FILES
-            check_var = tk.BooleanVar(value=is_mandatory)
-            cb_state = "disabled" if is_mandatory else "normal"
-
-            item_frame = ttk.Frame(group_frame)
-            item_frame.pack(fill='x', anchor="w", pady=1)
-
-            checkbox = ttk.Checkbutton(item_frame, variable=check_var, state=cb_state)
-            checkbox.pack(side=tk.LEFT, anchor="n", padx=(0, 5))
-
-            display_name = os.path.splitext(filename)[0]
-
-            label = ttk.Label(item_frame, text=display_name, wraplength=wrap_length_pixels, justify=tk.LEFT)
-            label.pack(side=tk.LEFT, fill='x', expand=True)
-
-            label.bind("<Button-1>", lambda e, w=checkbox, v=check_var: self._on_label_click(w, v))
-
-            item_frame.bind("<MouseWheel>", self._on_mousewheel)
-            item_frame.bind("<Button-4>", self._on_mousewheel)
-            item_frame.bind("<Button-5>", self._on_mousewheel)
-            checkbox.bind("<MouseWheel>", self._on_mousewheel)
-            checkbox.bind("<Button-4>", self._on_mousewheel)
-            checkbox.bind("<Button-5>", self._on_mousewheel)
-            label.bind("<MouseWheel>", self._on_mousewheel)
-            label.bind("<Button-4>", self._on_mousewheel)
-            label.bind("<Button-5>", self._on_mousewheel)
-
-            self.checkbox_items.append({
-                "check_var": check_var,
-                "path": file_path,
-                "filename": filename,
-                "checkbox": checkbox,
-                "is_mandatory": is_mandatory
-            })
-        
-        if cover_page_files:
-            self.start_button["state"] = "normal"
+        if not self.worker.is_running():
+            self.start_button["state"] = "normal" if cover_pages else "disabled"
 
     def reset_selection(self):
         """Resets all optional checkboxes to False."""
-        for item in self.checkbox_items:
-            if not item["is_mandatory"]:
-                item["check_var"].set(False)
-            else:
-                item["check_var"].set(True)
-
-    def toggle_category(self, prefixes):
-        """Toggles non-mandatory checkboxes matching the prefixes."""
-        items_in_category = []
-        for item in self.checkbox_items:
-            if item["is_mandatory"] or item["checkbox"].cget("state") == "disabled":
-                continue
+        self.module_list.reset()
 
-            for prefix in prefixes:
-                if item["filename"].startswith(prefix):
-                    items_in_category.append(item)
-                    break
+    def _preset_members(self, name):
+        """Indices of the toggleable modules of a preset."""
+        return [i for i in indices(self.preset_index.mask(name)) if self.module_list.is_enabled(i)]
 
-        if not items_in_category:
+    def toggle_category(self, name):
+        """Toggles the non-mandatory modules of a preset: all on, or all off if they already are."""
+        members = self._preset_members(name)
+        if not members:
             return
 
-        is_anything_deselected = any(not item["check_var"].get() for item in items_in_category)
-        new_state = is_anything_deselected
+        new_state = any(not self.module_list.is_selected(i) for i in members)
+        for i in members:
+            self.module_list.set_selected(i, new_state)
 
-        for item in items_in_category:
-            item["check_var"].set(new_state)
+    def remove_category(self, name):
+        """Unchecks the non-mandatory modules of a preset (difference with the current selection)."""
+        for i in self._preset_members(name):
+            self.module_list.set_selected(i, False)
 
     def show_help(self):
         """Displays the help/instructions messagebox."""
@@ -904,7 +926,9 @@ class WordMergerApp:
             "   (Projekt-Nr., Kurztext, etc.) für die Excel-Liste 'AEL-Verrechnung.xlsx' einzugeben.\n\n"
             "--- \n"
             "Eigene Presets:\n"
-            "Mit 'Presets bearbeiten' können Sie die 5 Preset-Buttons an Ihre Bedürfnisse anpassen.\n\n"
+            "Mit 'Presets bearbeiten' können Sie Presets anlegen, umbenennen, ändern und löschen;\n"
+            "jedes Preset bekommt einen eigenen Button (beliebig viele).\n"
+            "Shift+Klick auf einen Preset-Button wählt nur dessen Module ab.\n\n"
             "Konfiguration (Netz/Jahr/Name):\n"
             "Um Ihre Konfiguration zu ändern, löschen Sie die Datei 'config.ini' \n"
             "im Ordner 'configs' und starten Sie das Programm neu."
@@ -943,9 +967,15 @@ class WordMergerApp:
              
         selected_files_for_merge = [cover_path]
         
-        for item in self.checkbox_items:
-            if item["check_var"].get():
-                selected_files_for_merge.append(item["path"])
+        selected_files_for_merge.extend(self.module_list.selected_paths())
+
+        broken = [os.path.basename(path) for path in selected_files_for_merge
+                  if self.module_checks.get(path, {}).get('errors')]
+        if broken and not messagebox.askyesno("Fehlerhafte Module",
+                                              "Folgende Dateien sind fehlerhaft und fehlen im Ergebnis:\n"
+                                              + "\n".join(f"- {name}" for name in broken)
+                                              + "\n\nTrotzdem fortfahren?", parent=self.root):
+            return
 
         if len(selected_files_for_merge) == 1:
             if not messagebox.askyesno("Warnung", 
@@ -965,11 +995,11 @@ class WordMergerApp:
 
         doc_type, serial_num, ael_checked = dialog.result
         
-        base_name = f"{doc_type} {self.settings['regional_code_full']} {serial_num}-{self.settings['year']}"
-        new_folder_path = os.path.join(self.output_dir, base_name)
-        file_name_with_ext = f"{base_name}.docx"
-        save_path = os.path.join(new_folder_path, file_name_with_ext)
+        base_name = build_base_name(doc_type, self.settings['regional_code_full'], serial_num, self.settings['year'])
+        new_folder_path, save_path = self.engine.output_paths(base_name)
+        file_name_with_ext = os.path.basename(save_path)
 
+        folder_created = not os.path.isdir(new_folder_path)
         try:
             os.makedirs(new_folder_path, exist_ok=True)
         except Exception as e:
@@ -983,196 +1013,221 @@ class WordMergerApp:
                                        parent=self.root):
                 return
         
-        try:
-            self.start_button.config(text="Arbeite...", state="disabled")
-            self.root.update_idletasks()
+        self.pending_job = {
+            'base_name': base_name,
+            'save_path': save_path,
+            'folder_path': new_folder_path,
+            'folder_created': folder_created,
+            'ael_checked': ael_checked,
+        }
+        self.start_button.config(text="Arbeite...", state="disabled")
+        self.show_progress(0, len(selected_files_for_merge), "Vorbereitung...")
+        # The merge loads what is still missing itself; the prefetch would only compete with it
+        self.prefetcher.pause()
+        self.worker.start('merge', self.engine.merge_documents, selected_files_for_merge, save_path)
+        self.root.after(100, self.poll_worker)
+
+    def show_progress(self, done, total, text):
+        """Shows the progress bar and cancel button (packed right-to-left next to the start button)."""
+        if not self.progress_bar.winfo_ismapped():
+            self.cancel_button.pack(side=tk.RIGHT, padx=(0, 5))
+            self.progress_bar.pack(side=tk.RIGHT, padx=(0, 5))
+            self.progress_label.pack(side=tk.RIGHT, padx=(0, 5))
+        self.cancel_button.config(state="normal")
+        self.progress_bar.config(maximum=max(total, 1), value=done)
+        self.progress_label.config(text=f"{done}/{total}: {text}" if total else text)
+
+    def hide_progress(self):
+        self.cancel_button.pack_forget()
+        self.progress_bar.pack_forget()
+        self.progress_label.pack_forget()
+        self.start_button.config(text="Ausgewählte Dateien zusammenfügen", state="normal")
+
+    def cancel_job(self):
+        """Asks the running job to stop; the output file is only written once the merge is complete."""
+        self.worker.cancel()
+        self.cancel_button.config(state="disabled")
+        self.progress_label.config(text="Wird abgebrochen...")
+
+    def on_close(self):
+        """Cancels a running job before the window is closed."""
+        if self.worker.is_running():
+            if not messagebox.askyesno("Beenden", "Es läuft noch ein Vorgang.\nAbbrechen und beenden?", parent=self.root):
+                return
+            self.close_requested = True
+            self.cancel_job()
+            return
+        self.shutdown()
+
+    def shutdown(self):
+        """Stops the background threads and closes the window."""
+        self.module_watcher.stop()
+        self.mirror_stop.set()
+        self.prefetcher.stop()
+        self.root.destroy()
+
+    def poll_worker(self):
+        """Drains the worker queue on the Tk main thread."""
+        while True:
+            try:
+                message = self.worker.queue.get_nowait()
+            except queue.Empty:
+                break
 
-            self.merge_documents(selected_files_for_merge, save_path)
+            kind = message[0]
+            if kind == 'progress':
+                _, done, total, text = message
+                self.show_progress(done, total, text)
+            elif kind == 'done':
+                self.job_finished(message[1], message[2])
+            elif kind == 'cancelled':
+                self.job_cancelled(message[1])
+            elif kind == 'error':
+                self.job_failed(message[1], message[2])
+
+        if not self.worker.is_running():
+            self.prefetcher.resume()
+        if self.worker.is_running() or not self.worker.queue.empty():
+            self.root.after(100, self.poll_worker)
+        elif self.close_requested:
+            self.shutdown()
+
+    def job_finished(self, tag, result=None):
+        job = self.pending_job
+        if tag == 'ael':
+            self.hide_progress()
+            if result is False:
+                messagebox.showwarning("AEL-Verrechnung",
+                                       f"Die Excel-Datei '{self.engine.ael_file_path}' ist eventuell geöffnet.\n\n"
+                                       "Die Zeile ist im AEL-Ledger gespeichert und wird beim nächsten Speichern "
+                                       "automatisch in die Excel-Datei übernommen.",
+                                       parent=self.root)
+                return
+            messagebox.showinfo("AEL-Verrechnung", 
+                                f"Excel-Datei '{self.engine.ael_file_path}' erfolgreich aktualisiert.", 
+                                parent=self.root)
+            return
 
-            messagebox.showinfo("Erfolg", f"Dateien erfolgreich zusammengefügt!\nGespeichert als: {save_path}")
+        self.hide_progress()
+        result = result or {}
+        job['trace'] = result.get('trace')
+        if result.get('media_bytes_saved'):
+            print(f"Duplicate images stored once: {result['media_bytes_saved']} bytes saved")
+        if result.get('memoized'):
+            print("Identical build found in the build store, copied instead of merged")
+        if self.close_requested:
+            return
+        message = f"Dateien erfolgreich zusammengefügt!\nGespeichert als: {job['save_path']}"
+        if self.settings.get('trace_summary') and job['trace'] is not None:
+            message += "\n\n" + job['trace'].summary()
+        if result.get('failed'):
+            failed = "\n".join(f"- {f['file']}: {f['error']}" for f in result['failed'])
+            messagebox.showwarning("Erfolg mit Fehlern",
+                                   f"{message}\n\nFolgende Module konnten nicht eingefügt werden und fehlen:\n{failed}")
+        else:
+            messagebox.showinfo("Erfolg", message)
+        
+        if job['ael_checked']:
+            ael_dialog = AelDetailsDialog(self.root, "AEL-Verrechnungsdetails")
             
-            if ael_checked:
-                ael_dialog = AelDetailsDialog(self.root, "AEL-Verrechnungsdetails")
+            if ael_dialog.result: 
+                project_num, kurztext, leistung_dritte, sonstiges = ael_dialog.result
+                today_date = datetime.now().strftime("%d.%m.%Y")
+                user_name = self.settings.get('user_name', 'UNBEKANNT')
                 
-                if ael_dialog.result: 
-                    project_num, kurztext, leistung_dritte, sonstiges = ael_dialog.result
-                    today_date = datetime.now().strftime("%d.%m.%Y")
-                    user_name = self.settings.get('user_name', 'UNBEKANNT')
-                    
-                    self.update_ael_excel(
-                        project_num=project_num,
-                        kurztext=kurztext,
-                        leistung_dritte=leistung_dritte,
-                        user_name=user_name,
-                        today_date=today_date,
-                        betra_name=base_name,
-                        sonstiges=sonstiges
-                    )
-
-        except Exception as e:
-            messagebox.showerror("Fehler", f"Ein Fehler ist aufgetreten:\n{e}\n\n"
-                                           f"Hinweis: Stellen Sie sicher, dass die Zieldatei (falls sie existiert) geschlossen ist.")
-        finally:
-            self.start_button.config(text="Ausgewählte Dateien zusammenfügen", state="normal")
-
-    def update_ael_excel(self, project_num, kurztext, leistung_dritte, user_name, today_date, betra_name, sonstiges):
-        """Creates or updates the AEL-Verrechnung.xlsx in the output folder."""
-        
-        excel_path = os.path.join(self.output_dir, "AEL-Verrechnung.xlsx")
-        
-        headers = [
-            "Auftragsart", "Eckstarttermin", "Eckendtermin", "AAR-ProjektNr", "Kurztext", 
-            "Verantw.ArbPl.", "Auftrag", "AAR-Auftr.-Nr.", "(Buchungsdatum)\nDatum", "Name", 
-            "Arbeitsplatz (A0BBK, A0BETRA oder A0SIPLA)", "(LArt)\nFAA\n(immer 1065)", 
-            "Werk\n(immer 16ES)", "Einheit\n(immer MIN)", "(Ist-Arbeit)\nMenge", 
-            "(Rückmeldetext)\nTätigkeitsbezeichnung/Betra-Nr./SiPla-Nr.", "Bemerkung / Frage"
-        ]
-        
-        new_row_data = [""] * len(headers)
-        
-        new_row_data[4] = kurztext                      # E: Kurztext
-        new_row_data[7] = project_num                   # H: AAR-Auftr.-Nr.
-        new_row_data[8] = today_date                    # I: Datum
-        new_row_data[9] = user_name                     # J: Name
-        new_row_data[10] = "A0BETRA"                    # K: Arbeitsplatz
-        new_row_data[11] = "1065"                       # L: FAA
-        new_row_data[12] = "16ES"                       # M: Werk
-        new_row_data[13] = "MIN"                        # N: Einheit
-        new_row_data[15] = betra_name                   # P: Tätigkeitsbezeichnung
-        new_row_data[16] = sonstiges                    # Q: Bemerkung / Frage
-        
-        fill_yellow_header = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
-        fill_red_header = PatternFill(start_color="F8CBAD", end_color="F8CBAD", fill_type="solid")
-        fill_yellow_row = PatternFill(start_color="FFC000", end_color="FFC000", fill_type="solid")
-
-        header_font = Font(name='DB Neo Office Head', size=11, bold=True)
-        data_font = Font(name='Db Neo Office', size=11, bold=False)
-        
-        # Column indices (0-based) for red header color: I, J, K, O, P
-        red_header_indices = [8, 9, 10, 14, 15] 
+                self.update_ael_excel(
+                    project_num=project_num,
+                    kurztext=kurztext,
+                    leistung_dritte=leistung_dritte,
+                    user_name=user_name,
+                    today_date=today_date,
+                    betra_name=job['base_name'],
+                    sonstiges=sonstiges
+                )
 
-        thin_border_side = Side(border_style="thin", color="000000")
-        full_border = Border(left=thin_border_side, right=thin_border_side, top=thin_border_side, bottom=thin_border_side)
-        
-        # Header alignment
-        header_alignment = Alignment(wrap_text=True, horizontal='center', vertical='center')
+    def job_cancelled(self, tag):
+        job = self.pending_job
+        self.hide_progress()
+        if job['folder_created']:
+            try:
+                os.rmdir(job['folder_path'])  # only succeeds if nothing else is in it
+            except OSError:
+                pass
+        if not self.close_requested:
+            messagebox.showinfo("Abgebrochen", "Der Vorgang wurde abgebrochen. Es wurde keine Datei gespeichert.", parent=self.root)
+
+    def job_failed(self, tag, error):
+        job = self.pending_job
+        if tag == 'ael':
+            self.hide_progress()
+            self.show_ael_error(error, job['ael_row'])
+            return
 
-        try:
-            if not os.path.exists(excel_path):
-                wb = openpyxl.Workbook()
-                sheet = wb.active
-                sheet.title = "AEL-Aufträge"
-                sheet.append(headers)
-                
-                # Apply header styles (color, font, border, alignment)
-                for col_idx, cell in enumerate(sheet[1], 1): # 1-based index
-                    if (col_idx - 1) in red_header_indices:
-                        cell.fill = fill_red_header
-                    else:
-                        cell.fill = fill_yellow_header
-                    cell.border = full_border
-                    cell.font = header_font
-                    cell.alignment = header_alignment
-                
-                sheet.append(new_row_data)
-                # Apply data styles (font, border)
-                new_row_index = sheet.max_row
-                for cell in sheet[new_row_index]:
-                    cell.border = full_border
-                    cell.font = data_font
+        self.hide_progress()
+        if job['folder_created']:
+            try:
+                os.rmdir(job['folder_path'])
+            except OSError:
+                pass
+        messagebox.showerror("Fehler", f"Ein Fehler ist aufgetreten:\n{error}\n\n"
+                                       f"Hinweis: Stellen Sie sicher, dass die Zieldatei (falls sie existiert) geschlossen ist.")
 
-            else:
-                wb = openpyxl.load_workbook(excel_path)
-                sheet = wb.active
-                sheet.append(new_row_data)
-                
-                # Apply data styles (font, border)
-                new_row_index = sheet.max_row
-                for cell in sheet[new_row_index]:
-                    cell.border = full_border
-                    cell.font = data_font
-            
-            # Apply row color if needed (overwrites border fill, so border must be applied first)
-            if leistung_dritte:
-                new_row_index = sheet.max_row 
-                for cell in sheet[new_row_index]:
-                    cell.fill = fill_yellow_row
-                    cell.border = full_border # Ensure border is re-applied
-                    cell.font = data_font     # Ensure font is re-applied
-            
-            # Auto-adjust column width
-            for col in sheet.columns:
-                max_length = 0
-                column_letter = col[0].column_letter
-                for cell in col:
-                    try:
-                        cell_value = str(cell.value)
-                        lines = cell_value.split('\n')
-                        cell_max_line = max(len(line) for line in lines)
-                        
-                        if cell_max_line > max_length:
-                            max_length = cell_max_line
-                    except:
-                        pass
-                adjusted_width = max(10, max_length + 2) 
-                sheet.column_dimensions[column_letter].width = adjusted_width
-            
-            wb.save(excel_path)
-            messagebox.showinfo("AEL-Verrechnung", 
-                                f"Excel-Datei '{excel_path}' erfolgreich aktualisiert.", 
-                                parent=self.root)
-            
-        except PermissionError:
-             error_details = (
-                f"Projekt-Nr.: {project_num}\n"
-                f"Kurztext: {kurztext}\n"
-                f"Sonstiges: {sonstiges}\n"
-                f"Datum: {today_date}\n"
-                f"Name: {user_name}\n"
-                f"Betra-Bez.: {betra_name}\n"
-                f"Leistung Dritte: {'Ja' if leistung_dritte else 'Nein'}\n\n"
-                f"Statisch: A0BETRA, 1065, 16ES, MIN"
-             )
-             messagebox.showerror("Fehler (Excel)", 
+    def update_ael_excel(self, project_num, kurztext, leistung_dritte, user_name, today_date, betra_name, sonstiges):
+        """Appends the AEL row on the background worker; the result is reported by poll_worker."""
+        ael_row = (project_num, kurztext, leistung_dritte, user_name, today_date, betra_name, sonstiges)
+        self.pending_job['ael_row'] = ael_row
+        trace = self.pending_job.get('trace')
+
+        def write_row(progress, cancel_event):
+            progress(0, 0, "AEL-Verrechnung wird gespeichert...")
+            return self.engine.append_ael_row(*ael_row, trace=trace)
+
+        self.start_button.config(text="Arbeite...", state="disabled")
+        self.worker.start('ael', write_row)
+        self.root.after(100, self.poll_worker)
+
+    def show_ael_error(self, error, ael_row):
+        """Reports a failed AEL write, with the row to enter by hand if the ledger was locked."""
+        project_num, kurztext, leistung_dritte, user_name, today_date, betra_name, sonstiges = ael_row
+        excel_path = self.engine.ael_file_path
+
+        error_details = (
+            f"Projekt-Nr.: {project_num}\n"
+            f"Kurztext: {kurztext}\n"
+            f"Sonstiges: {sonstiges}\n"
+            f"Datum: {today_date}\n"
+            f"Name: {user_name}\n"
+            f"Betra-Bez.: {betra_name}\n"
+            f"Leistung Dritte: {'Ja' if leistung_dritte else 'Nein'}\n\n"
+            f"Statisch: A0BETRA, 1065, 16ES, MIN"
+        )
+        if isinstance(error, sqlite3.Error):
+            messagebox.showerror("Fehler (AEL-Ledger)",
+                                 f"Speichern fehlgeschlagen!\nDas AEL-Ledger '{self.engine.ael_ledger.db_path}' ist "
+                                 f"gesperrt oder nicht beschreibbar ({error}).\n\n"
+                                 "Die Zeile wurde nicht gespeichert. Bitte tragen Sie sie manuell ein:\n\n"
+                                 f"{error_details}",
+                                 parent=self.root)
+        elif isinstance(error, PermissionError):
+            messagebox.showerror("Fehler (Excel)", 
                                 f"Speichern fehlgeschlagen!\nDie Datei '{excel_path}' ist eventuell geöffnet.\n\n"
                                 "Bitte schließen Sie die Datei und tragen Sie die Zeile manuell ein:\n\n"
                                 f"{error_details}", 
                                 parent=self.root)
-        except Exception as e:
+        else:
             messagebox.showerror("Fehler (Excel)", 
-                                f"Ein unerwarteter Fehler beim Speichern der Excel-Datei ist aufgetreten:\n{e}", 
+                                f"Ein unerwarteter Fehler beim Speichern der Excel-Datei ist aufgetreten:\n{error}", 
                                 parent=self.root)
 
-    def merge_documents(self, file_paths, save_path):
-        """
-        Merges a list of .docx files into a single document.
-        The first file (file_paths[0]) is the base document.
-        """
-        if not file_paths:
-            return
-
-        if not os.path.exists(file_paths[0]):
-            raise FileNotFoundError(f"Die Basis-Datei (Deckblatt) konnte nicht gefunden werden: {file_paths[0]}")
-
-        master_doc = Document(file_paths[0])
-        composer = Composer(master_doc)
-
-        if len(file_paths) > 1:
-            for file_path in file_paths[1:]:
-                if not os.path.exists(file_path):
-                    print(f"Warning: Skipping file (not found): {file_path}")
-                    continue
-                try:
-                    doc_to_append = Document(file_path)
-                    composer.append(doc_to_append)
-                except Exception as inner_exception:
-                    print(f"Error appending {file_path}: {inner_exception}")
-                    pass
-
-        composer.save(save_path)
-
 
 if __name__ == "__main__":
+    # Rebuilds and module checks run in worker processes, also from the frozen .exe
+    import multiprocessing
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main())
+
     root = tk.Tk()
     app = WordMergerApp(root)
     root.mainloop()
\ No newline at end of file
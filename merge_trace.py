@@ -0,0 +1,135 @@
+"""
+Per-stage timing of a build, written as a Chrome trace (chrome://tracing, Perfetto).
+
+Every stage (open, parse, styles, append, save, dedupe, ledger, excel) is one
+complete event; per-module events carry the module file name, so a slow module
+shows up by name. Append failures are recorded as instant events and kept in
+self.failures for the caller to report.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+TRACE_SUFFIX = ".trace.json"
+
+
+def trace_path(save_path):
+    """output/<name>/<name>.docx -> output/<name>/<name>.trace.json"""
+    return os.path.splitext(save_path)[0] + TRACE_SUFFIX
+
+
+class MergeTrace:
+    """Collects trace events of one build; safe to use from several threads."""
+
+    def __init__(self, title=""):
+        self.title = title
+        self.path = None
+        self.events = []
+        self.failures = []  # {'file': name, 'stage': stage, 'error': message}
+        self.fallback = None  # why the merge was started over with another backend
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._t0 = time.perf_counter()
+
+    def _now_us(self):
+        return (time.perf_counter() - self._t0) * 1e6
+
+    @contextmanager
+    def span(self, stage, file=None, **args):
+        """Times the block as one event of the given stage (for one module file, if given)."""
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            if file is not None:
+                args['file'] = os.path.basename(file)
+            event = {'name': args.get('file', stage), 'cat': stage, 'ph': "X", 'ts': round(start, 1),
+                     'dur': round(self._now_us() - start, 1), 'pid': self._pid,
+                     'tid': threading.get_ident(), 'args': args}
+            with self._lock:
+                self.events.append(event)
+
+    def failure(self, stage, file, error):
+        """Records a module that could not be processed."""
+        name = os.path.basename(file)
+        with self._lock:
+            self.failures.append({'file': name, 'stage': stage, 'error': str(error)})
+            self.events.append({'name': f"{stage} failed: {name}", 'cat': "error", 'ph': "i", 's': "t",
+                                'ts': round(self._now_us(), 1), 'pid': self._pid,
+                                'tid': threading.get_ident(), 'args': {'file': name, 'error': str(error)}})
+
+    def restart(self, reason):
+        """
+        Drops the events and failures of an aborted attempt (the merge starts over with
+        another backend) and marks the restart; the gap before it is the time lost.
+        """
+        with self._lock:
+            self.fallback = str(reason)
+            self.failures.clear()
+            self.events = [{'name': "fallback", 'cat': "fallback", 'ph': "i", 's': "p",
+                            'ts': round(self._now_us(), 1), 'pid': self._pid,
+                            'tid': threading.get_ident(), 'args': {'reason': str(reason)}}]
+
+    def save(self, path=None):
+        """Writes the trace (to path, or to the path of the last save)."""
+        self.path = path or self.path
+        with self._lock:
+            data = {'traceEvents': list(self.events), 'displayTimeUnit': "ms",
+                    'otherData': {'title': self.title, 'failures': list(self.failures), 'fallback': self.fallback}}
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"Could not write trace file: {e}")
+
+    def stage_totals(self):
+        """{stage: seconds}, summed over all events of that stage."""
+        return stage_totals(self.events)
+
+    def slowest_modules(self, count=5):
+        """[(file name, seconds)] of the modules with the most time over all stages."""
+        return slowest_modules(self.events, count)
+
+    def summary(self, count=5):
+        """Short text report: time per stage and the slowest modules."""
+        return format_summary(self.events, self.failures, count)
+
+
+def stage_totals(events):
+    totals = {}
+    for event in events:
+        if event.get('ph') == "X":
+            totals[event['cat']] = totals.get(event['cat'], 0.0) + event['dur'] / 1e6
+    return totals
+
+
+def slowest_modules(events, count=5):
+    per_file = {}
+    for event in events:
+        file = event.get('args', {}).get('file')
+        if event.get('ph') == "X" and file:
+            per_file[file] = per_file.get(file, 0.0) + event['dur'] / 1e6
+    return sorted(per_file.items(), key=lambda item: item[1], reverse=True)[:count]
+
+
+def format_summary(events, failures=(), count=5):
+    lines = ["Zeit je Schritt:"]
+    for stage, seconds in sorted(stage_totals(events).items(), key=lambda item: item[1], reverse=True):
+        lines.append(f"  {stage:<8} {seconds:7.2f} s")
+    modules = slowest_modules(events, count)
+    if modules:
+        lines.append("Langsamste Module:")
+        lines.extend(f"  {seconds:7.2f} s  {file}" for file, seconds in modules)
+    if failures:
+        lines.append("Fehler:")
+        lines.extend(f"  {f['file']} ({f['stage']}): {f['error']}" for f in failures)
+    return "\n".join(lines)
+
+
+def load_events(path):
+    """Events and failures of a saved trace file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('traceEvents', []), data.get('otherData', {}).get('failures', [])
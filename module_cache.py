@@ -0,0 +1,211 @@
+"""Cache of parsed module documents, validated by mtime, size and content hash."""
+import os
+import re
+import json
+import hashlib
+import zipfile
+import threading
+from collections import OrderedDict
+
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Rough factor between the unpacked XML size and the memory of the parsed lxml tree
+PARSED_SIZE_FACTOR = 3
+
+# Parts that docxcompose never reads from an appended module. settings.xml alone is
+# often larger than the body, so the normalized copies leave them out.
+_DROPPED_PARTS = re.compile(r'^(word/settings\.xml|word/webSettings\.xml|word/glossary/|customXml/)')
+_DROPPED_RELS = re.compile(
+    rb'<Relationship [^>]*Target="(?:\.\./)?(?:settings\.xml|webSettings\.xml|glossary/[^"]*|customXml/[^"]*)"[^>]*/>')
+_DROPPED_OVERRIDES = re.compile(
+    rb'<Override PartName="/(?:word/settings\.xml|word/webSettings\.xml|word/glossary/[^"]*|customXml/[^"]*)"[^>]*/>')
+
+
+def file_sha256(path):
+    """Content hash of a file."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def normalize_module(src_path, dst_path):
+    """
+    Writes an uncompressed copy of a module without the parts that are irrelevant
+    for appending. Returns the unpacked size in bytes.
+    """
+    unpacked_size = 0
+    # Unique per thread: two files with the same content may be normalized at once
+    tmp_path = f"{dst_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with zipfile.ZipFile(src_path) as zin, zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED) as zout:
+        for info in zin.infolist():
+            name = info.filename
+            if _DROPPED_PARTS.match(name):
+                continue
+            data = zin.read(name)
+            if name.endswith('.rels'):
+                data = _DROPPED_RELS.sub(b'', data)
+            elif name == '[Content_Types].xml':
+                data = _DROPPED_OVERRIDES.sub(b'', data)
+            unpacked_size += len(data)
+            zout.writestr(name, data)
+    os.replace(tmp_path, dst_path)
+    return unpacked_size
+
+
+class ModuleCache:
+    """
+    Two-level cache for module documents.
+
+    - On disk (cache/modules/): a normalized, uncompressed copy of every module, named
+      by content hash, plus index.json with the (mtime, size, hash) seen per file.
+      This survives restarts, so a module is only re-hashed when it was touched.
+    - In memory: parsed Document objects in LRU order, capped by an estimated size.
+
+    Parsed documents are shared between builds. docxcompose deep-copies the body of
+    an appended document, so they can be appended any number of times. Never use a
+    cached document as the master of a Composer.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = os.path.join(cache_dir, "modules")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.RLock()
+        self._parsed = OrderedDict()  # sha256 -> (Document, estimated bytes)
+        self._parsed_bytes = 0
+        self._index = {}  # abs path -> {'mtime': ns, 'size': bytes, 'sha256': hex, 'unpacked': bytes}
+        self._index_dirty = False
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == CACHE_FORMAT:
+                self._index = data.get('files', {})
+        except (OSError, ValueError):
+            self._index = {}
+
+    def save_index(self):
+        """Writes index.json if anything changed."""
+        with self._lock:
+            if not self._index_dirty:
+                return
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'format': CACHE_FORMAT, 'files': self._index}, f)
+                os.replace(tmp_path, self.index_path)
+                self._index_dirty = False
+            except OSError as e:
+                print(f"Could not save module cache index: {e}")
+
+    def entry(self, path):
+        """
+        Returns the validated index entry of a module. The file is only hashed (and
+        normalized) if its mtime or size differ from the last time it was seen.
+        """
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._index.get(path)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size \
+                    and os.path.exists(self._normalized_path(entry['sha256'])):
+                return entry
+
+        sha256 = file_sha256(path)
+        normalized_path = self._normalized_path(sha256)
+        if entry and entry['sha256'] == sha256 and os.path.exists(normalized_path):
+            unpacked = entry['unpacked']
+        else:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            unpacked = normalize_module(path, normalized_path)
+
+        old_entry = entry
+        entry = {'mtime': st.st_mtime_ns, 'size': st.st_size, 'sha256': sha256, 'unpacked': unpacked}
+        with self._lock:
+            self._index[path] = entry
+            self._index_dirty = True
+            if old_entry and old_entry['sha256'] != sha256:
+                self._remove_unreferenced(old_entry['sha256'])
+        return entry
+
+    def content_hash(self, path):
+        """sha256 of a module file (cached by mtime and size)."""
+        return self.entry(path)['sha256']
+
+    def get(self, path):
+        """Returns the parsed module, shared between callers (read-only use only)."""
+        entry = self.entry(path)
+        sha256 = entry['sha256']
+        with self._lock:
+            if sha256 in self._parsed:
+                self._parsed.move_to_end(sha256)
+                self.hits += 1
+                return self._parsed[sha256][0]
+
+        from docx import Document
+        doc = Document(self._normalized_path(sha256))
+        estimated = entry['unpacked'] * PARSED_SIZE_FACTOR
+        with self._lock:
+            self.misses += 1
+            if sha256 not in self._parsed:
+                self._parsed[sha256] = (doc, estimated)
+                self._parsed_bytes += estimated
+                self._evict()
+            return self._parsed[sha256][0]
+
+    def normalized_path(self, path):
+        """Path of the normalized (uncompressed) copy of a module, for readers that work on the zip."""
+        return self._normalized_path(self.entry(path)['sha256'])
+
+    def load_fresh(self, path):
+        """Returns a private parsed copy of the original file (e.g. for the master document)."""
+        from docx import Document
+        return Document(path)
+
+    def is_cached(self, path):
+        """True if the module is parsed and in memory with its current content."""
+        try:
+            sha256 = self.entry(path)['sha256']
+        except OSError:
+            return False
+        with self._lock:
+            return sha256 in self._parsed
+
+    @property
+    def parsed_bytes(self):
+        """Estimated memory of the parsed documents held."""
+        with self._lock:
+            return self._parsed_bytes
+
+    def clear(self):
+        """Drops all parsed documents from memory (the disk cache stays)."""
+        with self._lock:
+            self._parsed.clear()
+            self._parsed_bytes = 0
+
+    def _evict(self):
+        while self._parsed_bytes > self.max_bytes and len(self._parsed) > 1:
+            _, (_, estimated) = self._parsed.popitem(last=False)
+            self._parsed_bytes -= estimated
+
+    def _remove_unreferenced(self, sha256):
+        if any(e['sha256'] == sha256 for e in self._index.values()):
+            return
+        parsed = self._parsed.pop(sha256, None)
+        if parsed:
+            self._parsed_bytes -= parsed[1]
+        try:
+            os.remove(self._normalized_path(sha256))
+        except OSError:
+            pass
+
+    def _normalized_path(self, sha256):
+        return os.path.join(self.cache_dir, f"{sha256}.docx")
@@ -0,0 +1,184 @@
+"""
+Pre-flight check of module files, cached per content hash (cache/checks/index.json).
+
+A module is checked for what would otherwise only show up during a merge:
+- zip integrity (CRCs) and the parts every .docx needs,
+- well-formed XML in every part,
+- style and numbering references of the body that point nowhere, and the
+  constructs only docxcompose can merge (warnings, the module still works),
+- a trial append to an empty document with docxcompose.
+Errors mean the module cannot be merged; the GUI greys it out. The checks run in
+worker processes, as they are mostly XML parsing.
+"""
+import os
+import json
+import zipfile
+import threading
+from lxml import etree
+
+from ooxml_merge import (CONTENT_TYPES, DOCUMENT_PART, NS, RT_NUMBERING, RT_STYLES, OoxmlPackage,
+                         unsupported_construct)
+from skeleton import composer_version
+
+CHECK_FORMAT = 1
+_W = "{%s}" % NS['w']
+
+
+def check_module(path):
+    """Checks one module; returns {'errors': [...], 'warnings': [...]} with German messages."""
+    errors = []
+    warnings = []
+    try:
+        with zipfile.ZipFile(path) as zf:
+            bad_part = zf.testzip()
+            if bad_part is not None:
+                return {'errors': [f"Beschädigter Teil '{bad_part}' (Prüfsumme)"], 'warnings': []}
+            names = set(zf.namelist())
+            for required in (CONTENT_TYPES, DOCUMENT_PART):
+                if required not in names:
+                    errors.append(f"Teil '{required}' fehlt")
+            for name in sorted(names):
+                if name.endswith(('.xml', '.rels')):
+                    try:
+                        with zf.open(name) as f:
+                            for _, element in etree.iterparse(f):
+                                element.clear()
+                    except etree.XMLSyntaxError as e:
+                        errors.append(f"Fehlerhaftes XML in '{name}': {e}")
+    except (OSError, zipfile.BadZipFile, NotImplementedError) as e:
+        return {'errors': [f"Keine gültige .docx-Datei: {e}"], 'warnings': []}
+    if errors:
+        return {'errors': errors, 'warnings': warnings}
+
+    try:
+        warnings.extend(_reference_warnings(path))
+    except (OSError, KeyError, etree.XMLSyntaxError) as e:
+        errors.append(f"Nicht lesbar: {e}")
+
+    try:
+        from docx import Document
+        from docxcompose.composer import Composer
+        Composer(Document()).append(Document(path))
+    except Exception as e:
+        errors.append(f"Probeweises Einfügen fehlgeschlagen: {type(e).__name__}: {e}")
+    return {'errors': errors, 'warnings': warnings}
+
+
+def _reference_warnings(path):
+    """Styles and numberings the body uses but the module does not define, and docxcompose-only constructs."""
+    package = OoxmlPackage(path)
+    try:
+        body = etree.fromstring(package.read(DOCUMENT_PART)).find(_W + 'body')
+        styles_name = package.part_with_reltype(DOCUMENT_PART, RT_STYLES)
+        numbering_name = package.part_with_reltype(DOCUMENT_PART, RT_NUMBERING)
+        style_ids = set()
+        if styles_name:
+            style_ids = set(etree.fromstring(package.read(styles_name)).xpath("./w:style/@w:styleId", namespaces=NS))
+        num_ids = set()
+        if numbering_name:
+            numbering = etree.fromstring(package.read(numbering_name))
+            anum_ids = set(numbering.xpath("./w:abstractNum/@w:abstractNumId", namespaces=NS))
+            for num in numbering.iterchildren(_W + 'num'):
+                if set(num.xpath("./w:abstractNumId/@w:val", namespaces=NS)) <= anum_ids:
+                    num_ids.add(num.get(_W + 'numId'))
+    finally:
+        package.close()
+
+    warnings = []
+    if body is None:
+        return ["Dokument ohne Inhalt"]
+    used_styles = set(body.xpath(".//w:pStyle/@w:val|.//w:rStyle/@w:val|.//w:tblStyle/@w:val", namespaces=NS))
+    for style_id in sorted(used_styles - style_ids):
+        warnings.append(f"Formatvorlage '{style_id}' ist nicht definiert")
+    used_nums = set(body.xpath(".//w:numId/@w:val", namespaces=NS)) - {"0"}
+    for num_id in sorted(used_nums - num_ids):
+        warnings.append(f"Nummerierung {num_id} ist nicht (vollständig) definiert")
+    reasons = {unsupported_construct(element) for element in body} - {None}
+    for reason in sorted(reasons):
+        warnings.append(f"Enthält {reason} (nur mit dem Merge-Verfahren docxcompose)")
+    return warnings
+
+
+class ModuleChecker:
+    """
+    Results of check_module by content hash, kept in cache/checks/index.json.
+    A new docxcompose version invalidates all results (the trial append uses it).
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.join(cache_dir, "checks")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._results = self._load()  # sha256 -> {'errors', 'warnings'}
+
+    def _version(self):
+        return f"{CHECK_FORMAT}:{composer_version()}"
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self._version():
+                return data.get('results', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self._version(), 'results': self._results}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not save module check results: {e}")
+
+    def cached(self, sha256):
+        """The stored result for a content hash, None if it was not checked yet."""
+        with self._lock:
+            return self._results.get(sha256)
+
+    def check(self, files, jobs=1, progress=None):
+        """
+        Checks [(path, sha256)] and returns {path: result}; only contents not checked
+        before are opened, up to 'jobs' at once in worker processes. A file without
+        a hash (unreadable) is checked every time. progress(done, total, filename)
+        is called for every file checked.
+        """
+        results = {}
+        todo = []
+        for path, sha256 in files:
+            result = self.cached(sha256) if sha256 else None
+            if result is not None:
+                results[path] = result
+            else:
+                todo.append((path, sha256))
+        if not todo:
+            return results
+
+        def finished(done, path, sha256, result, keep=True):
+            results[path] = result
+            if sha256 and keep:
+                with self._lock:
+                    self._results[sha256] = result
+            if progress is not None:
+                progress(done, len(todo), os.path.basename(path))
+
+        if jobs <= 1 or len(todo) == 1:
+            for done, (path, sha256) in enumerate(todo, 1):
+                finished(done, path, sha256, check_module(path))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = {executor.submit(check_module, path): (path, sha256) for path, sha256 in todo}
+                for done, future in enumerate(as_completed(futures), 1):
+                    path, sha256 = futures[future]
+                    try:
+                        finished(done, path, sha256, future.result())
+                    except Exception as e:
+                        # Not kept: the worker failed, not the module
+                        finished(done, path, sha256, {'errors': [f"Prüfung abgebrochen: {e}"], 'warnings': []},
+                                 keep=False)
+        self._save()
+        return results
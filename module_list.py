@@ -0,0 +1,250 @@
+"""Module checklist of the main window: one ttk.Treeview per layout column."""
+import os
+import tkinter as tk
+from tkinter import ttk
+
+CHECKED = "☑ "
+UNCHECKED = "☐ "
+BINDTAG = "BetraModuleTree"
+
+
+def layout_key(filename, column_layout):
+    """Determines the layout group (and column) for a file."""
+    parts = filename.split('.')
+    if not parts:
+        return "Unsorted"
+
+    main_chapter = parts[0]
+
+    if main_chapter == "5":
+        if len(parts) > 1:
+            key = f"{parts[0]}.{parts[1]}"
+            if key in column_layout:
+                return key
+
+    if main_chapter in column_layout:
+        return main_chapter
+
+    return "Unsorted"
+
+
+class ModuleList(ttk.Frame):
+    """
+    Checklist of modules, grouped by COLUMN_LAYOUT into side-by-side Treeviews.
+
+    A Treeview only draws the rows that are visible, so the list costs a few
+    widgets regardless of the library size. The checked state lives in one
+    bytearray (self.selected, indexed like self.items) instead of a BooleanVar
+    per row, and all trees share one set of class-level bindings. Mandatory
+    modules are always checked and cannot be toggled; disabled modules cannot
+    be toggled either. Highlighted rows (search hits) get a coloured background.
+
+    self.items holds one dict per module: path, filename, is_mandatory, index.
+    describe(path), if given, returns the hover text of a module. on_select(path),
+    if given, is called whenever an optional module gets checked.
+    """
+
+    def __init__(self, parent, column_layout, num_columns, mandatory_files, describe=None, on_select=None,
+                 **kwargs):
+        super().__init__(parent, **kwargs)
+        self.column_layout = column_layout
+        self.num_columns = num_columns
+        self.mandatory_files = set(mandatory_files)
+        self.describe = describe
+        self.on_select = on_select
+
+        self.items = []
+        self.selected = bytearray()
+        self.disabled = bytearray()
+        self.highlighted = bytearray()
+        self._tree_of = []  # item index -> Treeview holding its row
+        self._index_of = {}  # path (= row id) -> item index
+
+        self.trees = []
+        for i in range(num_columns):
+            self.columnconfigure(i, weight=1, uniform="modules")
+            column = ttk.Frame(self)
+            column.grid(row=0, column=i, sticky="nsew", padx=5)
+            tree = ttk.Treeview(column, show="tree", selectmode="none")
+            tree.column("#0", width=200, minwidth=120, stretch=True)
+            tree.tag_configure("group", font=("-default-", 10, "bold"))
+            tree.tag_configure("mandatory", foreground="gray40")
+            tree.tag_configure("disabled", foreground="gray60")
+            tree.tag_configure("match", background="#fff2a8")
+            scrollbar = ttk.Scrollbar(column, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            scrollbar.pack(side=tk.RIGHT, fill="y")
+            tree.pack(side=tk.LEFT, fill="both", expand=True)
+            tree.bindtags((BINDTAG,) + tree.bindtags())
+            self.trees.append(tree)
+        self.rowconfigure(0, weight=1)
+
+        self.hover_label = ttk.Label(self, text="", font=("-default-", 9, "italic"), anchor="w")
+        self.hover_label.grid(row=1, column=0, columnspan=num_columns, sticky="ew", padx=5, pady=(4, 0))
+
+        self.bind_class(BINDTAG, "<Button-1>", self._on_click)
+        self.bind_class(BINDTAG, "<space>", self._on_space)
+        self.bind_class(BINDTAG, "<Motion>", self._on_motion)
+        self.bind_class(BINDTAG, "<Leave>", lambda e: self.hover_label.config(text=""))
+
+    # --- building ---
+
+    def set_modules(self, module_files):
+        """Replaces the list; mandatory modules start checked, all others unchecked."""
+        for tree in self.trees:
+            tree.delete(*tree.get_children())
+        self.items.clear()
+        self.update_modules(module_files)
+
+    def update_modules(self, module_files):
+        """
+        Patches the list to module_files (in display order): rows of removed modules
+        are deleted, new modules get a row at their place, and all other rows keep
+        their checked/disabled/highlighted state.
+        """
+        old_state = {item["path"]: (self.selected[i], self.disabled[i], self.highlighted[i])
+                     for i, item in enumerate(self.items)}
+        new_paths = set(module_files)
+        for path in old_state:
+            if path not in new_paths:
+                tree = self._tree_of[self._index_of[path]]
+                group = tree.parent(path)
+                tree.delete(path)
+                if not tree.get_children(group):
+                    tree.delete(group)
+
+        self.items.clear()
+        self.selected = bytearray(len(module_files))
+        self.disabled = bytearray(len(module_files))
+        self.highlighted = bytearray(len(module_files))
+        self._tree_of = []
+        self._index_of = {}
+        group_members = {}  # layout key -> paths in order
+        for index, file_path in enumerate(module_files):
+            filename = os.path.basename(file_path)
+            key = layout_key(filename, self.column_layout)
+            is_mandatory = filename in self.mandatory_files
+            selected, disabled, highlighted = old_state.get(file_path, (False, False, False))
+            self.selected[index] = is_mandatory or selected
+            self.disabled[index] = disabled
+            self.highlighted[index] = highlighted
+            self.items.append({
+                "path": file_path,
+                "filename": filename,
+                "is_mandatory": is_mandatory,
+                "index": index,
+            })
+            self._tree_of.append(self.trees[self.column_layout.get(key, self.num_columns - 1)])
+            self._index_of[file_path] = index
+            group_members.setdefault(key, []).append(file_path)
+
+        for key, paths in group_members.items():
+            tree = self._tree_of[self._index_of[paths[0]]]
+            group = f"g:{key}"
+            if not tree.exists(group):
+                title_text = f"Punkt {key}" if key != "Unsorted" else "Unsortiert"
+                keys_in_tree = [k for k in group_members if self._tree_of[self._index_of[group_members[k][0]]] is tree]
+                position = sum(1 for k in keys_in_tree[:keys_in_tree.index(key)] if tree.exists(f"g:{k}"))
+                tree.insert("", position, iid=group, text=title_text, open=True, tags=("group",))
+            for position, path in enumerate(paths):
+                if path not in old_state:
+                    index = self._index_of[path]
+                    tree.insert(group, position, iid=path, text=self._row_text(index), tags=self._row_tags(index))
+
+    def _row_text(self, index):
+        prefix = CHECKED if self.selected[index] else UNCHECKED
+        return prefix + os.path.splitext(self.items[index]["filename"])[0]
+
+    def _row_tags(self, index):
+        tags = ("match",) if self.highlighted[index] else ()
+        if self.items[index]["is_mandatory"]:
+            return ("mandatory",) + tags
+        if self.disabled[index]:
+            return ("disabled",) + tags
+        return tags
+
+    def _refresh_row(self, index):
+        self._tree_of[index].item(self.items[index]["path"], text=self._row_text(index), tags=self._row_tags(index))
+
+    # --- state ---
+
+    def is_selected(self, index):
+        return bool(self.selected[index])
+
+    def is_enabled(self, index):
+        """False for mandatory and disabled modules, which cannot be toggled."""
+        return not self.items[index]["is_mandatory"] and not self.disabled[index]
+
+    def set_selected(self, index, value):
+        if self.items[index]["is_mandatory"]:
+            value = True
+        if self.selected[index] != bool(value):
+            self.selected[index] = bool(value)
+            self._refresh_row(index)
+            if value and self.on_select is not None:
+                self.on_select(self.items[index]["path"])
+
+    def set_disabled(self, index, value):
+        if self.disabled[index] != bool(value):
+            self.disabled[index] = bool(value)
+            self._refresh_row(index)
+
+    def set_highlighted(self, paths):
+        """
+        Highlights the rows of paths (and only those) and scrolls the first of them
+        into view. Paths that are not in the list are ignored; returns the number
+        of highlighted rows.
+        """
+        wanted = bytearray(len(self.items))
+        first = None
+        for path in paths:
+            index = self._index_of.get(path)
+            if index is not None:
+                wanted[index] = 1
+                if first is None:
+                    first = index
+        for index in range(len(self.items)):
+            if wanted[index] != self.highlighted[index]:
+                self.highlighted[index] = wanted[index]
+                self._refresh_row(index)
+        if first is not None:
+            self._tree_of[first].see(self.items[first]["path"])
+        return sum(wanted)
+
+    def selected_paths(self):
+        return [item["path"] for item in self.items if self.selected[item["index"]]]
+
+    def reset(self):
+        """Unchecks all optional modules (mandatory modules stay checked)."""
+        for item in self.items:
+            self.set_selected(item["index"], item["is_mandatory"])
+
+    # --- events ---
+
+    def _toggle(self, tree, iid):
+        index = self._index_of.get(iid)
+        if index is None:
+            return
+        if self.is_enabled(index):
+            self.set_selected(index, not self.selected[index])
+
+    def _on_click(self, event):
+        tree = event.widget
+        if tree.identify_region(event.x, event.y) == "tree":
+            iid = tree.identify_row(event.y)
+            if iid:
+                tree.focus(iid)
+                self._toggle(tree, iid)
+
+    def _on_space(self, event):
+        tree = event.widget
+        self._toggle(tree, tree.focus())
+
+    def _on_motion(self, event):
+        index = self._index_of.get(event.widget.identify_row(event.y))
+        text = ""
+        if index is not None:
+            item = self.items[index]
+            text = (self.describe(item["path"]) if self.describe else None) or os.path.splitext(item["filename"])[0]
+        if self.hover_label.cget("text") != text:
+            self.hover_label.config(text=text)
@@ -0,0 +1,156 @@
+"""
+Manifest of the module library (configs/modules-manifest.json).
+
+One entry per .docx in modules/ with what the GUI, the presets and the merge
+need to know about a module without opening it: chapter, title, size, content
+hash, paragraph/table/page counts, the styles its body uses and the hashes of
+its images. Entries are only rebuilt for files whose mtime or size changed, so
+a startup costs one directory listing.
+"""
+import os
+import json
+import hashlib
+import zipfile
+from lxml import etree
+from module_cache import file_sha256
+
+MANIFEST_FORMAT = 1
+MANIFEST_NAME = "modules-manifest.json"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_EP = "{http://schemas.openxmlformats.org/officeDocument/2006/extended-properties}"
+_STYLE_TAGS = (_W + 'pStyle', _W + 'rStyle', _W + 'tblStyle')
+
+
+def split_module_name(filename):
+    """'5.1.11 - Titel.docx' -> ('5.1.11', 'Titel')"""
+    stem = os.path.splitext(filename)[0]
+    chapter, _, title = stem.partition(" - ")
+    return chapter.strip(), title.strip()
+
+
+def describe_module(path):
+    """Opens a module once and returns its manifest entry (without mtime and size)."""
+    chapter, title = split_module_name(os.path.basename(path))
+    entry = {
+        'chapter': chapter,
+        'chapter_parts': [int(p) if p.isdigit() else p for p in chapter.split('.')],
+        'title': title,
+        'sha256': file_sha256(path),
+        'paragraphs': 0,
+        'tables': 0,
+        'pages': None,
+        'styles': [],
+        'media': {},
+    }
+    styles = {}
+    with zipfile.ZipFile(path) as z:
+        with z.open("word/document.xml") as f:
+            for _, el in etree.iterparse(f, tag=(_W + 'p', _W + 'tbl') + _STYLE_TAGS):
+                if el.tag == _W + 'p':
+                    entry['paragraphs'] += 1
+                    el.clear(keep_tail=True)
+                elif el.tag == _W + 'tbl':
+                    entry['tables'] += 1
+                else:
+                    styles[el.get(_W + 'val')] = True
+        for name in z.namelist():
+            if name.startswith("word/media/"):
+                entry['media'][name[len("word/"):]] = hashlib.sha1(z.read(name)).hexdigest()
+        if "docProps/app.xml" in z.namelist():
+            pages = etree.fromstring(z.read("docProps/app.xml")).find(_EP + 'Pages')
+            if pages is not None and (pages.text or "").strip().isdigit():
+                entry['pages'] = int(pages.text)
+    entry['styles'] = sorted(styles)
+    return entry
+
+
+class ModuleManifest:
+    """
+    Reads and incrementally refreshes the manifest of modules/.
+
+    refresh() lists the folder, re-describes new and touched files, drops removed
+    ones and saves the manifest if anything changed. The natural sort order is
+    stored with it and only recomputed when files were added or removed. If the
+    folder cannot be listed, the manifest is left as it is.
+    """
+
+    def __init__(self, manifest_path, modules_dir, sort_key):
+        self.manifest_path = manifest_path
+        self.modules_dir = modules_dir
+        self.sort_key = sort_key
+        self.entries = {}  # file name -> entry
+        self.order = []  # file names in natural sort order
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') == MANIFEST_FORMAT:
+            self.entries = data.get('modules', {})
+            self.order = [name for name in data.get('order', []) if name in self.entries]
+
+    def save(self):
+        tmp_path = self.manifest_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': MANIFEST_FORMAT, 'order': self.order, 'modules': self.entries},
+                          f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            print(f"Could not save module manifest: {e}")
+
+    def refresh(self):
+        """Brings the manifest up to date with modules/; returns the number of re-described files."""
+        current = {}
+        try:
+            with os.scandir(self.modules_dir) as dir_entries:
+                for dir_entry in dir_entries:
+                    name = dir_entry.name
+                    if name.lower().endswith(".docx") and not name.startswith("~$") and dir_entry.is_file():
+                        current[name] = dir_entry.stat()
+        except OSError as e:
+            # An unreadable folder is not an empty library: keep the entries as they are
+            print(f"Could not list modules in '{self.modules_dir}': {e}")
+            return 0
+
+        described = 0
+        changed = False
+        for name, st in current.items():
+            entry = self.entries.get(name)
+            if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                continue
+            path = os.path.join(self.modules_dir, name)
+            try:
+                entry = describe_module(path)
+            except (OSError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError) as e:
+                print(f"Could not read module '{name}': {e}")
+                entry = {'chapter': split_module_name(name)[0], 'title': split_module_name(name)[1],
+                         'sha256': None, 'error': str(e)}
+            entry['mtime'] = st.st_mtime_ns
+            entry['size'] = st.st_size
+            self.entries[name] = entry
+            described += 1
+            changed = True
+
+        for name in [n for n in self.entries if n not in current]:
+            del self.entries[name]
+            changed = True
+
+        if changed or len(self.order) != len(self.entries):
+            if set(self.order) != set(self.entries):
+                self.order = sorted(self.entries, key=self.sort_key)
+            self.save()
+        return described
+
+    def get(self, filename):
+        """Manifest entry of a module file name (or path), None if unknown."""
+        return self.entries.get(os.path.basename(filename))
+
+    def paths(self):
+        """All module paths in natural sort order."""
+        return [os.path.join(self.modules_dir, name) for name in self.order]
@@ -0,0 +1,195 @@
+"""
+Local read-through mirror of modules/ for libraries on a network share.
+
+Every stat and open on an SMB share is a round trip. With the mirror, the share
+is listed once per scan (one directory listing with sizes and mtimes) and only
+files whose size or mtime changed are copied to a local folder; everything else
+(manifest, caches, merges) reads the local copies. Copies get the mtime of the
+original, so the caches keyed by mtime and size see the same files.
+
+If the share does not answer within the timeout or cannot be listed, the mirror
+keeps serving the last complete state (self.offline is then True). A file that
+cannot be copied keeps its previous local copy. state.json records, per file,
+the size and mtime of the original and the sha256 of the local copy.
+"""
+import os
+import sys
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+MIRROR_FORMAT = 1
+DEFAULT_TIMEOUT = 5.0
+# How often the GUI lists the share while it is open (the watcher only sees the local copy)
+DEFAULT_SYNC_INTERVAL = 60.0
+_NETWORK_FS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afs", "fuse.sshfs"}
+
+
+def default_local_dir(base_path):
+    """Local folder for the mirror and caches of the library at base_path (per user, per library)."""
+    root = (os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME")
+            or os.path.join(os.path.expanduser("~"), ".cache"))
+    key = hashlib.sha1(os.path.abspath(base_path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(root, "BetraTool", key)
+
+
+def is_network_path(path):
+    """True if path is on a network drive (UNC path or mapped drive on Windows, cifs/nfs mount elsewhere)."""
+    path = os.path.abspath(path)
+    if sys.platform == "win32":
+        if path.startswith("\\\\"):
+            return True
+        try:
+            import ctypes
+            drive_remote = 4
+            return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + "\\") == drive_remote
+        except (AttributeError, OSError):
+            return False
+    try:
+        with open("/proc/mounts", 'r', encoding='utf-8') as f:
+            mounts = [line.split()[1:3] for line in f if len(line.split()) > 2]
+    except OSError:
+        return False
+    best, best_type = "", ""
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        if (path == mount_point or path.startswith(mount_point.rstrip("/") + "/")) and len(mount_point) > len(best):
+            best, best_type = mount_point, fs_type
+    return best_type in _NETWORK_FS
+
+
+def _list_docx(directory):
+    """{file name: (mtime_ns, size)} of the .docx files (without Word lock files)."""
+    listing = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.lower().endswith(".docx") and not name.startswith("~$") and entry.is_file():
+                st = entry.stat()
+                listing[name] = (st.st_mtime_ns, st.st_size)
+    return listing
+
+
+class ModuleMirror:
+    """Keeps mirror_dir a copy of the .docx files in source_dir; see the module docstring."""
+
+    def __init__(self, source_dir, mirror_dir, timeout=DEFAULT_TIMEOUT):
+        self.source_dir = source_dir
+        self.mirror_dir = mirror_dir
+        self.timeout = timeout
+        self.state_path = os.path.join(mirror_dir, "state.json")
+        self.files = {}  # file name -> {'mtime': ns, 'size': bytes, 'sha256': hex} of the original
+        self.synced = None  # time of the last complete listing of the share (ISO string)
+        self.offline = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('format') == MIRROR_FORMAT and data.get('source') == os.path.abspath(self.source_dir):
+            self.files = {name: entry for name, entry in data.get('files', {}).items()
+                          if os.path.exists(os.path.join(self.mirror_dir, name))}
+            self.synced = data.get('synced')
+
+    def _save(self):
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': MIRROR_FORMAT, 'source': os.path.abspath(self.source_dir),
+                           'synced': self.synced, 'files': self.files}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Could not save mirror state: {e}")
+
+    def _list_source(self):
+        """Lists the share on a helper thread; None if it fails or takes longer than the timeout."""
+        result = {}
+
+        def run():
+            try:
+                result['listing'] = _list_docx(self.source_dir)
+            except OSError as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+        if thread.is_alive():
+            print(f"Module share '{self.source_dir}' did not answer within {self.timeout:.0f} s, using local mirror")
+            return None
+        if 'error' in result:
+            print(f"Module share '{self.source_dir}' not readable ({result['error']}), using local mirror")
+            return None
+        return result['listing']
+
+    def sync(self):
+        """
+        Brings the mirror up to date with the share; returns (copied, removed) file
+        name lists. Offline, nothing changes and both lists are empty.
+        """
+        with self._lock:
+            return self._sync()
+
+    def _sync(self):
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        listing = self._list_source()
+        self.offline = listing is None
+        if listing is None:
+            return [], []
+
+        copied = []
+        for name, (mtime, size) in listing.items():
+            known = self.files.get(name)
+            if known and known['mtime'] == mtime and known['size'] == size:
+                continue
+            try:
+                sha256 = self._copy(name, mtime)
+            except OSError as e:
+                print(f"Could not mirror module '{name}': {e}")
+                continue
+            self.files[name] = {'mtime': mtime, 'size': size, 'sha256': sha256}
+            copied.append(name)
+
+        removed = [name for name in self.files if name not in listing]
+        for name in removed:
+            del self.files[name]
+        # Also copies left behind by an interrupted sync
+        for name in _list_docx(self.mirror_dir):
+            if name not in self.files:
+                try:
+                    os.remove(os.path.join(self.mirror_dir, name))
+                except OSError:
+                    pass
+
+        self.synced = datetime.now().isoformat(timespec='seconds')
+        self._save()
+        return copied, removed
+
+    def _copy(self, name, mtime):
+        """Copies one file from the share (hashing it on the way); returns its sha256."""
+        dst_path = os.path.join(self.mirror_dir, name)
+        tmp_path = f"{dst_path}.{os.getpid()}.tmp"
+        h = hashlib.sha256()
+        try:
+            with open(os.path.join(self.source_dir, name), 'rb') as src, open(tmp_path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                    h.update(chunk)
+                    dst.write(chunk)
+            os.utime(tmp_path, ns=(mtime, mtime))
+            os.replace(tmp_path, dst_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return h.hexdigest()
+
+    def status(self):
+        """Short German status text for the window."""
+        if self.offline:
+            since = f" vom {self.synced.replace('T', ' ')}" if self.synced else ""
+            return f"Netzlaufwerk nicht erreichbar, lokale Kopie{since}"
+        return "lokale Kopie, abgeglichen"
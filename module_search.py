@@ -0,0 +1,184 @@
+"""
+Full-text search over the module library (titles, body text and tables).
+
+Text is folded for German: lower case (casefold, so 'ß' matches 'ss') and
+without diacritics, so 'Bahnubergang' finds 'Bahnübergang'. Words are split at
+hyphens, dots and other non-word characters. A search term matches every word
+that starts with it ('zugfunk' finds 'Zugfunks') and, from INFIX_MIN_LENGTH
+characters on, every word that contains it, which covers the parts of German
+compounds ('funk' finds 'Zugfunk', 'sperrung' finds 'Gleissperrung').
+A term of digits and dots ('3.1.') matches the chapter numbers instead.
+
+The words of every module are kept in cache/search/index.json by content hash,
+so only new or changed modules are read again. Lookups bisect a sorted list of
+all word suffixes, so a search costs a few milliseconds per keystroke.
+"""
+import os
+import re
+import json
+import bisect
+import zipfile
+import unicodedata
+from lxml import etree
+
+SEARCH_FORMAT = 1
+INFIX_MIN_LENGTH = 4
+TITLE_WEIGHT = 10
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_WORD = re.compile(r"\w+")
+_CHAPTER = re.compile(r"^\d+(\.\d*)*$")
+_END = "\U0010ffff"
+
+
+def fold(text):
+    """'Bahnübergänge' -> 'bahnubergange'"""
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _WORD.findall(fold(text))
+
+
+def module_words(path):
+    """{word: count} of the body text of a module (tables included)."""
+    words = {}
+    with zipfile.ZipFile(path) as zf, zf.open("word/document.xml") as f:
+        for _, paragraph in etree.iterparse(f, tag=_W + 'p'):
+            # Runs split words anywhere, so the text is joined per paragraph first
+            text = "".join(t.text or "" for t in paragraph.iter(_W + 't'))
+            paragraph.clear()
+            for word in tokenize(text):
+                words[word] = words.get(word, 0) + 1
+    return words
+
+
+class SearchIndex:
+    """
+    Inverted index: word -> {file name: count}, built from the module manifest.
+    update() brings it in line with the manifest; search() answers queries.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.join(cache_dir, "search")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.modules = {}  # file name -> {'sha256', 'chapter', 'title': [words], 'words': {word: count}}
+        self._postings = None  # word -> {file name: score}; built on first search
+        self._suffixes = []  # sorted (suffix, word)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == SEARCH_FORMAT:
+                self.modules = data.get('modules', {})
+        except (OSError, ValueError):
+            self.modules = {}
+
+    def save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': SEARCH_FORMAT, 'modules': self.modules}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not save search index: {e}")
+
+    def update(self, manifest):
+        """
+        Indexes the modules of the manifest whose content changed and drops the
+        removed ones; returns the number of modules read.
+        """
+        read = 0
+        changed = False
+        for name in manifest.order:
+            entry = manifest.entries[name]
+            known = self.modules.get(name)
+            if known and known['sha256'] == entry.get('sha256'):
+                continue
+            words = {}
+            if not entry.get('error'):
+                try:
+                    words = module_words(os.path.join(manifest.modules_dir, name))
+                except (OSError, KeyError, zipfile.BadZipFile, etree.XMLSyntaxError) as e:
+                    print(f"Could not index module '{name}': {e}")
+            self.modules[name] = {'sha256': entry.get('sha256'), 'chapter': entry.get('chapter', ""),
+                                  'title': tokenize(entry.get('title', "")), 'words': words}
+            read += 1
+            changed = True
+        for name in [n for n in self.modules if n not in manifest.entries]:
+            del self.modules[name]
+            changed = True
+        if changed:
+            self._postings = None
+            self.save()
+        return read
+
+    def _build(self):
+        postings = {}
+        for name, module in self.modules.items():
+            for word, count in module['words'].items():
+                postings.setdefault(word, {})[name] = count
+            for word in module['title']:
+                scores = postings.setdefault(word, {})
+                scores[name] = scores.get(name, 0) + TITLE_WEIGHT
+        suffixes = []
+        for word in postings:
+            suffixes.append((word, word))
+            for i in range(1, len(word) - INFIX_MIN_LENGTH + 1):
+                suffixes.append((word[i:], word))
+        suffixes.sort()
+        self._postings = postings
+        self._suffixes = suffixes
+
+    def _words_for(self, term):
+        """Indexed words that start with term, or contain it if it is long enough."""
+        if len(term) < INFIX_MIN_LENGTH:
+            words = self._suffixes_from(term)
+            return {word for word in words if word.startswith(term)}
+        return set(self._suffixes_from(term))
+
+    def _suffixes_from(self, term):
+        lo = bisect.bisect_left(self._suffixes, (term,))
+        hi = bisect.bisect_left(self._suffixes, (term + _END,), lo)
+        return [word for _, word in self._suffixes[lo:hi]]
+
+    def search(self, query):
+        """
+        File names of the modules that match every term of query, best first
+        (title hits count TITLE_WEIGHT times a body hit). An empty query matches nothing.
+        """
+        if self._postings is None:
+            self._build()
+        scores = None
+        for raw_term in query.split():
+            if _CHAPTER.match(raw_term):
+                term_scores = {name: TITLE_WEIGHT for name, module in self.modules.items()
+                               if module['chapter'].startswith(raw_term)}
+            else:
+                # 'ETCS-GNT' is one term with two words, both must match
+                term_scores = None
+                for term in tokenize(raw_term):
+                    word_scores = {}
+                    for word in self._words_for(term):
+                        for name, score in self._postings[word].items():
+                            word_scores[name] = word_scores.get(name, 0) + score
+                    term_scores = _intersect(term_scores, word_scores)
+                if term_scores is None:
+                    continue
+            scores = _intersect(scores, term_scores)
+            if not scores:
+                return []
+        if not scores:
+            return []
+        return sorted(scores, key=lambda name: (-scores[name], name))
+
+
+def _intersect(scores, more):
+    """Names in both score dicts with the scores added; scores None means 'no restriction yet'."""
+    if scores is None:
+        return more
+    return {name: score + more[name] for name, score in scores.items() if name in more}
@@ -0,0 +1,119 @@
+"""Watches modules/ for added, removed and changed .docx files."""
+import os
+import sys
+import queue
+import select
+import threading
+
+DEFAULT_POLL_INTERVAL = 2.0
+# Word and copy tools write a file in several steps; wait for quiet before rescanning
+SETTLE_DELAY = 0.5
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO
+            | _IN_CREATE | _IN_DELETE)
+
+
+def scan_state(modules_dir):
+    """{file name: (mtime_ns, size)} of the .docx files in modules_dir (Word lock files excluded)."""
+    state = {}
+    try:
+        with os.scandir(modules_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.lower().endswith(".docx") or name.startswith("~$") or not entry.is_file():
+                    continue
+                st = entry.stat()
+                state[name] = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        pass
+    return state
+
+
+def diff_state(old, new):
+    """Returns (added, removed, changed) file name lists between two scan_state results."""
+    added = sorted(name for name in new if name not in old)
+    removed = sorted(name for name in old if name not in new)
+    changed = sorted(name for name in new if name in old and new[name] != old[name])
+    return added, removed, changed
+
+
+def _inotify_fd(path):
+    """An inotify descriptor watching path, or None where inotify is not available."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(path), _IN_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+class ModuleWatcher:
+    """
+    Background thread that reports changes of modules/ as (added, removed, changed)
+    tuples of file names in self.queue; the Tk main loop polls it with root.after.
+
+    Uses inotify on Linux and falls back to comparing mtimes every poll_interval
+    seconds elsewhere (Windows, network shares).
+    """
+
+    def __init__(self, modules_dir, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.modules_dir = modules_dir
+        self.poll_interval = poll_interval
+        self.queue = queue.Queue()
+        self._state = scan_state(modules_dir)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.backend = None
+
+    def start(self):
+        fd = _inotify_fd(self.modules_dir)
+        self.backend = "inotify" if fd is not None else "polling"
+        self._thread = threading.Thread(target=self._run, args=(fd,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _rescan(self):
+        new_state = scan_state(self.modules_dir)
+        added, removed, changed = diff_state(self._state, new_state)
+        self._state = new_state
+        if added or removed or changed:
+            self.queue.put((added, removed, changed))
+
+    def _run(self, fd):
+        try:
+            while not self._stop_event.is_set():
+                if fd is None:
+                    if self._stop_event.wait(self.poll_interval):
+                        break
+                    self._rescan()
+                    continue
+
+                ready, _, _ = select.select([fd], [], [], 1.0)
+                if not ready:
+                    continue
+                # Drain the burst of events, then rescan once
+                while ready:
+                    os.read(fd, 65536)
+                    ready, _, _ = select.select([fd], [], [], SETTLE_DELAY)
+                self._rescan()
+        finally:
+            if fd is not None:
+                os.close(fd)
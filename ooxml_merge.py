@@ -0,0 +1,720 @@
+"""
+Merge backend that works on the OOXML zip parts directly, without python-docx objects.
+
+OoxmlComposer mirrors the docxcompose Composer interface (append/save) and follows
+the same rules: styles are mapped by name and copied if missing, numberings are
+copied with new ids (the first numbered list of a module restarts at 1), images
+are shared by content hash, header/footer references of modules are dropped and
+the section properties of the cover page are kept. Module bodies are streamed
+with iterparse, one top-level element at a time, and their serialized XML, images
+and copied parts go to spool files until save writes them into the output zip, so
+the memory needed does not grow with the number of modules.
+"""
+import io
+import os
+import re
+import copy
+import random
+import shutil
+import hashlib
+import posixpath
+import tempfile
+import zipfile
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PR_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+NS = {
+    'w': W_NS,
+    'r': R_NS,
+    'wp': "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing",
+    'pic': "http://schemas.openxmlformats.org/drawingml/2006/picture",
+}
+
+RT_BASE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+RT_IMAGE = RT_BASE + "image"
+RT_HEADER = RT_BASE + "header"
+RT_FOOTER = RT_BASE + "footer"
+RT_NUMBERING = RT_BASE + "numbering"
+RT_STYLES = RT_BASE + "styles"
+RT_FOOTNOTES = RT_BASE + "footnotes"
+RT_HYPERLINK = RT_BASE + "hyperlink"
+CT_NUMBERING = "application/vnd.openxmlformats-officedocument.wordprocessingml.numbering+xml"
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+CONTENT_TYPES = "[Content_Types].xml"
+MERGE_MARKER = b"<?betra-merge ?>"
+MEDIA_PREFIX = "word/media/"
+# Spooled data stays in memory up to this size, beyond it goes to a temporary file
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+COPY_BLOCK_BYTES = 1024 * 1024
+
+IMAGE_CONTENT_TYPES = {
+    'png': "image/png", 'jpg': "image/jpeg", 'jpeg': "image/jpeg", 'gif': "image/gif",
+    'bmp': "image/bmp", 'tif': "image/tiff", 'tiff': "image/tiff", 'svg': "image/svg+xml",
+    'emf': "image/x-emf", 'wmf': "image/x-wmf",
+}
+
+_W = "{%s}" % W_NS
+_R = "{%s}" % R_NS
+_PART_INDEX = re.compile(r'^(.*?)(\d*)(\.[^.]*)$')
+
+
+class UnsupportedModule(Exception):
+    """The module uses a construct this backend does not handle (use docxcompose instead)."""
+
+
+def _w(tag):
+    return _W + tag
+
+
+def unsupported_construct(element):
+    """What in a body element this backend cannot merge (German, for messages), or None."""
+    if element.find('.//' + _w('footnoteReference')) is not None:
+        return "Fußnoten"
+    if element.find('.//' + _w('sectPr')) is not None:
+        return "mehrere Abschnitte"
+    if element.xpath('.//w:instrText[contains(., "DOCPROPERTY")]|.//w:fldSimple[contains(@w:instr, "DOCPROPERTY")]',
+                     namespaces=NS):
+        return "DOCPROPERTY-Felder"
+    return None
+
+
+def _rels_name(partname):
+    """'word/document.xml' -> 'word/_rels/document.xml.rels'"""
+    folder, name = posixpath.split(partname)
+    return posixpath.join(folder, "_rels", name + ".rels")
+
+
+def _resolve(source_part, target):
+    """Absolute zip name of a relationship target, relative to the source part."""
+    if target.startswith('/'):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+
+def _relative(source_part, target_part):
+    return posixpath.relpath(target_part, posixpath.dirname(source_part))
+
+
+class OoxmlPackage:
+    """
+    Read access to one .docx: parts, relationships and content types.
+    With data (the file's bytes, read beforehand), the package is read from memory.
+    """
+
+    def __init__(self, path, data=None):
+        self.path = path
+        self.zip = zipfile.ZipFile(io.BytesIO(data) if data is not None else path)
+        self.infos = {info.filename: info for info in self.zip.infolist()}
+        self.names = set(self.infos)
+        self._rels = {}
+        ct = etree.fromstring(self.zip.read(CONTENT_TYPES))
+        self.defaults = {e.get('Extension').lower(): e.get('ContentType') for e in ct.iter('{%s}Default' % CT_NS)}
+        self.overrides = {e.get('PartName').lstrip('/'): e.get('ContentType') for e in ct.iter('{%s}Override' % CT_NS)}
+
+    def read(self, name):
+        return self.zip.read(name)
+
+    def content_type(self, name):
+        if name in self.overrides:
+            return self.overrides[name]
+        return self.defaults.get(name.rsplit('.', 1)[-1].lower(), "application/octet-stream")
+
+    def rels(self, partname):
+        """{rId: (type, target, external)} of a part."""
+        if partname not in self._rels:
+            rels = {}
+            rels_name = _rels_name(partname)
+            if rels_name in self.names:
+                for rel in etree.fromstring(self.read(rels_name)).iter('{%s}Relationship' % PR_NS):
+                    rels[rel.get('Id')] = (rel.get('Type'), rel.get('Target'), rel.get('TargetMode') == 'External')
+            self._rels[partname] = rels
+        return self._rels[partname]
+
+    def part_with_reltype(self, partname, reltype):
+        for rel_type, target, external in self.rels(partname).values():
+            if rel_type == reltype and not external:
+                return _resolve(partname, target)
+        return None
+
+    def close(self):
+        self.zip.close()
+
+
+class _Spool:
+    """Append-only byte store on a SpooledTemporaryFile; put returns where the data is."""
+
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        self.size = 0
+
+    def put(self, data):
+        """Stores data; returns (offset, length)."""
+        offset = self.size
+        self.file.seek(offset)
+        self.file.write(data)
+        self.size += len(data)
+        return offset, len(data)
+
+    def copy_to(self, dst, offset=0, length=None):
+        """Writes the stored bytes [offset, offset + length) (default: all) to the file object dst."""
+        length = self.size - offset if length is None else length
+        self.file.seek(offset)
+        while length > 0:
+            block = self.file.read(min(length, COPY_BLOCK_BYTES))
+            if not block:
+                break
+            dst.write(block)
+            length -= len(block)
+
+    def close(self):
+        self.file.close()
+
+
+class _Styles:
+    """A styles part: element tree plus id/name lookups."""
+
+    def __init__(self, xml):
+        self.root = etree.fromstring(xml) if xml else None
+        self.by_id = {}
+        self.name_to_id = {}
+        if self.root is not None:
+            for style in self.root.iterchildren(_w('style')):
+                self._register(style)
+
+    def _register(self, style):
+        style_id = style.get(_w('styleId'))
+        self.by_id[style_id] = style
+        name = style.find(_w('name'))
+        if name is not None:
+            self.name_to_id.setdefault(name.get(_w('val')), style_id)
+
+    def name_of(self, style_id):
+        style = self.by_id.get(style_id)
+        if style is None:
+            return None
+        name = style.find(_w('name'))
+        return name.get(_w('val')) if name is not None else None
+
+    def append(self, style):
+        self.root.append(style)
+        self._register(style)
+
+
+class OoxmlComposer:
+    """Composes modules into a copy of the cover page, working on zip parts only."""
+
+    def __init__(self, master_path):
+        self.master = OoxmlPackage(master_path)
+        self.doc_root = etree.fromstring(self.master.read(DOCUMENT_PART))
+        self.body = self.doc_root.find(_w('body'))
+
+        self.doc_rels = etree.fromstring(self.master.read(DOCUMENT_RELS))
+        self.content_types = etree.fromstring(self.master.read(CONTENT_TYPES))
+        self.new_parts = {}  # zip name -> bytes (parts added or rewritten)
+        self.spooled_parts = {}  # zip name -> (offset, length) in self._parts (copied parts, images)
+        self._parts = _Spool()
+        self.part_names = set(self.master.names)
+        self._next_rid = 1 + max([int(r.get('Id')[3:]) for r in self.doc_rels
+                                  if r.get('Id', '').startswith('rId') and r.get('Id')[3:].isdigit()] or [0])
+
+        styles_name = self.master.part_with_reltype(DOCUMENT_PART, RT_STYLES)
+        self.styles_name = styles_name
+        self.styles = _Styles(self.master.read(styles_name) if styles_name else None)
+
+        numbering_name = self.master.part_with_reltype(DOCUMENT_PART, RT_NUMBERING)
+        if numbering_name:
+            self.numbering_name = numbering_name
+            self.numbering = etree.fromstring(self.master.read(numbering_name))
+        else:
+            self.numbering_name = "word/numbering.xml"
+            self.numbering = etree.Element(_w('numbering'), nsmap={'w': W_NS})
+            self._add_relationship(RT_NUMBERING, "numbering.xml")
+            self._add_override(self.numbering_name, CT_NUMBERING)
+        self._nums = {n.get(_w('numId')): n for n in self.numbering.iterchildren(_w('num'))}
+        self._anums = {a.get(_w('abstractNumId')): a for a in self.numbering.iterchildren(_w('abstractNum'))}
+        self._next_num_id = 1 + max([int(n) for n in self._nums] or [0])
+        self._next_anum_id = 1 + max([int(a) for a in self._anums] or [-1])
+
+        # Images already in the package (headers included), by content hash
+        self.images = {}
+        for name in sorted(self.master.names):
+            if name.startswith(MEDIA_PREFIX):
+                self.images.setdefault(hashlib.sha1(self.master.read(name)).hexdigest(), name)
+        self._image_rids = {}  # image zip name -> rId in document.xml.rels
+        self.media_bytes_saved = 0  # bytes of module images that were already in the package
+
+        self._next_bookmark_id = 1 + max([int(b.get(_w('id'))) for b in self.body.iter(_w('bookmarkStart'))
+                                          if (b.get(_w('id')) or '').isdigit()] or [-1])
+        self._next_docpr_id = 1 + self._max_drawing_id()
+
+        # The merge marker sits where the appended modules go: before the body's sectPr
+        marker = etree.PI('betra-merge')
+        sect_pr = self.body.find(_w('sectPr'))
+        if sect_pr is not None:
+            sect_pr.addprevious(marker)
+        else:
+            self.body.append(marker)
+        self._body = _Spool()  # XML of the appended body elements, in order
+        # Wrapper with the master's namespaces, so appended elements don't redeclare them
+        self._wrapper = etree.Element(_w('body'), nsmap=self.doc_root.nsmap)
+        self._wrapper_open, self._wrapper_close = self._wrapper_tags()
+
+    def _wrapper_tags(self):
+        probe = etree.SubElement(self._wrapper, _w('p'))
+        xml = etree.tostring(self._wrapper)
+        self._wrapper.remove(probe)
+        return xml.index(b'>') + 1, len(xml) - xml.rindex(b'</')
+
+    def _max_drawing_id(self):
+        ids = [0]
+        for el in self.body.iter('{%s}docPr' % NS['wp'], '{%s}cNvPr' % NS['pic']):
+            if (el.get('id') or '').isdigit():
+                ids.append(int(el.get('id')))
+        for rel_type, target, external in self.master.rels(DOCUMENT_PART).values():
+            if rel_type in (RT_HEADER, RT_FOOTER) and not external:
+                part = etree.fromstring(self.master.read(_resolve(DOCUMENT_PART, target)))
+                for el in part.iter('{%s}docPr' % NS['wp'], '{%s}cNvPr' % NS['pic']):
+                    if (el.get('id') or '').isdigit():
+                        ids.append(int(el.get('id')))
+        return max(ids)
+
+    # --- package helpers ---
+
+    def _add_relationship(self, reltype, target, external=False):
+        rid = f"rId{self._next_rid}"
+        self._next_rid += 1
+        rel = etree.SubElement(self.doc_rels, '{%s}Relationship' % PR_NS, Id=rid, Type=reltype, Target=target)
+        if external:
+            rel.set('TargetMode', 'External')
+        return rid
+
+    def _add_override(self, name, content_type):
+        etree.SubElement(self.content_types, '{%s}Override' % CT_NS, PartName='/' + name, ContentType=content_type)
+
+    def _ensure_default(self, extension, content_type):
+        extension = extension.lower()
+        for default in self.content_types.iter('{%s}Default' % CT_NS):
+            if default.get('Extension').lower() == extension:
+                return
+        etree.SubElement(self.content_types, '{%s}Default' % CT_NS, Extension=extension, ContentType=content_type)
+
+    def _free_part_name(self, name):
+        folder, filename = posixpath.split(name)
+        stem, _, ext = _PART_INDEX.match(filename).groups()
+        n = 1
+        while True:
+            candidate = posixpath.join(folder, f"{stem}{n}{ext}")
+            if candidate not in self.part_names:
+                self.part_names.add(candidate)
+                return candidate
+            n += 1
+
+    def _copy_part(self, module, name):
+        """Copies a non-image part (and what it refers to) from a module; returns the new zip name."""
+        new_name = self._free_part_name(name)
+        self.spooled_parts[new_name] = self._parts.put(module.read(name))
+        self._add_override(new_name, module.content_type(name))
+
+        rels = module.rels(name)
+        if rels:
+            rels_root = etree.Element('{%s}Relationships' % PR_NS, nsmap={None: PR_NS})
+            for rid, (rel_type, target, external) in rels.items():
+                if not external:
+                    target = _relative(new_name, self._copy_part(module, _resolve(name, target)))
+                rel = etree.SubElement(rels_root, '{%s}Relationship' % PR_NS, Id=rid, Type=rel_type, Target=target)
+                if external:
+                    rel.set('TargetMode', 'External')
+            self.new_parts[_rels_name(new_name)] = etree.tostring(rels_root, xml_declaration=True,
+                                                                  encoding='UTF-8', standalone=True)
+        return new_name
+
+    def _image_rid(self, module, name):
+        blob = module.read(name)
+        sha1 = hashlib.sha1(blob).hexdigest()
+        image_name = self.images.get(sha1)
+        if image_name is not None:
+            if name not in self._module_images:
+                self.media_bytes_saved += len(blob)
+        else:
+            ext = name.rsplit('.', 1)[-1].lower()
+            image_name = self._free_part_name(f"word/media/image.{ext}")
+            self.spooled_parts[image_name] = self._parts.put(blob)
+            self._ensure_default(ext, IMAGE_CONTENT_TYPES.get(ext, module.content_type(name)))
+            self.images[sha1] = image_name
+        self._module_images.add(name)
+        if image_name not in self._image_rids:
+            self._image_rids[image_name] = self._add_relationship(RT_IMAGE, _relative(DOCUMENT_PART, image_name))
+        return self._image_rids[image_name]
+
+    # --- append ---
+
+    def append(self, module, table=None):
+        """
+        Appends the body of a module, given as path or as an OoxmlPackage opened
+        beforehand (e.g. on a loader thread). table is the module's precompiled
+        style/numbering table (see style_registry.py); without it, the module's
+        styles and numbering parts are parsed here. The package is closed afterwards.
+        """
+        if not isinstance(module, OoxmlPackage):
+            module = OoxmlPackage(module)
+        try:
+            self._append_module(module, table)
+        except UnsupportedModule as e:
+            raise UnsupportedModule(f"{os.path.basename(module.path)}: {e}") from None
+        finally:
+            module.close()
+
+    def _append_module(self, module, table):
+        if table is not None:
+            self.src_styles = _Styles(table['styles'])
+            self.src_numbering = etree.fromstring(table['numbering']) if table['numbering'] else None
+        else:
+            styles_name = module.part_with_reltype(DOCUMENT_PART, RT_STYLES)
+            self.src_styles = _Styles(module.read(styles_name) if styles_name else None)
+            numbering_name = module.part_with_reltype(DOCUMENT_PART, RT_NUMBERING)
+            self.src_numbering = etree.fromstring(module.read(numbering_name)) if numbering_name else None
+        self.src_rels = module.rels(DOCUMENT_PART)
+        self.num_id_mapping = {}
+        self.anum_id_mapping = {}
+        self.rid_mapping = {}
+        self.bookmark_mapping = {}
+        self._module_images = set()
+        self.numbering_restarted = set()
+        self.module = module
+
+        body_tag = _w('body')
+        depth = 0
+        with module.zip.open(DOCUMENT_PART) as f:
+            for event, element in etree.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth != 2:
+                    continue
+                # A direct child of w:body is complete
+                parent = element.getparent()
+                if parent is None or parent.tag != body_tag:
+                    continue
+                if element.tag != _w('sectPr'):
+                    self._add_element(element)
+                    self._wrapper.append(element)
+                    xml = etree.tostring(self._wrapper)
+                    self._body.put(xml[self._wrapper_open:len(xml) - self._wrapper_close])
+                    self._wrapper.remove(element)
+                else:
+                    parent.remove(element)
+
+    def _add_element(self, element):
+        reason = unsupported_construct(element)
+        if reason:
+            raise UnsupportedModule(reason)
+        self._add_styles(element)
+        self._add_numberings(element)
+        self._restart_first_numbering(element)
+        self._remap_relationships(element)
+        self._remap_ids(element)
+
+    def _mapped_style_id(self, style_id):
+        name = self.src_styles.name_of(style_id)
+        if name is None:
+            return style_id
+        return self.styles.name_to_id.get(name, style_id)
+
+    def _add_styles(self, element):
+        used = list(dict.fromkeys(e.get(_w('val')) for e in
+                                  element.xpath(".//w:tblStyle|.//w:pStyle|.//w:rStyle", namespaces=NS)))
+        for style_id in used:
+            our_style_id = self._mapped_style_id(style_id)
+            if our_style_id not in self.styles.by_id:
+                src_style = self.src_styles.by_id.get(style_id)
+                if src_style is not None:
+                    style = copy.deepcopy(src_style)
+                    self.styles.append(style)
+                    self._add_numberings(style)
+                    self._add_linked_styles(style)
+            else:
+                # Map the module's list of an existing style onto ours, to avoid duplicate lists
+                src_style = self.src_styles.by_id.get(style_id)
+                if src_style is not None and self.src_numbering is not None:
+                    num_ids = src_style.xpath(".//w:numId/@w:val", namespaces=NS)
+                    our_num_ids = self.styles.by_id[our_style_id].xpath(".//w:numId/@w:val", namespaces=NS)
+                    if num_ids and our_num_ids:
+                        anum_ids = self.src_numbering.xpath(
+                            './/w:num[@w:numId="%s"]/w:abstractNumId/@w:val' % num_ids[0], namespaces=NS)
+                        our_num = self._nums.get(our_num_ids[0])
+                        if anum_ids and our_num is not None:
+                            our_anum = our_num.find(_w('abstractNumId'))
+                            if our_anum is not None:
+                                self.anum_id_mapping[anum_ids[0]] = our_anum.get(_w('val'))
+
+            if our_style_id != style_id:
+                for el in element.xpath('.//w:tblStyle[@w:val="%(id)s"]|.//w:pStyle[@w:val="%(id)s"]|'
+                                        './/w:rStyle[@w:val="%(id)s"]' % {'id': style_id}, namespaces=NS):
+                    el.set(_w('val'), our_style_id)
+
+    def _add_linked_styles(self, style):
+        linked = style.xpath(".//w:link/@w:val", namespaces=NS)
+        if linked:
+            our_linked_id = self._mapped_style_id(linked[0])
+            if our_linked_id not in self.styles.by_id:
+                src_linked = self.src_styles.by_id.get(linked[0])
+                if src_linked is not None:
+                    self.styles.append(copy.deepcopy(src_linked))
+
+    def _insert_num(self, num):
+        self.numbering.append(num)
+        self._nums[num.get(_w('numId'))] = num
+
+    def _insert_abstract_num(self, anum):
+        first_num = self.numbering.find(_w('num'))
+        if first_num is not None:
+            first_num.addprevious(anum)
+        else:
+            self.numbering.append(anum)
+        self._anums[anum.get(_w('abstractNumId'))] = anum
+
+    def _add_numberings(self, element):
+        num_ids = list(dict.fromkeys(element.xpath(".//w:numId/@w:val", namespaces=NS)))
+        if not num_ids or self.src_numbering is None:
+            return
+
+        for num_id in num_ids:
+            if num_id in self.num_id_mapping:
+                continue
+            res = self.src_numbering.xpath('.//w:num[@w:numId="%s"]' % num_id, namespaces=NS)
+            if not res:
+                continue
+            num = copy.deepcopy(res[0])
+            new_num_id = str(self._next_num_id)
+            self._next_num_id += 1
+            num.set(_w('numId'), new_num_id)
+            self.num_id_mapping[num_id] = new_num_id
+
+            anum_ref = num.find(_w('abstractNumId'))
+            anum_id = anum_ref.get(_w('val'))
+            if anum_id not in self.anum_id_mapping:
+                res = self.src_numbering.xpath('.//w:abstractNum[@w:abstractNumId="%s"]' % anum_id, namespaces=NS)
+                if not res:
+                    continue
+                anum = copy.deepcopy(res[0])
+                new_anum_id = str(self._next_anum_id)
+                self._next_anum_id += 1
+                self.anum_id_mapping[anum_id] = new_anum_id
+                anum.set(_w('abstractNumId'), new_anum_id)
+                anum_ref.set(_w('val'), new_anum_id)
+                # Unique nsid, so numberings restart properly
+                nsid = anum.find('.//' + _w('nsid'))
+                if nsid is not None:
+                    nsid.set(_w('val'), "{0:08X}".format(int(10**8 * random.random())))
+                self._insert_abstract_num(anum)
+            else:
+                anum_ref.set(_w('val'), self.anum_id_mapping[anum_id])
+
+            self._insert_num(num)
+
+        for ref in element.iter(_w('numId')):
+            ref.set(_w('val'), self.num_id_mapping.get(ref.get(_w('val')), ref.get(_w('val'))))
+
+    def _restart_first_numbering(self, element):
+        style_ids = element.xpath(".//w:pStyle/@w:val", namespaces=NS)
+        if not style_ids:
+            return
+        style_id = style_ids[0]
+        if style_id in self.numbering_restarted:
+            return
+        style = self.styles.by_id.get(style_id)
+        if style is None or style.find('.//' + _w('outlineLvl')) is not None:
+            return
+
+        local_num_id = element.xpath(".//w:numPr/w:numId/@w:val", namespaces=NS)
+        if local_num_id:
+            num_id = local_num_id[0]
+        else:
+            style_num_id = style.xpath(".//w:numId/@w:val", namespaces=NS)
+            if not style_num_id:
+                return
+            num_id = style_num_id[0]
+
+        num = self._nums.get(num_id)
+        if num is None:
+            return
+        anum = self._anums.get(num.find(_w('abstractNumId')).get(_w('val')))
+        if anum is None:
+            return
+        num_fmt = anum.xpath('.//w:lvl[@w:ilvl="0"]/w:numFmt/@w:val', namespaces=NS)
+        if num_fmt and num_fmt[0] == "bullet":
+            return
+
+        new_num = copy.deepcopy(num)
+        override = etree.SubElement(new_num, _w('lvlOverride'))
+        override.set(_w('ilvl'), "0")
+        etree.SubElement(override, _w('startOverride')).set(_w('val'), "1")
+        new_num_id = str(self._next_num_id)
+        self._next_num_id += 1
+        new_num.set(_w('numId'), new_num_id)
+        self._insert_num(new_num)
+
+        p_pr = element.xpath('.//w:pPr/w:pStyle[@w:val="%s"]/parent::w:pPr' % style_id, namespaces=NS)[0]
+        num_pr = p_pr.find(_w('numPr'))
+        if num_pr is not None and num_pr.find(_w('numId')) is not None:
+            previous = num_pr.find(_w('numId')).get(_w('val'))
+            for key, value in self.num_id_mapping.items():
+                if value == previous:
+                    self.num_id_mapping[key] = new_num_id
+                    break
+            num_pr.find(_w('numId')).set(_w('val'), new_num_id)
+        else:
+            num_pr = etree.SubElement(p_pr, _w('numPr'))
+            etree.SubElement(num_pr, _w('ilvl')).set(_w('val'), "0")
+            etree.SubElement(num_pr, _w('numId')).set(_w('val'), new_num_id)
+        self.numbering_restarted.add(style_id)
+
+    def _remap_relationships(self, element):
+        for el in element.iter():
+            for attr, rid in el.attrib.items():
+                if not attr.startswith(_R) or rid not in self.src_rels:
+                    continue
+                rel_type, target, external = self.src_rels[rid]
+                if external:
+                    if rid not in self.rid_mapping:
+                        self.rid_mapping[rid] = self._add_relationship(rel_type, target, external=True)
+                    el.set(attr, self.rid_mapping[rid])
+                elif rel_type == RT_IMAGE:
+                    el.set(attr, self._image_rid(self.module, _resolve(DOCUMENT_PART, target)))
+                else:
+                    if rid not in self.rid_mapping:
+                        new_name = self._copy_part(self.module, _resolve(DOCUMENT_PART, target))
+                        self.rid_mapping[rid] = self._add_relationship(rel_type, _relative(DOCUMENT_PART, new_name))
+                    el.set(attr, self.rid_mapping[rid])
+
+    def _remap_ids(self, element):
+        for tag in ('bookmarkStart', 'bookmarkEnd'):
+            for bookmark in element.iter(_w(tag)):
+                old_id = bookmark.get(_w('id'))
+                if old_id not in self.bookmark_mapping:
+                    self.bookmark_mapping[old_id] = str(self._next_bookmark_id)
+                    self._next_bookmark_id += 1
+                bookmark.set(_w('id'), self.bookmark_mapping[old_id])
+        for el in element.iter('{%s}docPr' % NS['wp'], '{%s}cNvPr' % NS['pic']):
+            el.set('id', str(self._next_docpr_id))
+            self._next_docpr_id += 1
+
+    # --- save ---
+
+    def save(self, save_path):
+        """Writes the merged document; the body and the spooled parts are copied block by block."""
+        head, tail = etree.tostring(self.doc_root, xml_declaration=True, encoding='UTF-8',
+                                    standalone=True).split(MERGE_MARKER)
+        self.new_parts[DOCUMENT_RELS] = etree.tostring(self.doc_rels, xml_declaration=True,
+                                                       encoding='UTF-8', standalone=True)
+        self.new_parts[CONTENT_TYPES] = etree.tostring(self.content_types, xml_declaration=True,
+                                                       encoding='UTF-8', standalone=True)
+        if self.styles.root is not None:
+            self.new_parts[self.styles_name] = etree.tostring(self.styles.root, xml_declaration=True,
+                                                              encoding='UTF-8', standalone=True)
+        self.new_parts[self.numbering_name] = etree.tostring(self.numbering, xml_declaration=True,
+                                                             encoding='UTF-8', standalone=True)
+
+        with zipfile.ZipFile(save_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+            # [Content_Types].xml first, as Word and other readers expect
+            zout.writestr(CONTENT_TYPES, self.new_parts[CONTENT_TYPES])
+            for name in self.master.zip.namelist():
+                if name == CONTENT_TYPES:
+                    continue
+                if name == DOCUMENT_PART:
+                    with zout.open(name, 'w') as f:
+                        f.write(head)
+                        self._body.copy_to(f)
+                        f.write(tail)
+                elif name in self.new_parts:
+                    zout.writestr(name, self.new_parts[name])
+                else:
+                    with self.master.zip.open(name) as src, zout.open(name, 'w') as dst:
+                        shutil.copyfileobj(src, dst, COPY_BLOCK_BYTES)
+            for name, blob in self.new_parts.items():
+                if name not in self.master.names:
+                    zout.writestr(name, blob)
+            for name, (offset, length) in self.spooled_parts.items():
+                with zout.open(name, 'w') as f:
+                    self._parts.copy_to(f, offset, length)
+        self.close()
+
+    def close(self):
+        """Releases the cover page and the spool files (save does this itself)."""
+        self.master.close()
+        self._body.close()
+        self._parts.close()
+
+
+def dedupe_media(path):
+    """
+    Stores identical media parts of a .docx only once: every relationship to a
+    duplicate is pointed at the first part with the same content hash and the
+    duplicates are dropped. Rewrites path in place if needed; returns the bytes saved.
+    """
+    package = OoxmlPackage(path)
+    try:
+        canonical = {}  # sha1 -> part name
+        duplicates = {}  # duplicate part name -> canonical part name
+        saved = 0
+        for name in sorted(package.names):
+            if not name.startswith(MEDIA_PREFIX):
+                continue
+            h = hashlib.sha1()
+            with package.zip.open(name) as f:
+                for block in iter(lambda: f.read(COPY_BLOCK_BYTES), b''):
+                    h.update(block)
+            sha1 = h.hexdigest()
+            if sha1 in canonical:
+                duplicates[name] = canonical[sha1]
+                saved += package.infos[name].file_size
+            else:
+                canonical[sha1] = name
+        if not duplicates:
+            return 0
+
+        tmp_path = path + ".media"
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+            for name in package.zip.namelist():
+                if name in duplicates:
+                    continue
+                info = package.infos[name]
+                if name != CONTENT_TYPES and not name.endswith('.rels'):
+                    # Body and media are copied block by block, never read as a whole
+                    target = zipfile.ZipInfo(name, info.date_time)
+                    target.compress_type = info.compress_type
+                    with package.zip.open(name) as src, zout.open(target, 'w') as dst:
+                        shutil.copyfileobj(src, dst, COPY_BLOCK_BYTES)
+                    continue
+                data = package.read(name)
+                if name == CONTENT_TYPES:
+                    root = etree.fromstring(data)
+                    for override in list(root.iter('{%s}Override' % CT_NS)):
+                        if override.get('PartName').lstrip('/') in duplicates:
+                            root.remove(override)
+                    data = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+                elif name.endswith('.rels'):
+                    root = etree.fromstring(data)
+                    source_part = posixpath.join(posixpath.dirname(posixpath.dirname(name)),
+                                                 posixpath.basename(name)[:-len('.rels')])
+                    changed = False
+                    for rel in root.iter('{%s}Relationship' % PR_NS):
+                        if rel.get('TargetMode') == 'External':
+                            continue
+                        target = _resolve(source_part, rel.get('Target'))
+                        if target in duplicates:
+                            rel.set('Target', _relative(source_part, duplicates[target]))
+                            changed = True
+                    if changed:
+                        data = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+                zout.writestr(info, data, compress_type=info.compress_type)
+    finally:
+        package.close()
+    os.replace(tmp_path, path)
+    return saved
@@ -0,0 +1,101 @@
+"""
+Speculative warm-up of the modules the user is likely to merge next.
+
+While the window is up and the user picks modules, the machine is idle. The GUI
+asks the Prefetcher to warm the cover page with the mandatory modules at once,
+and every module as soon as it is ticked (by hand or with a preset). warm(key)
+does the actual work (see BetraEngine.prefetch); the caches it fills are the
+ones the merge reads, so a module warmed here costs next to nothing there.
+Keys are tuples (kind, path, ...).
+
+There is one worker thread, with the lowest scheduling priority the platform
+allows, so the window stays responsive. The newest request goes first (what was
+just ticked is the most likely to be merged), and each key is warmed once until
+forget() is called. pause() holds the worker while a merge runs.
+"""
+import os
+import sys
+import threading
+from collections import deque
+
+
+def _lower_thread_priority():
+    """Lowers the priority of the calling thread (best effort)."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            thread_priority_lowest = -2
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), thread_priority_lowest)
+        elif sys.platform.startswith("linux"):
+            # On Linux, the nice value is per thread
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+    except (AttributeError, OSError):
+        pass
+
+
+class Prefetcher:
+    """Runs warm(key) for requested keys on one low-priority daemon thread; see the module docstring."""
+
+    def __init__(self, warm):
+        self.warm = warm
+        self._queue = deque()
+        self._queued = set()
+        self._done = set()
+        self._cond = threading.Condition()
+        self._paused = False
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def request(self, keys):
+        """Queues keys in front of the older requests, in the given order; warmed keys are skipped."""
+        with self._cond:
+            for key in reversed(list(keys)):
+                if key in self._done:
+                    continue
+                if key in self._queued:
+                    self._queue.remove(key)
+                self._queue.appendleft(key)
+                self._queued.add(key)
+            self._cond.notify()
+
+    def forget(self):
+        """Lets every key be warmed again (after the module files changed)."""
+        with self._cond:
+            self._done.clear()
+
+    def pause(self):
+        """No new key is started until resume(); the one being warmed finishes."""
+        with self._cond:
+            self._paused = True
+
+    def resume(self):
+        with self._cond:
+            self._paused = False
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _run(self):
+        _lower_thread_priority()
+        while True:
+            with self._cond:
+                while not self._stopped and (self._paused or not self._queue):
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                key = self._queue.popleft()
+                self._queued.discard(key)
+            try:
+                self.warm(key)
+            except Exception as e:
+                print(f"Prefetch ({key[0]}) of {os.path.basename(key[1])} failed: {e}")
+            with self._cond:
+                self._done.add(key)
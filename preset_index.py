@@ -0,0 +1,137 @@
+"""
+Presets compiled against the module list into bitsets.
+
+A preset is a comma separated list of terms, evaluated left to right:
+
+    2.3.          all modules whose file name starts with '2.3.'
+    @Baugleis     all modules of the preset 'Baugleis' (union)
+    -5.3.18       without the modules starting with '5.3.18' (difference)
+    -@BÜ          without the modules of the preset 'BÜ'
+
+Each term becomes a bitset over the module list (bit i = module i of the list, a
+Python int). A prefix is looked up by bisecting the sorted file names, since all
+names with one prefix form a contiguous range there, so compiling costs
+O(log n) per prefix plus the matches, and toggling a preset is one bitset.
+"""
+import bisect
+
+_PREFIX_END = "\U0010ffff"
+
+
+class PresetError(ValueError):
+    """A preset refers to an unknown preset or (indirectly) to itself."""
+
+
+def parse_terms(modules_str):
+    """'2.3., -@BÜ' -> [(False, '2.3.'), (True, '@BÜ')] as (negated, term)."""
+    terms = []
+    for term in modules_str.split(','):
+        term = term.strip()
+        if not term:
+            continue
+        negated = term.startswith('-')
+        if negated:
+            term = term[1:].strip()
+        if term:
+            terms.append((negated, term))
+    return terms
+
+
+def bits(indices):
+    """Bitset with the given bit indices set."""
+    mask = 0
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+def indices(mask):
+    """Bit indices set in mask, ascending."""
+    result = []
+    while mask:
+        low = mask & -mask
+        result.append(low.bit_length() - 1)
+        mask ^= low
+    return result
+
+
+class PresetIndex:
+    """
+    Bitsets of all presets over one module list (file names in display order).
+    presets is {key: {'Name': ..., 'Modules': ...}} as returned by load_presets.
+    Rebuild the index when the module list or the presets change. A preset that
+    cannot be compiled gets an empty bitset and its message in self.errors.
+    """
+
+    def __init__(self, filenames, presets):
+        self.filenames = list(filenames)
+        order = sorted(range(len(self.filenames)), key=lambda i: self.filenames[i])
+        self._sorted_names = [self.filenames[i] for i in order]
+        self._sorted_index = order
+        self._prefix_masks = {}
+        self._definitions = {p['Name']: p['Modules'] for p in presets.values()}
+        self._by_casefold = {name.casefold(): name for name in self._definitions}
+        self.masks = {}
+        self.errors = {}
+        for name in self._definitions:
+            try:
+                self._compile(name, ())
+            except PresetError as e:
+                self.masks[name] = 0
+                self.errors[name] = str(e)
+
+    def prefix_mask(self, prefix):
+        """Bitset of the modules whose file name starts with prefix."""
+        mask = self._prefix_masks.get(prefix)
+        if mask is None:
+            lo = bisect.bisect_left(self._sorted_names, prefix)
+            hi = bisect.bisect_left(self._sorted_names, prefix + _PREFIX_END, lo)
+            mask = bits(self._sorted_index[lo:hi])
+            self._prefix_masks[prefix] = mask
+        return mask
+
+    def prefixes_mask(self, prefixes):
+        mask = 0
+        for prefix in prefixes:
+            mask |= self.prefix_mask(prefix)
+        return mask
+
+    def resolve(self, name):
+        """Canonical preset name for a name in any case; raises PresetError if unknown."""
+        canonical = self._by_casefold.get(name.casefold())
+        if canonical is None:
+            raise PresetError(f"Unbekanntes Preset '{name}'. Vorhanden: {', '.join(self._definitions)}")
+        return canonical
+
+    def mask(self, name):
+        """Bitset of a preset (name in any case)."""
+        return self.masks[self.resolve(name)]
+
+    def combine(self, union=(), difference=()):
+        """Bitset of the union of some presets minus the modules of others."""
+        mask = 0
+        for name in union:
+            mask |= self.mask(name)
+        for name in difference:
+            mask &= ~self.mask(name)
+        return mask
+
+    def filenames_of(self, mask):
+        return [self.filenames[i] for i in indices(mask)]
+
+    def _compile(self, name, stack):
+        if name in stack:
+            raise PresetError(f"Preset '{name}' verweist auf sich selbst ({' -> '.join(stack + (name,))}).")
+        if name in self.errors:
+            raise PresetError(self.errors[name])
+        if name in self.masks:
+            return self.masks[name]
+        mask = 0
+        for negated, term in parse_terms(self._definitions[name]):
+            if term.startswith('@'):
+                term_mask = self._compile(self.resolve(term[1:].strip()), stack + (name,))
+            else:
+                term_mask = self.prefix_mask(term)
+            mask = mask & ~term_mask if negated else mask | term_mask
+        self.masks[name] = mask
+        return mask
@@ -0,0 +1,157 @@
+"""Pre-composed cover page + mandatory modules ("skeleton"), reused across builds."""
+import os
+import io
+import json
+import hashlib
+import threading
+from functools import lru_cache
+
+SKELETON_FORMAT = 1
+
+
+@lru_cache(maxsize=None)
+def composer_version():
+    """Installed docxcompose version (part of the skeleton key)."""
+    try:
+        from importlib.metadata import version
+        return version("docxcompose")
+    except Exception:
+        return ""
+
+
+class Skeleton:
+    """A composed skeleton: the .docx bytes and the body index after every fixed module."""
+
+    def __init__(self, key, blob, boundaries, first_section_properties_added=False):
+        self.key = key
+        self.blob = blob
+        self.boundaries = boundaries  # filename -> body index right after that file (cover included)
+        self.first_section_properties_added = first_section_properties_added
+
+    def open(self):
+        """Returns a fresh (Document, Composer) pair on a private copy of the skeleton."""
+        from docx import Document
+        from docxcompose.composer import Composer
+        master_doc = Document(io.BytesIO(self.blob))
+        composer = Composer(master_doc)
+        composer.first_section_properties_added = self.first_section_properties_added
+        return master_doc, composer
+
+
+class SkeletonCache:
+    """
+    Keeps one skeleton per cover page, in memory and in cache/skeletons/.
+
+    A skeleton is keyed by the content hashes of the cover page and of the fixed
+    modules (in order), so it is rebuilt automatically as soon as one of them changes.
+    """
+
+    def __init__(self, cache_dir, module_cache):
+        self.cache_dir = os.path.join(cache_dir, "skeletons")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.module_cache = module_cache
+        self._lock = threading.Lock()
+        self._skeletons = {}  # cover path -> Skeleton
+        self._index = self._load_index()  # cover path -> key
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('format') == SKELETON_FORMAT:
+                return data.get('covers', {})
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_index(self):
+        try:
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': SKELETON_FORMAT, 'covers': self._index}, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Could not save skeleton index: {e}")
+
+    def key_for(self, cover_path, fixed_paths):
+        """Content key of the skeleton for this cover page and these fixed modules."""
+        h = hashlib.sha256()
+        h.update(f"{SKELETON_FORMAT}:{composer_version()}".encode())
+        h.update(self.module_cache.content_hash(cover_path).encode())
+        for path in fixed_paths:
+            h.update(os.path.basename(path).encode('utf-8'))
+            h.update(self.module_cache.content_hash(path).encode())
+        return h.hexdigest()
+
+    def get(self, cover_path, fixed_paths):
+        """Returns the up-to-date skeleton, composing it first if needed."""
+        cover_path = os.path.abspath(cover_path)
+        key = self.key_for(cover_path, fixed_paths)
+
+        with self._lock:
+            skeleton = self._skeletons.get(cover_path)
+            if skeleton is not None and skeleton.key == key:
+                return skeleton
+
+            skeleton = self._load(key)
+            if skeleton is None:
+                skeleton = self._compose(key, cover_path, fixed_paths)
+                self._store(skeleton)
+
+            old_key = self._index.get(cover_path)
+            if old_key != key:
+                self._index[cover_path] = key
+                self._save_index()
+                if old_key and old_key not in self._index.values():
+                    self._remove(old_key)
+
+            self._skeletons[cover_path] = skeleton
+            return skeleton
+
+    def _compose(self, key, cover_path, fixed_paths):
+        from docx import Document
+        from docxcompose.composer import Composer
+        master_doc = Document(cover_path)
+        composer = Composer(master_doc)
+        boundaries = {os.path.basename(cover_path): composer.append_index()}
+        for path in fixed_paths:
+            composer.append(self.module_cache.get(path))
+            boundaries[os.path.basename(path)] = composer.append_index()
+
+        buffer = io.BytesIO()
+        master_doc.save(buffer)
+        return Skeleton(key, buffer.getvalue(), boundaries, composer.first_section_properties_added)
+
+    def _load(self, key):
+        base = os.path.join(self.cache_dir, key)
+        try:
+            with open(base + ".json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(base + ".docx", 'rb') as f:
+                blob = f.read()
+        except (OSError, ValueError):
+            return None
+        return Skeleton(key, blob, meta['boundaries'], meta.get('first_section_properties_added', False))
+
+    def _store(self, skeleton):
+        base = os.path.join(self.cache_dir, skeleton.key)
+        # Several processes (rebuild) may store the same skeleton at once
+        tmp_path = f"{base}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(skeleton.blob)
+            os.replace(tmp_path, base + ".docx")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'boundaries': skeleton.boundaries,
+                           'first_section_properties_added': skeleton.first_section_properties_added}, f)
+            os.replace(tmp_path, base + ".json")
+        except OSError as e:
+            print(f"Could not store skeleton: {e}")
+
+    def _remove(self, key):
+        for ext in (".docx", ".json"):
+            try:
+                os.remove(os.path.join(self.cache_dir, key + ext))
+            except OSError:
+                pass
@@ -0,0 +1,180 @@
+"""Precompiled style and numbering tables of the module library, for the OOXML merge backend."""
+import os
+import json
+import hashlib
+import threading
+from lxml import etree
+from ooxml_merge import OoxmlPackage, W_NS, NS, DOCUMENT_PART, RT_STYLES, RT_NUMBERING
+
+REGISTRY_FORMAT = 1
+
+_W = "{%s}" % W_NS
+# Attributes that differ between otherwise identical style definitions
+_VOLATILE_TAGS = {_W + 'rsid'}
+
+
+def _style_fingerprint(style):
+    """Hash of a style definition, ignoring rsids."""
+    style = etree.fromstring(etree.tostring(style))
+    for el in list(style.iter(*_VOLATILE_TAGS)):
+        el.getparent().remove(el)
+    return hashlib.sha1(etree.tostring(style, method='c14n')).hexdigest()
+
+
+def build_module_table(docx_path):
+    """
+    Scans one module and returns its table: the styles its body uses (plus linked
+    styles) and the numbering definitions referenced by the body or by those styles,
+    each as a small standalone XML document, and the style names by id.
+    """
+    package = OoxmlPackage(docx_path)
+    try:
+        used_style_ids = {}
+        used_num_ids = {}
+        with package.zip.open(DOCUMENT_PART) as f:
+            for _, el in etree.iterparse(f, tag=(_W + 'pStyle', _W + 'rStyle', _W + 'tblStyle', _W + 'numId')):
+                if el.tag == _W + 'numId':
+                    used_num_ids[el.get(_W + 'val')] = True
+                else:
+                    used_style_ids[el.get(_W + 'val')] = True
+
+        styles_name = package.part_with_reltype(DOCUMENT_PART, RT_STYLES)
+        styles_root = etree.fromstring(package.read(styles_name)) if styles_name else None
+        numbering_name = package.part_with_reltype(DOCUMENT_PART, RT_NUMBERING)
+        numbering_root = etree.fromstring(package.read(numbering_name)) if numbering_name else None
+    finally:
+        package.close()
+
+    table = {'style_names': {}, 'fingerprints': {}, 'styles': None, 'numbering': None}
+
+    if styles_root is not None:
+        by_id = {s.get(_W + 'styleId'): s for s in styles_root.iterchildren(_W + 'style')}
+        subset = etree.Element(_W + 'styles', nsmap=styles_root.nsmap)
+        wanted = list(used_style_ids)
+        seen = set()
+        while wanted:
+            style_id = wanted.pop(0)
+            if style_id in seen or style_id not in by_id:
+                continue
+            seen.add(style_id)
+            style = by_id[style_id]
+            subset.append(etree.fromstring(etree.tostring(style)))
+            name = style.find(_W + 'name')
+            if name is not None:
+                table['style_names'][style_id] = name.get(_W + 'val')
+                table['fingerprints'][name.get(_W + 'val')] = _style_fingerprint(style)
+            wanted.extend(style.xpath("./w:link/@w:val", namespaces=NS))
+            for num_id in style.xpath(".//w:numId/@w:val", namespaces=NS):
+                used_num_ids[num_id] = True
+        table['styles'] = etree.tostring(subset, encoding='unicode')
+
+    if numbering_root is not None:
+        subset = etree.Element(_W + 'numbering', nsmap=numbering_root.nsmap)
+        nums = []
+        anum_ids = {}
+        for num in numbering_root.iterchildren(_W + 'num'):
+            if num.get(_W + 'numId') in used_num_ids:
+                nums.append(num)
+                for anum_id in num.xpath("./w:abstractNumId/@w:val", namespaces=NS):
+                    anum_ids[anum_id] = True
+        for anum in numbering_root.iterchildren(_W + 'abstractNum'):
+            if anum.get(_W + 'abstractNumId') in anum_ids:
+                subset.append(etree.fromstring(etree.tostring(anum)))
+        for num in nums:
+            subset.append(etree.fromstring(etree.tostring(num)))
+        table['numbering'] = etree.tostring(subset, encoding='unicode')
+
+    return table
+
+
+class StyleRegistry:
+    """
+    Per-module style/numbering tables, stored in cache/registry/ by content hash.
+
+    The tables are compiled once per module version (offline with 'registry', or
+    lazily on first use), so an ooxml merge no longer parses each module's full
+    styles.xml and numbering.xml. The docxcompose backend does not use them.
+    Styles are still mapped by name at merge time, as the target ids depend on
+    the cover page.
+    """
+
+    def __init__(self, cache_dir, module_cache):
+        self.cache_dir = os.path.join(cache_dir, "registry")
+        self.module_cache = module_cache
+        self._lock = threading.Lock()
+        self._tables = {}  # sha256 -> table
+
+    def table(self, path):
+        """Returns the table of a module, compiling it first if needed."""
+        sha256 = self.module_cache.content_hash(path)
+        with self._lock:
+            table = self._tables.get(sha256)
+        if table is not None:
+            return table
+
+        table = self._load(sha256)
+        if table is None:
+            table = build_module_table(self.module_cache.normalized_path(path))
+            self._store(sha256, table)
+        with self._lock:
+            self._tables[sha256] = table
+        return table
+
+    def rebuild(self, module_paths):
+        """
+        Compiles the tables of all modules (dropping those of old module versions).
+        Returns {style name: [module file names]} for styles with conflicting definitions.
+        """
+        variants = {}  # style name -> {fingerprint: [file names]}
+        for path in module_paths:
+            table = self.table(path)
+            filename = os.path.basename(path)
+            for name in table['style_names'].values():
+                variants.setdefault(name, {}).setdefault(table['fingerprints'][name], []).append(filename)
+
+        conflicts = {}
+        for name, by_fingerprint in variants.items():
+            if len(by_fingerprint) > 1:
+                # The most common definition wins, the others are conflicts
+                files = sorted(by_fingerprint.values(), key=len, reverse=True)
+                conflicts[name] = sorted(f for group in files[1:] for f in group)
+        self._remove_unreferenced({self.module_cache.content_hash(p) for p in module_paths})
+        return conflicts
+
+    def _load(self, sha256):
+        try:
+            with open(os.path.join(self.cache_dir, sha256 + ".json"), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('format') != REGISTRY_FORMAT:
+            return None
+        return data['table']
+
+    def _store(self, sha256, table):
+        path = os.path.join(self.cache_dir, sha256 + ".json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': REGISTRY_FORMAT, 'table': table}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not store style table: {e}")
+
+    def _remove_unreferenced(self, sha256s):
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            sha256, ext = os.path.splitext(name)
+            if ext == ".json" and len(sha256) == 64 and sha256 not in sha256s:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        with self._lock:
+            for sha256 in list(self._tables):
+                if sha256 not in sha256s:
+                    del self._tables[sha256]
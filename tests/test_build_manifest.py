@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_manifest import BUILD_FORMAT, load_build_manifest, outdated_files  # noqa: E402
+
+COVER = "0.0.1 - Deckblatt Stammbetra.docx"
+
+
+def _manifest(*files):
+    """A format 2 manifest; files are (name, sha256) or (name, sha256, failed)."""
+    entries = []
+    for name, sha256, *failed in files:
+        entry = {'file': name, 'sha256': sha256}
+        if failed and failed[0]:
+            entry['failed'] = True
+        entries.append(entry)
+    return {'format': BUILD_FORMAT, 'output': "Betra.docx", 'files': entries}
+
+
+class UpgradeFormat1Test(unittest.TestCase):
+    """Format 1 listed failed modules only in 'failed'; they go back into 'files' by chapter."""
+
+    def load(self, data):
+        with tempfile.TemporaryDirectory() as base:
+            path = os.path.join(base, "Betra.build.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            return load_build_manifest(path)
+
+    def test_failed_module_is_inserted_at_its_chapter(self):
+        manifest = self.load({
+            'format': 1, 'output': "Betra.docx", 'built': "2026-01-02T03:04:05", 'backend': "docxcompose",
+            'files': [{'file': COVER, 'sha256': "c"},
+                      {'file': "2.1.0 - Arbeitszeit.docx", 'sha256': "a"},
+                      {'file': "5.1.2 - Aufträge.docx", 'sha256': "b"},
+                      {'file': "5.1.21 - Hilfsbetriebsstelle.docx", 'sha256': "d"}],
+            'failed': ["5.1.20 - Einrichtung GWB.docx"],
+        })
+        self.assertEqual(manifest['format'], BUILD_FORMAT)
+        self.assertEqual([entry['file'] for entry in manifest['files']],
+                         [COVER, "2.1.0 - Arbeitszeit.docx", "5.1.2 - Aufträge.docx",
+                          "5.1.20 - Einrichtung GWB.docx", "5.1.21 - Hilfsbetriebsstelle.docx"])
+        self.assertEqual(manifest['files'][3], {'file': "5.1.20 - Einrichtung GWB.docx", 'sha256': None,
+                                                'failed': True})
+        self.assertNotIn('failed', manifest['files'][2])
+
+    def test_failed_module_behind_the_last_one_goes_last(self):
+        manifest = self.load({
+            'format': 1, 'output': "Betra.docx", 'built': "2026-01-02T03:04:05", 'backend': "docxcompose",
+            'files': [{'file': COVER, 'sha256': "c"}, {'file': "2.1.0 - Arbeitszeit.docx", 'sha256': "a"}],
+            'failed': ["10.1 - Anhang.docx"],
+        })
+        self.assertEqual(manifest['files'][-1]['file'], "10.1 - Anhang.docx")
+
+    def test_upgraded_failed_module_is_rebuilt(self):
+        manifest = self.load({
+            'format': 1, 'output': "Betra.docx", 'built': "2026-01-02T03:04:05", 'backend': "docxcompose",
+            'files': [{'file': COVER, 'sha256': "c"}],
+            'failed': ["5.1.20 - Einrichtung GWB.docx"],
+        })
+        current = {COVER: "c", "5.1.20 - Einrichtung GWB.docx": "fixed"}
+        self.assertEqual(outdated_files(manifest, current),
+                         [("5.1.20 - Einrichtung GWB.docx", "5.1.20 - Einrichtung GWB.docx", 'failed')])
+
+    def test_unknown_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.load({'format': 99, 'files': []})
+
+
+class OutdatedFilesTest(unittest.TestCase):
+
+    def test_up_to_date(self):
+        manifest = _manifest((COVER, "c"), ("2.1.0 - Arbeitszeit.docx", "a"))
+        self.assertEqual(outdated_files(manifest, {COVER: "c", "2.1.0 - Arbeitszeit.docx": "a"}), [])
+
+    def test_changed(self):
+        manifest = _manifest((COVER, "c"), ("2.1.0 - Arbeitszeit.docx", "a"))
+        self.assertEqual(outdated_files(manifest, {COVER: "c", "2.1.0 - Arbeitszeit.docx": "a2"}),
+                         [("2.1.0 - Arbeitszeit.docx", "2.1.0 - Arbeitszeit.docx", 'changed')])
+
+    def test_rename_keeping_the_chapter_number(self):
+        manifest = _manifest((COVER, "c"), ("5.1.20 - Einrichtung GWB.docx", "g"))
+        current = {COVER: "c", "5.1.20 - Vorübergehende Einrichtung von GWB.docx": "g"}
+        self.assertEqual(outdated_files(manifest, current),
+                         [("5.1.20 - Einrichtung GWB.docx", "5.1.20 - Vorübergehende Einrichtung von GWB.docx",
+                           'renamed')])
+
+    def test_two_candidates_for_a_chapter_is_missing(self):
+        manifest = _manifest((COVER, "c"), ("5.1.20 - Einrichtung GWB.docx", "g"))
+        current = {COVER: "c", "5.1.20 - GWB alt.docx": "g", "5.1.20 - GWB neu.docx": "h"}
+        self.assertEqual(outdated_files(manifest, current), [("5.1.20 - Einrichtung GWB.docx", None, 'missing')])
+
+    def test_removed(self):
+        manifest = _manifest((COVER, "c"), ("5.1.20 - Einrichtung GWB.docx", "g"))
+        self.assertEqual(outdated_files(manifest, {COVER: "c"}),
+                         [("5.1.20 - Einrichtung GWB.docx", None, 'missing')])
+
+    def test_failed_module_is_reported_even_if_unchanged(self):
+        manifest = _manifest((COVER, "c"), ("5.1.20 - Einrichtung GWB.docx", "g", True))
+        self.assertEqual(outdated_files(manifest, {COVER: "c", "5.1.20 - Einrichtung GWB.docx": "g"}),
+                         [("5.1.20 - Einrichtung GWB.docx", "5.1.20 - Einrichtung GWB.docx", 'failed')])
+
+    def test_failed_module_renamed_since(self):
+        manifest = _manifest((COVER, "c"), ("5.1.20 - Einrichtung GWB.docx", None, True))
+        current = {COVER: "c", "5.1.20 - GWB.docx": "g"}
+        self.assertEqual(outdated_files(manifest, current),
+                         [("5.1.20 - Einrichtung GWB.docx", "5.1.20 - GWB.docx", 'renamed')])
+
+
+if __name__ == '__main__':
+    unittest.main()
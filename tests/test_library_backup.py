@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from library_backup import LibraryBackup  # noqa: E402
+
+
+def _write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+class RestoreOldestSnapshotTest(unittest.TestCase):
+    """Restoring the oldest snapshot when the keep limit is full must not prune it first."""
+
+    def test_restore_oldest_snapshot_at_keep_limit(self):
+        with tempfile.TemporaryDirectory() as base:
+            modules_dir = os.path.join(base, "modules")
+            os.makedirs(modules_dir)
+            live = {'modules': modules_dir}
+            backup = LibraryBackup(os.path.join(base, "backup"), os.path.join(base, "cache"), keep=3)
+
+            ids = []
+            for version in range(3):
+                _write(os.path.join(modules_dir, "a.docx"), f"version {version}")
+                _, snapshot_id = backup.backup(live)
+                ids.append(snapshot_id)
+            self.assertEqual(len(backup.snapshots()), 3)
+
+            _write(os.path.join(modules_dir, "a.docx"), "edited")
+            backup.restore(live, ids[0])
+
+            self.assertEqual(_read(os.path.join(modules_dir, "a.docx")), "version 0")
+            self.assertIn(ids[0], [s['id'] for s in backup.snapshots()])
+            # And the edited state can be restored from the snapshot taken before
+            before = backup.snapshots()[-1]
+            self.assertEqual(before['note'], "vor Wiederherstellung")
+            backup.restore(live, before['id'])
+            self.assertEqual(_read(os.path.join(modules_dir, "a.docx")), "edited")
+
+
+class RestoreWithoutBackupTest(unittest.TestCase):
+    """A restore from a backup that does not exist must not delete the library."""
+
+    def test_missing_backup_raises_and_keeps_library(self):
+        with tempfile.TemporaryDirectory() as base:
+            modules_dir = os.path.join(base, "modules")
+            os.makedirs(modules_dir)
+            _write(os.path.join(modules_dir, "a.docx"), "live")
+            live = {'modules': modules_dir}
+            backup = LibraryBackup(os.path.join(base, "backup"), os.path.join(base, "cache"))
+
+            for dry_run in (True, False):
+                with self.assertRaises(ValueError):
+                    backup.restore(live, dry_run=dry_run)
+            self.assertEqual(_read(os.path.join(modules_dir, "a.docx")), "live")
+            self.assertEqual(backup.snapshots(), [])
+
+    def test_empty_backup_tree_raises(self):
+        with tempfile.TemporaryDirectory() as base:
+            modules_dir = os.path.join(base, "modules")
+            os.makedirs(modules_dir)
+            _write(os.path.join(modules_dir, "a.docx"), "live")
+            os.makedirs(os.path.join(base, "backup", "modules"))
+            _write(os.path.join(base, "backup", "modules", "config.ini"), "")
+            backup = LibraryBackup(os.path.join(base, "backup"), os.path.join(base, "cache"))
+
+            with self.assertRaises(ValueError):
+                backup.restore({'modules': modules_dir})
+            self.assertTrue(os.path.exists(os.path.join(modules_dir, "a.docx")))
+
+
+if __name__ == '__main__':
+    unittest.main()
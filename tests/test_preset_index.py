@@ -0,0 +1,145 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from preset_index import PresetIndex, bits, indices, parse_terms  # noqa: E402
+
+FILENAMES = [
+    "1.0.0 - Lage der Baustelle, Lageplanskizze.docx",
+    "2.1.0 - Arbeitszeit.docx",
+    "2.3.1 - Gleissperrung.docx",
+    "2.3.10 - Sperrung Nachbargleis.docx",
+    "2.3.2 - Sperrung Weichen.docx",
+    "3.1 - Langsamfahrstellen.docx",
+    "5.1.2 - Fernmündliche Aufträge und Meldungen.docx",
+    "5.1.20 - Vorübergehende Einrichtung von GWB.docx",
+    "5.1.21 - Einrichtung einer Hilfsbetriebsstelle.docx",
+    "5.3.18 - Sperrung BÜ.docx",
+    "5.3.19 - BÜ-Posten.docx",
+    "10.1 - Anhang.docx",
+]
+
+
+def _presets(**definitions):
+    """load_presets shape: {key: {'Name': ..., 'Modules': ...}}."""
+    return {f"PRESET_{i}": {'Name': name, 'Modules': modules}
+            for i, (name, modules) in enumerate(definitions.items())}
+
+
+def _startswith_selection(filenames, prefixes):
+    """The selection of the former nested loop: every file name starting with one of the prefixes."""
+    selected = set()
+    for filename in filenames:
+        for prefix in prefixes:
+            if filename.startswith(prefix):
+                selected.add(filename)
+                break
+    return selected
+
+
+class PrefixMaskTest(unittest.TestCase):
+
+    def test_matches_the_startswith_loop(self):
+        index = PresetIndex(FILENAMES, {})
+        prefixes = ["2.3.", "2.3.1", "5.", "5.1.2", "1", "10.", "9.", "", "5.3.18 - ", "2.3.10 - Z"]
+        for prefix in prefixes:
+            with self.subTest(prefix=prefix):
+                self.assertEqual(set(index.filenames_of(index.prefix_mask(prefix))),
+                                 _startswith_selection(FILENAMES, [prefix]))
+        self.assertEqual(set(index.filenames_of(index.prefixes_mask(prefixes[:3]))),
+                         _startswith_selection(FILENAMES, prefixes[:3]))
+
+    def test_random_prefixes_match_the_startswith_loop(self):
+        rng = random.Random(17)
+        index = PresetIndex(FILENAMES, {})
+        for _ in range(200):
+            name = rng.choice(FILENAMES)
+            prefixes = [name[:rng.randint(0, 8)] for _ in range(rng.randint(1, 3))]
+            self.assertEqual(set(index.filenames_of(index.prefixes_mask(prefixes))),
+                             _startswith_selection(FILENAMES, prefixes), prefixes)
+
+    def test_filenames_keep_display_order(self):
+        index = PresetIndex(FILENAMES, {})
+        self.assertEqual(index.filenames_of(index.prefix_mask("2.3.")),
+                         ["2.3.1 - Gleissperrung.docx", "2.3.10 - Sperrung Nachbargleis.docx",
+                          "2.3.2 - Sperrung Weichen.docx"])
+
+    def test_bits_and_indices(self):
+        self.assertEqual(indices(bits([0, 3, 64])), [0, 3, 64])
+        self.assertEqual(indices(0), [])
+
+
+class PresetLanguageTest(unittest.TestCase):
+
+    def selection(self, index, name):
+        return set(index.filenames_of(index.mask(name)))
+
+    def test_parse_terms(self):
+        self.assertEqual(parse_terms(" 2.3., -@BÜ,, - 5.3.18 ,@Baugleis"),
+                         [(False, "2.3."), (True, "@BÜ"), (True, "5.3.18"), (False, "@Baugleis")])
+
+    def test_plain_prefixes(self):
+        index = PresetIndex(FILENAMES, _presets(Gleis="2.3., 3.1"))
+        self.assertEqual(self.selection(index, "Gleis"), _startswith_selection(FILENAMES, ["2.3.", "3.1"]))
+
+    def test_include(self):
+        index = PresetIndex(FILENAMES, _presets(Gleis="2.3.", Baugleis="@Gleis, 5.1.2"))
+        self.assertEqual(self.selection(index, "Baugleis"), _startswith_selection(FILENAMES, ["2.3.", "5.1.2"]))
+
+    def test_nested_include(self):
+        index = PresetIndex(FILENAMES, _presets(A="1.", B="@A, 2.1.", C="@B, 10."))
+        self.assertEqual(self.selection(index, "C"), _startswith_selection(FILENAMES, ["1.", "2.1.", "10."]))
+
+    def test_difference(self):
+        index = PresetIndex(FILENAMES, _presets(BÜ="5.3.", Ohne="5., -@BÜ, -5.1.2"))
+        expected = _startswith_selection(FILENAMES, ["5."]) - _startswith_selection(FILENAMES, ["5.3.", "5.1.2"])
+        self.assertEqual(self.selection(index, "Ohne"), expected)
+
+    def test_terms_are_evaluated_left_to_right(self):
+        # A difference only removes what was selected before it; later terms add back
+        index = PresetIndex(FILENAMES, _presets(Vorher="-5.3.18, 5.3.", Nachher="5.3., -5.3.18",
+                                                Wieder="5.3., -5.3., 5.3.19"))
+        self.assertEqual(self.selection(index, "Vorher"), _startswith_selection(FILENAMES, ["5.3."]))
+        self.assertEqual(self.selection(index, "Nachher"), _startswith_selection(FILENAMES, ["5.3.19"]))
+        self.assertEqual(self.selection(index, "Wieder"), _startswith_selection(FILENAMES, ["5.3.19"]))
+
+    def test_names_are_case_insensitive(self):
+        index = PresetIndex(FILENAMES, _presets(Baugleis="2.3.", Alles="@BAUGLEIS, -@baugleis, 1."))
+        self.assertEqual(index.resolve("bauGLEIS"), "Baugleis")
+        self.assertEqual(index.mask("baugleis"), index.mask("Baugleis"))
+        self.assertEqual(self.selection(index, "alles"), _startswith_selection(FILENAMES, ["1."]))
+        self.assertEqual(index.errors, {})
+
+    def test_combine(self):
+        index = PresetIndex(FILENAMES, _presets(Fünf="5.", BÜ="5.3.", Gleis="2.3."))
+        self.assertEqual(set(index.filenames_of(index.combine(union=["fünf", "Gleis"], difference=["bü"]))),
+                         _startswith_selection(FILENAMES, ["5.1.", "2.3."]))
+
+    def test_unknown_name_falls_back_to_an_empty_mask(self):
+        index = PresetIndex(FILENAMES, _presets(Kaputt="2.3., @Gibtsnicht", Heil="1."))
+        self.assertEqual(index.mask("Kaputt"), 0)
+        self.assertIn("Gibtsnicht", index.errors["Kaputt"])
+        self.assertEqual(self.selection(index, "Heil"), _startswith_selection(FILENAMES, ["1."]))
+        with self.assertRaises(ValueError):
+            index.mask("Gibtsnicht")
+
+    def test_cycle_falls_back_to_an_empty_mask(self):
+        index = PresetIndex(FILENAMES, _presets(A="1., @B", B="2.1., @C", C="@a", D="@A, 10.", E="3.1"))
+        for name in "ABCD":
+            with self.subTest(name=name):
+                self.assertEqual(index.mask(name), 0)
+                self.assertIn(name, index.errors)
+        self.assertIn("verweist auf sich selbst", index.errors["A"])
+        self.assertEqual(self.selection(index, "E"), _startswith_selection(FILENAMES, ["3.1"]))
+
+    def test_self_reference(self):
+        index = PresetIndex(FILENAMES, _presets(Selbst="1., -@selbst"))
+        self.assertEqual(index.mask("Selbst"), 0)
+        self.assertIn("Selbst", index.errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
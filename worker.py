@@ -0,0 +1,49 @@
+"""Runs long jobs (merge, AEL write) on a background thread; results flow back through a queue."""
+import queue
+import threading
+from engine import MergeCancelled
+
+
+class BackgroundWorker:
+    """
+    One job at a time on a daemon thread. The job is called with the keyword
+    arguments progress and cancel_event, and everything it reports ends up in
+    self.queue as tuples, which the Tk main loop polls with root.after:
+
+        ('progress', done, total, text)
+        ('done', tag, result)
+        ('cancelled', tag)
+        ('error', tag, exception)
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, tag, job, *args, **kwargs):
+        """Starts job(*args, progress=..., cancel_event=..., **kwargs) in the background."""
+        if self.is_running():
+            raise RuntimeError("Es läuft bereits ein Vorgang.")
+        self.cancel_event.clear()
+        self._thread = threading.Thread(target=self._run, args=(tag, job, args, kwargs), daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _progress(self, done, total, text):
+        self.queue.put(('progress', done, total, text))
+
+    def _run(self, tag, job, args, kwargs):
+        try:
+            result = job(*args, progress=self._progress, cancel_event=self.cancel_event, **kwargs)
+        except MergeCancelled:
+            self.queue.put(('cancelled', tag))
+        except Exception as e:
+            self.queue.put(('error', tag, e))
+        else:
+            self.queue.put(('done', tag, result))